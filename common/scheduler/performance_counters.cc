@@ -1,4 +1,5 @@
 #include "performance_counters.h"
+#include "telemetry.h"
 
 #include <fstream>
 #include <sstream>
@@ -12,41 +13,100 @@ PerformanceCounters::PerformanceCounters(
 	std::string instCPIStackFileName,
 	std::string instRvalueFileName,
 	std::string instVddFileName,
-	std::string instDeltaVthFileName) :
+	std::string instDeltaVthFileName,
+	const Telemetry *telemetry) :
 		instPowerFileName(instPowerFileName),
 		instTemperatureFileName(instTemperatureFileName),
 		instCPIStackFileName(instCPIStackFileName),
 		instRvalueFileName(instRvalueFileName),
 		instVddFileName(instVddFileName),
-		instDeltaVthFileName(instDeltaVthFileName) {
+		instDeltaVthFileName(instDeltaVthFileName),
+		telemetry(telemetry) {
 }
 
-/** getPowerOfComponent
-    Returns the latest power consumption of a component being tracked using base.cfg. Return -1 if power value not found.
+/** load
+    Returns the given instantaneous log file split into tab separated lines (at most maxLines, -1 for all).
+    The file is only read on the first call of an epoch, see notifyEpoch.
 */
-double PerformanceCounters::getPowerOfComponent (string component) const {
-	ifstream powerLogFile(instPowerFileName);
-	string header;
-	string footer;
-
-	if (powerLogFile.good()) {
-		getline(powerLogFile, header);
-		getline(powerLogFile, footer);
+const PerformanceCounters::InstantFile &PerformanceCounters::load(InstantFile &file, const string &fileName, int maxLines) const {
+	if (file.loaded) {
+		return file;
 	}
 
-	std::istringstream issHeader(header);
-	std::istringstream issFooter(footer);
-	std::string token;
+	ifstream logFile(fileName);
+	string line;
+	while (logFile.good() && (maxLines < 0 || (int)file.lines.size() < maxLines)) {
+		getline(logFile, line);
+		std::istringstream issLine(line);
+		std::string token;
+		vector<string> tokens;
+		while(getline(issLine, token, '\t')) {
+			tokens.push_back(token);
+		}
+		if (tokens.size() > 0) {
+			file.rows.emplace(tokens.at(0), file.lines.size());
+		}
+		file.lines.push_back(tokens);
+	}
+	if (file.lines.size() > 0) {
+		for (size_t i = 0; i < file.lines.at(0).size(); i++) {
+			file.columns.emplace(file.lines.at(0).at(i), i);
+		}
+	}
+	file.loaded = true;
+	return file;
+}
 
-	while(getline(issHeader, token, '\t')) {
-		std::string value;
-		getline(issFooter, value, '\t');
-		if (token == component) {
-			return stod (value);
+/** getValueOfComponent
+    Returns the value below the heading `component` in a file with a header and a single line of values, or in the telemetry channel of the same name if the file is published there. Return -1 if the heading is not found.
+*/
+double PerformanceCounters::getValueOfComponent(InstantFile &file, const string &fileName, const string &component) const {
+	const Telemetry::Channel *channel = telemetry->getChannel(fileName);
+	if (channel) {
+		auto column = channel->index.find(component);
+		if (column == channel->index.end()) {
+			return -1;
 		}
+		return channel->values.at(column->second);
+	}
+
+	const InstantFile &f = load(file, fileName, 2);
+	auto column = f.columns.find(component);
+	if (column == f.columns.end()) {
+		return -1;
+	}
+	return stod(f.lines.at(1).at(column->second));
+}
+
+/** getValuesOfLine
+    Returns the first numberOfValues values of the given line of a file.
+*/
+vector<double> PerformanceCounters::getValuesOfLine(InstantFile &file, const string &fileName, size_t line, int numberOfValues) const {
+	const InstantFile &f = load(file, fileName, line + 1);
+	vector<double> values;
+	for (int i = 0; i < numberOfValues; i++) {
+		values.push_back(stod(f.lines.at(line).at(i)));
 	}
+	return values;
+}
 
-	return -1;
+/** notifyEpoch
+    Drops the instantaneous log files read so far. They are read again by the next query, so a control epoch reads each file once however often the policies query it.
+*/
+void PerformanceCounters::notifyEpoch() {
+	instPower = InstantFile();
+	instTemperature = InstantFile();
+	instCPIStack = InstantFile();
+	instRvalue = InstantFile();
+	instVdd = InstantFile();
+	instDeltaVth = InstantFile();
+}
+
+/** getPowerOfComponent
+    Returns the latest power consumption of a component being tracked using base.cfg. Return -1 if power value not found.
+*/
+double PerformanceCounters::getPowerOfComponent (string component) const {
+	return getValueOfComponent(instPower, instPowerFileName, component);
 }
 
 /** getPowerOfCore
@@ -62,23 +122,25 @@ double PerformanceCounters::getPowerOfCore(int coreId) const {
     Returns the latest peak temperature of any component
 */
 double PerformanceCounters::getPeakTemperature () const {
-	ifstream temperatureLogFile(instTemperatureFileName);
-	string header;
-	string footer;
+	double maxTemp = -1;
 
-	if (temperatureLogFile.good()) {
-		getline(temperatureLogFile, header);
-		getline(temperatureLogFile, footer);
+	const Telemetry::Channel *channel = telemetry->getChannel(instTemperatureFileName);
+	if (channel) {
+		for (double t : channel->values) {
+			if (t > maxTemp) {
+				maxTemp = t;
+			}
+		}
+		return maxTemp;
 	}
 
-	std::istringstream issFooter(footer);
-
-	double maxTemp = -1;
-	std::string value;
-	while(getline(issFooter, value, '\t')) {
-		double t = stod (value);
-		if (t > maxTemp) {
-			maxTemp = t;
+	const InstantFile &f = load(instTemperature, instTemperatureFileName, 2);
+	if (f.lines.size() > 1) {
+		for (const string & value : f.lines.at(1)) {
+			double t = stod (value);
+			if (t > maxTemp) {
+				maxTemp = t;
+			}
 		}
 	}
 
@@ -89,29 +151,7 @@ double PerformanceCounters::getPeakTemperature () const {
     Returns the latest temperature of a component being tracked using base.cfg. Return -1 if power value not found.
 */
 double PerformanceCounters::getTemperatureOfComponent (string component) const {
-	ifstream temperatureLogFile(instTemperatureFileName);
-	string header;
-	string footer;
-
-	if (temperatureLogFile.good()) {
-		getline(temperatureLogFile, header);
-		getline(temperatureLogFile, footer);
-	}
-
-	std::istringstream issHeader(header);
-	std::istringstream issFooter(footer);
-	std::string token;
-
-	while(getline(issHeader, token, '\t')) {
-		std::string value;
-		getline(issFooter, value, '\t');
-
-		if (token == component) {
-			return stod (value);
-		}
-	}
-
-	return -1;
+	return getValueOfComponent(instTemperature, instTemperatureFileName, component);
 }
 
 /** getTemperatureOfCore
@@ -131,23 +171,13 @@ double PerformanceCounters::getTemperatureOfBank(int bankId) const {
 }
 
 vector<string> PerformanceCounters::getCPIStackParts() const {
-	ifstream cpiStackLogFile(instCPIStackFileName);
-    string line;
-	std::istringstream issLine;
+	const InstantFile &f = load(instCPIStack, instCPIStackFileName, -1);
 
+	// skip the first line containing the CSV header and the second line containing total values
 	vector<string> parts;
-	if (cpiStackLogFile.good()) {
-		getline(cpiStackLogFile, line); // consume first line containing the CSV header
-		getline(cpiStackLogFile, line); // consume second line containing total values
-		while (cpiStackLogFile.good()) {
-			getline(cpiStackLogFile, line);
-			issLine.str(line);
-			issLine.clear();
-			std::string m;
-			getline(issLine, m, '\t');
-			if (m.length() > 0) {
-				parts.push_back(m);
-			}
+	for (size_t i = 2; i < f.lines.size(); i++) {
+		if ((f.lines.at(i).size() > 0) && (f.lines.at(i).at(0).length() > 0)) {
+			parts.push_back(f.lines.at(i).at(0));
 		}
 	}
 	return parts;
@@ -158,35 +188,21 @@ vector<string> PerformanceCounters::getCPIStackParts() const {
  * Available performance metrics can be checked in InstantaneousPerformanceCounters.log
  */
 double PerformanceCounters::getCPIStackPartOfCore(int coreId, std::string metric) const {
-	ifstream cpiStackLogFile(instCPIStackFileName);
-    string line;
-	std::istringstream issLine;
+	const InstantFile &f = load(instCPIStack, instCPIStackFileName, -1);
 
 	// first find the line in the logfile that contains the desired metric
-	bool metricFound = false;
-	while (!metricFound) {
-		if (cpiStackLogFile.good()) {
-			getline(cpiStackLogFile, line);
-			issLine.str(line);
-			issLine.clear();
-			std::string m;
-			getline(issLine, m, '\t');
-			metricFound = (m == metric);
-		} else {
-			return 0;
-		}
+	auto row = f.rows.find(metric);
+	if (row == f.rows.end()) {
+		return 0;
 	}
 
-	// then split the coreId-th value from this line (first value is metric name, but already consumed above)
-	std::string value;
-	for (int i = 0; i < coreId + 1; i++) {
-		getline(issLine, value, '\t');
-		if ((i == 0) && (value == "-")) {
-			return 0;
-		}
+	// then take the coreId-th value from this line (first value is metric name)
+	const vector<string> &line = f.lines.at(row->second);
+	if ((line.size() > 1) && (line.at(1) == "-")) {
+		return 0;
 	}
 
-	return stod(value);
+	return stod(line.at(coreId + 1));
 }
 
 /**
@@ -247,29 +263,7 @@ double PerformanceCounters::getIPSOfCore(int coreId) const {
     Return -1 if rvalue value not found.
 */
 double PerformanceCounters::getRvalueOfComponent (std::string component) const {
-    ifstream rvalueLogFile(instRvalueFileName);
-    string header;
-    string footer;
-
-    if (rvalueLogFile.good()) {
-        getline(rvalueLogFile, header);
-        getline(rvalueLogFile, footer);
-    }
-
-    std::istringstream issHeader(header);
-    std::istringstream issFooter(footer);
-    std::string token;
-
-    while(getline(issHeader, token, '\t')) {
-        std::string value;
-        getline(issFooter, value, '\t');
-
-        if (token == component) {
-            return stod(value);
-        }
-    }
-
-    return -1;
+    return getValueOfComponent(instRvalue, instRvalueFileName, component);
 }
 
 /** getRvalueOfCore
@@ -283,43 +277,10 @@ double PerformanceCounters::getRvalueOfCore (int coreId) const {
 }
 
 vector<double> PerformanceCounters::getVddOfCores (int numberOfCores) const {
-	ifstream vddLogFile(instVddFileName);
-	string header;
-	string data;
-
-	if (vddLogFile.good()) {
-		getline(vddLogFile, header);
-		getline(vddLogFile, data);
-	}
-
-	std::istringstream issData(data);
-
-	vector<double> vdds;
-	for (int i = 0; i < numberOfCores; i++) {
-		std::string value;
-		getline(issData, value, '\t');
-		vdds.push_back(stod(value));
-	}
-
-	return vdds;
+	// the first line is the header
+	return getValuesOfLine(instVdd, instVddFileName, 1, numberOfCores);
 }
 
 vector<double> PerformanceCounters::getDeltaVthOfCores (int numberOfCores) const {
-	ifstream deltaVthLogFile(instDeltaVthFileName);
-	string data;
-
-	if (deltaVthLogFile.good()) {
-		getline(deltaVthLogFile, data);
-	}
-
-	std::istringstream issData(data);
-
-	vector<double> delta_vs;
-	for (int i = 0; i < numberOfCores; i++) {
-		std::string value;
-		getline(issData, value, '\t');
-		delta_vs.push_back(stod(value));
-	}
-
-	return delta_vs;
+	return getValuesOfLine(instDeltaVth, instDeltaVthFileName, 0, numberOfCores);
 }
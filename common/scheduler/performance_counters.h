@@ -7,8 +7,11 @@
 #define __PERFORMANCECOUNTERS_H
 
 #include <string>
+#include <unordered_map>
 #include <vector>
 
+class Telemetry;
+
 class PerformanceCounters {
 public:
     PerformanceCounters(std::string instPowerFileName, 
@@ -16,7 +19,8 @@ public:
                         std::string instCPIStackFileName, 
                         std::string instRvalueFileName,
                         std::string instVddFileName,
-                        std::string instDeltaVthFileName);
+                        std::string instDeltaVthFileName,
+                        const Telemetry *telemetry);
     double getPowerOfComponent (std::string component) const;
     double getPowerOfCore(int coreId) const;
     double getPeakTemperature () const;
@@ -34,7 +38,16 @@ public:
     std::vector<double> getDeltaVthOfCores (int numberOfCores) const;
 
     void notifyFreqsOfCores(std::vector<int> frequencies);
+    void notifyEpoch();
 private:
+    /* an instantaneous log file, split into tab separated lines once per epoch */
+    struct InstantFile {
+        bool loaded = false;
+        std::vector<std::vector<std::string>> lines;
+        std::unordered_map<std::string, size_t> columns; // heading of the first line -> column
+        std::unordered_map<std::string, size_t> rows;    // first value of a line -> line
+    };
+
     std::vector<int> frequencies;
 
     std::string instPowerFileName;
@@ -44,6 +57,19 @@ private:
     std::string instVddFileName;
     std::string instDeltaVthFileName;
 
+    /* values published by the Python scripts, read instead of the files they mirror */
+    const Telemetry *telemetry;
+
+    mutable InstantFile instPower;
+    mutable InstantFile instTemperature;
+    mutable InstantFile instCPIStack;
+    mutable InstantFile instRvalue;
+    mutable InstantFile instVdd;
+    mutable InstantFile instDeltaVth;
+
+    const InstantFile &load(InstantFile &file, const std::string &fileName, int maxLines) const;
+    double getValueOfComponent(InstantFile &file, const std::string &fileName, const std::string &component) const;
+    std::vector<double> getValuesOfLine(InstantFile &file, const std::string &fileName, size_t line, int numberOfValues) const;
     std::vector<std::string> getCPIStackParts() const;
 };
 
@@ -73,7 +73,8 @@ SchedulerOpen::SchedulerOpen(ThreadManager *thread_manager)
 		"InstantaneousCPIStack.log",
 		Sim()->getCfg()->getString("reliability/log_files/instant_trace_file").c_str(),
 		"InstantVdd.log",
-		Sim()->getCfg()->getString("reliability/log_files/delta_v_file").c_str());
+		Sim()->getCfg()->getString("reliability/log_files/delta_v_file").c_str(),
+		Sim()->getTelemetry());
 
 	rlb_enabled = Sim()->getCfg()->getBool("reliability/enabled");
 	subcore_enabled = !(Sim()->getCfg()->getBool("core_power/tp"));
@@ -1067,6 +1068,8 @@ void SchedulerOpen::executeMigrationPolicy(SubsecondTime time) {
     This function is called periodically by Sniper at Interval of 100ns.
 */
 void SchedulerOpen::periodic(SubsecondTime time) {
+	performanceCounters->notifyEpoch(); // the log files may have been rewritten since the last call
+
 	if (time.getNS () % 1000000 == 0) { //Error Checking at every 1ms. Can be faster but will have overhead in simulation time.
 		cout << "\n[Scheduler]: Time " << formatTime(time) << " [Active Tasks =  " << numberOfActiveTasks () << " | Completed Tasks = " <<  numberOfTasksCompleted () << " | Queued Tasks = "  << numberOfTasksInQueue () << " | Non-Queued Tasks  = " <<  numberOfTasksWaitingToSchedule () <<  " | Free Cores = " << numberOfFreeCores () << " | Active Tasks Requirements = " << totalCoreRequirementsOfActiveTasks () << " ] \n" << endl;
 
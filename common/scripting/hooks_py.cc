@@ -60,6 +60,7 @@ void HooksPy::setup()
    PyBbv::setup();
    PyMem::setup();
    PyThread::setup();
+   PyTelemetry::setup();
 }
 
 void HooksPy::fini()
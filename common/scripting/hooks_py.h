@@ -50,6 +50,10 @@ class HooksPy {
           public:
               static void setup(void);
       };
+      class PyTelemetry {
+          public:
+              static void setup(void);
+      };
 };
 
 #endif // HOOKS_PY_H
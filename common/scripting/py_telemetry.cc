@@ -0,0 +1,55 @@
+#include "hooks_py.h"
+#include "simulator.h"
+#include "telemetry.h"
+
+static PyObject *
+publish(PyObject *self, PyObject *args)
+{
+   const char *name = NULL;
+   PyObject *py_names, *py_values, *py_fast_names, *py_fast_values;
+
+   if (!PyArg_ParseTuple(args, "sOO", &name, &py_names, &py_values))
+      return NULL;
+
+   py_fast_names = PySequence_Fast(py_names, "Second argument must be iteratable");
+   if (!py_fast_names)
+      return NULL;
+   py_fast_values = PySequence_Fast(py_values, "Third argument must be iteratable");
+   if (!py_fast_values)
+   {
+      Py_DECREF(py_fast_names);
+      return NULL;
+   }
+
+   std::vector<std::string> names;
+   for (Py_ssize_t i = 0; i < PySequence_Fast_GET_SIZE(py_fast_names); ++i)
+   {
+      const char *s = PyString_AsString(PySequence_Fast_GET_ITEM(py_fast_names, i));
+      if (!s)
+         break;
+      names.push_back(s);
+   }
+   std::vector<double> values;
+   for (Py_ssize_t i = 0; i < PySequence_Fast_GET_SIZE(py_fast_values) && !PyErr_Occurred(); ++i)
+      values.push_back(PyFloat_AsDouble(PySequence_Fast_GET_ITEM(py_fast_values, i)));
+
+   Py_DECREF(py_fast_names);
+   Py_DECREF(py_fast_values);
+   if (PyErr_Occurred())
+      return NULL;
+
+   // We're running in a hook so we already have the thread lock
+   Sim()->getTelemetry()->publish(name, names, values);
+
+   Py_RETURN_NONE;
+}
+
+static PyMethodDef PyTelemetryMethods[] = {
+   { "publish", publish, METH_VARARGS, "Publish the values of a channel (name, list of names, list of values)" },
+   { NULL, NULL, 0, NULL } /* Sentinel */
+};
+
+void HooksPy::PyTelemetry::setup(void)
+{
+   Py_InitModule("sim_telemetry", PyTelemetryMethods);
+}
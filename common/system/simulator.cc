@@ -16,6 +16,7 @@
 #include "pthread_emu.h"
 #include "trace_manager.h"
 #include "dvfs_manager.h"
+#include "telemetry.h"
 #include "hooks_manager.h"
 #include "sampling_manager.h"
 #include "fault_injection.h"
@@ -501,6 +502,7 @@ Simulator::Simulator()
    , m_fastforward_performance_manager(NULL)
    , m_trace_manager(NULL)
    , m_dvfs_manager(NULL)
+   , m_telemetry(NULL)
    , m_hooks_manager(NULL)
    , m_sampling_manager(NULL)
    , m_faultinjection_manager(NULL)
@@ -524,6 +526,7 @@ void Simulator::start()
    m_magic_server = new MagicServer();
    m_transport = Transport::create();
    m_dvfs_manager = new DvfsManager();
+   m_telemetry = new Telemetry();
    m_faultinjection_manager = FaultinjectionManager::create();
    m_thread_stats_manager = new ThreadStatsManager();
    m_clock_skew_minimization_manager = ClockSkewMinimizationManager::create();
@@ -643,6 +646,7 @@ Simulator::~Simulator()
    delete m_thread_stats_manager;      m_thread_stats_manager = NULL;
    delete m_core_manager;              m_core_manager = NULL;
    delete m_dvfs_manager;              m_dvfs_manager = NULL;
+   delete m_telemetry;                 m_telemetry = NULL;
    delete m_magic_server;              m_magic_server = NULL;
    delete m_sync_server;               m_sync_server = NULL;
    delete m_syscall_server;            m_syscall_server = NULL;
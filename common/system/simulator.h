@@ -31,6 +31,7 @@ class FaultinjectionManager;
 class TagsManager;
 class RoutineTracer;
 class MemoryTracker;
+class Telemetry;
 namespace config { class Config; }
 
 class Simulator
@@ -70,6 +71,7 @@ public:
    StatsManager *getStatsManager() { return m_stats_manager; }
    ThreadStatsManager *getThreadStatsManager() { return m_thread_stats_manager; }
    DvfsManager *getDvfsManager() { return m_dvfs_manager; }
+   Telemetry *getTelemetry() { return m_telemetry; }
    HooksManager *getHooksManager() { return m_hooks_manager; }
    SamplingManager *getSamplingManager() { return m_sampling_manager; }
    FaultinjectionManager *getFaultinjectionManager() { return m_faultinjection_manager; }
@@ -108,6 +110,7 @@ private:
    FastForwardPerformanceManager *m_fastforward_performance_manager;
    TraceManager *m_trace_manager;
    DvfsManager *m_dvfs_manager;
+   Telemetry *m_telemetry;
    HooksManager *m_hooks_manager;
    SamplingManager *m_sampling_manager;
    FaultinjectionManager *m_faultinjection_manager;
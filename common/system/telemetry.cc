@@ -0,0 +1,23 @@
+#include "telemetry.h"
+
+void Telemetry::publish(const std::string &name, const std::vector<std::string> &names, const std::vector<double> &values)
+{
+   Channel &channel = m_channels[name];
+   // the names rarely change between epochs, only re-index when they do
+   if (names != channel.names)
+   {
+      channel.names = names;
+      channel.index.clear();
+      for (size_t i = 0; i < names.size(); ++i)
+         channel.index.emplace(names[i], i);
+   }
+   channel.values = values;
+}
+
+const Telemetry::Channel* Telemetry::getChannel(const std::string &name) const
+{
+   auto it = m_channels.find(name);
+   if (it == m_channels.end())
+      return NULL;
+   return &it->second;
+}
@@ -0,0 +1,30 @@
+#ifndef __TELEMETRY_H
+#define __TELEMETRY_H
+
+#include <string>
+#include <unordered_map>
+#include <vector>
+
+// Named vectors published by the Python scripts (sim.telemetry.publish), e.g. the temperatures of
+// every thermal epoch, for the scheduler and its policies to read without going through log files.
+// A channel is named after the log file it mirrors.
+
+class Telemetry
+{
+public:
+   struct Channel
+   {
+      std::vector<std::string> names;
+      std::vector<double> values;
+      std::unordered_map<std::string, size_t> index; // first position of each name
+   };
+
+   void publish(const std::string &name, const std::vector<std::string> &names, const std::vector<double> &values);
+   // NULL if nothing was published on the channel yet
+   const Channel* getChannel(const std::string &name) const;
+
+private:
+   std::unordered_map<std::string, Channel> m_channels;
+};
+
+#endif /* __TELEMETRY_H */
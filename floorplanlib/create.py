@@ -15,8 +15,13 @@ TIM_THERMAL_RESISTIVITY = 0.25
 AIR_SPECIFIC_HEAT_CAPACITY = 2875000
 AIR_THERMAL_RESISTIVITY = 0.13
 
+DEFAULT_GRID = (8, 8)
+MAX_AUTO_GRID = 128
+AUTO_GRID_CELLS_PER_BLOCK = 2
+
 
 HERE = os.path.dirname(os.path.abspath(__file__))
+HOTSPOT = os.path.join(HERE, '..', 'hotspot_tool', 'hotspot')
 
 
 class Length(object):
@@ -104,6 +109,19 @@ def dimension_2d_or_3d(s):
             raise argparse.ArgumentTypeError('invalid format. Valid examples: 4x4, 8x8x1')
 
 
+def grid_resolution(s):
+    """ HotSpot grid rows x cols (powers of two) or auto """
+    if s == 'auto':
+        return s
+    try:
+        rows, cols = dimension_2d(s)
+    except argparse.ArgumentTypeError:
+        raise argparse.ArgumentTypeError('invalid format. Valid examples: auto, 8x8, 16x32')
+    if rows <= 0 or cols <= 0 or rows & (rows - 1) or cols & (cols - 1):
+        raise argparse.ArgumentTypeError('grid rows and cols must be powers of two')
+    return rows, cols
+
+
 def dimension_extend_to_3d(s):
     try:
         return dimension_3d(s)
@@ -545,11 +563,49 @@ class ThermalStack(object):
             for nb, layer in enumerate(self.layers):
                 f.write(layer.get_layer_configuration_string(directory, nb))
 
-    def _write_hotspot_config(self, directory):
+    def _has_cores(self):
+        for layer in self.layers:
+            if isinstance(layer, PadWithAirLayer):
+                layer = layer.content
+            if isinstance(layer, (CoreLayer, CoreAndMemoryControllerLayer)):
+                return True
+        return False
+
+    def _auto_grid(self, directory):
+        """
+        smallest grid (powers of two) with at least AUTO_GRID_CELLS_PER_BLOCK grid cells across the
+        smallest block of any layer. HotSpot uses the same grid for all layers of a stack, so the
+        finest layer determines it. Stacks with cores are never coarser than DEFAULT_GRID
+        """
+        widths, heights = [], []
+        for layer in self.layers:
+            for c in floorplan_file(layer._get_floorplan_filename(directory)).components:
+                # padding blocks may be empty
+                if c.width.micrometers > 1 and c.height.micrometers > 1:
+                    widths.append(c.width.micrometers)
+                    heights.append(c.height.micrometers)
+
+        def cells(feature, total, minimum):
+            n = minimum
+            while n * feature < AUTO_GRID_CELLS_PER_BLOCK * total and n < MAX_AUTO_GRID:
+                n *= 2
+            return n
+
+        minimum = DEFAULT_GRID if self._has_cores() else (1, 1)
+        total_width = self.layers[0].total_width.micrometers
+        total_height = self.layers[0].total_height.micrometers
+        return (cells(min(heights, default=total_height), total_height, minimum[0]),
+                cells(min(widths, default=total_width), total_width, minimum[1]))
+
+    def _write_hotspot_config(self, directory, grid):
         with open(os.path.join(HERE, 'hotspot.config.tmpl'), 'r') as f:
             raw_content = f.read()
         chip_size = max(self.layers[0].total_width, self.layers[0].total_height).meters
+        if grid == 'auto':
+            grid = self._auto_grid(directory)
         formatted_content = raw_content.format(
+            grid_rows=grid[0],
+            grid_cols=grid[1],
             s_solder=chip_size + 0.001,
             s_sub=chip_size + 0.02,
             s_spreader=chip_size + 0.02,
@@ -562,7 +618,21 @@ class ThermalStack(object):
     def _write_configuration_help(self, directory):
         pass  # TODO: implement
 
-    def write_files(self, directory):
+    def hotspot_args(self, directory):
+        """
+        hotspot options that describe the thermal network of the stack, as memTherm passes them
+        """
+        return [
+            '-c', os.path.join(directory, f'{self.name}_hotspot.config'),
+            '-grid_layer_file', os.path.join(directory, f'{self.name}.lcf'),
+            '-model_type', 'grid', '-model_secondary', '1', '-detailed_3D', 'on',
+        ]
+
+    def write_rom(self, directory, moments):
+        import rom  # needs numpy
+        rom.build(self.hotspot_args(directory), os.path.join(directory, f'{self.name}.rom'), moments)
+
+    def write_files(self, directory, grid=DEFAULT_GRID):
         for l in self.layers[1:]:
             assert l.total_width == self.layers[0].total_width
             assert l.total_height == self.layers[1].total_height
@@ -574,7 +644,7 @@ class ThermalStack(object):
             layer.write_floorplan(directory)
             # flp_to_pdf(layer._get_floorplan_filename(directory))  does not work due to fig2ps errors
         self._write_lcf(directory)
-        self._write_hotspot_config(directory)
+        self._write_hotspot_config(directory, grid)
         self._write_configuration_help(directory)
 
 
@@ -610,8 +680,14 @@ def main():
     parser.add_argument("--tim_thickness", help="thickness of the TIM", type=length, required=False, default='20um')
     parser.add_argument("--interposer_thickness", help="only 2.5D: thickness of the interposer", type=length, required=False, default='50um')
     required.add_argument("--out", help="directory in which the floorplan is stored", required=True)
+    parser.add_argument("--grid", help="HotSpot grid resolution of each stack: rows x cols (powers of two) or auto to derive it from the finest floorplan feature of the stack's layers, at least 8x8 with cores (default: 8x8)", type=grid_resolution, required=False, default='8x8')
+    parser.add_argument("--rom", help="also build a reduced order thermal model <stack>.rom of each stack (hotspot/transient_solver = rom, needs numpy and hotspot_tool/hotspot)", action='store_true')
+    parser.add_argument("--rom-moments", help="no. of block moments matched by the reduced order model (default: 2)", type=int, required=False, default=2)
     args = parser.parse_args()    
 
+    if args.rom and not os.path.exists(HOTSPOT):
+        parser.error('--rom needs the hotspot binary, build it first (make -C hotspot_tool)')
+
     cores_per_layer = args.cores[0] * args.cores[1]
     cores_2d = (args.cores[0], args.cores[1])
 
@@ -621,6 +697,7 @@ def main():
         if args.subcore_template.width != args.corex or args.subcore_template.height != args.corey:
             parser.error('subcore-template must be same size as a single core')
 
+    stacks = []
     if args.mode == 'DDR':
         if len(args.banks) != 2:
             parser.error('banks must be 2D in DDR mode. Example: --banks 4x4')
@@ -629,13 +706,15 @@ def main():
         for i in range(args.cores[2]):
             core.add_layer(CoreLayer(cores_2d, args.corex, args.corey, args.core_thickness, name=f'cores_{i+1}', nb_offset=i*cores_per_layer, subcomponent_template=args.subcore_template))
             core.add_layer(TIMLayer(cores_2d, args.corex, args.corey, args.tim_thickness, name='core_tim'))
-        core.write_files(args.out)
+        core.write_files(args.out, args.grid)
+        stacks.append(core)
 
         banks_2d = (args.banks[0], args.banks[1])
         mem = ThermalStack('mem', has_heatsink=False)
         mem.add_layer(MemoryLayer(args.banks, args.bankx, args.banky, args.bank_thickness, name='mem'))
         mem.add_layer(TIMLayer(banks_2d, args.bankx, args.banky, args.tim_thickness, name='mem_tim'))
-        mem.write_files(args.out)
+        mem.write_files(args.out, args.grid)
+        stacks.append(mem)
 
     elif args.mode == '3Dmem':
         if len(args.banks) != 3:
@@ -648,7 +727,8 @@ def main():
         for i in range(args.cores[2]):
             core.add_layer(CoreLayer(cores_2d, args.corex, args.corey, args.core_thickness, name=f'cores_{i+1}', nb_offset=i*cores_per_layer, subcomponent_template=args.subcore_template))
             core.add_layer(TIMLayer(cores_2d, args.corex, args.corey, args.tim_thickness, name='core_tim'))
-        core.write_files(args.out)
+        core.write_files(args.out, args.grid)
+        stacks.append(core)
 
         mem = ThermalStack('mem')
         mem.add_layer(MemoryControllerLayer(banks_2d, args.bankx, args.banky, args.bank_thickness, name='mem_ctrl'))
@@ -657,7 +737,8 @@ def main():
             mem.add_layer(tim)
             mem.add_layer(MemoryLayer(banks_2d, args.bankx, args.banky, args.bank_thickness, name=f'mem_bank_{i+1}', nb_offset=i*banks_per_layer))
         mem.add_layer(tim)
-        mem.write_files(args.out)
+        mem.write_files(args.out, args.grid)
+        stacks.append(mem)
 
     elif args.mode == '2.5D':
         if len(args.banks) != 3:
@@ -698,7 +779,8 @@ def main():
             mem_banks = MemoryLayer(banks_2d, args.bankx, args.banky, args.bank_thickness, name=f'mem_bank_{i+1}', pos_offset=mem_offset, nb_offset=i*banks_per_layer)
             stack.add_layer(PadWithAirLayer(total_width, total_height, mem_banks, force={'left': True, 'top': True, 'bottom': True}))
         stack.add_layer(tim)
-        stack.write_files(args.out)
+        stack.write_files(args.out, args.grid)
+        stacks.append(stack)
 
     elif args.mode == '3D':
         if len(args.banks) != 3:
@@ -723,10 +805,15 @@ def main():
             stack.add_layer(CoreLayer(cores_2d, args.corex, args.corey, args.core_thickness, name=f'cores_{i+1}', nb_offset=i*cores_per_layer, subcomponent_template=args.subcore_template))
             stack.add_layer(tim)
 
-        stack.write_files(args.out)
+        stack.write_files(args.out, args.grid)
+        stacks.append(stack)
     else:
         raise Exception('unknown mode')
 
+    if args.rom:
+        for stack in stacks:
+            stack.write_rom(args.out, args.rom_moments)
+
     with open(os.path.join(args.out, 'commandline.txt'), 'w') as f:
         f.write(f'''\
 # command used to create these files:
@@ -0,0 +1,257 @@
+"""
+Reduced order thermal model of a HotSpot grid model.
+
+HotSpot's grid model is a linear RC network over all grid cells of all
+layers plus the package nodes:
+
+    C dT/dt = -G (T - ambient) + P p
+
+with the diagonal node capacitances C, the conductance matrix G and the
+matrix P spreading the block powers p over the grid cells. This
+tool projects it onto a Krylov subspace (block moment matching around
+s = 0, as in PRIMA) spanned by
+
+    G^-1 P, (G^-1 C) G^-1 P, ...
+
+and diagonalizes the projected system. HotSpot with
+-transient_solver rom -rom_file <file> then only advances the decoupled
+modes (a dense order x nodes projection per epoch) instead of integrating
+the full grid.
+
+The RC network is taken from HotSpot itself (hotspot -dump_rc), so the
+model matches the floorplans, layer stack and hotspot.config exactly as
+the simulation uses them. HotSpot refuses a model built for another
+network.
+
+usage: rom.py --out <file.rom> [--moments N] -- <hotspot options>
+
+The hotspot options are those of the simulation that describe the thermal
+network, e.g. -c mem_hotspot.config -grid_layer_file mem.lcf
+-model_type grid -model_secondary 1 -detailed_3D on
+"""
+
+import argparse
+import os
+import struct
+import subprocess
+import tempfile
+
+import numpy as np
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HOTSPOT = os.path.join(HERE, '..', 'hotspot_tool', 'hotspot')
+
+RC_DUMP_MAGIC = 0x43525348
+ROM_MAGIC = 0x4d4f5248
+
+# networks up to this many nodes are solved with dense linear algebra
+DENSE_LIMIT = 6000
+
+
+class RCNetwork(object):
+    """ RC network of a grid model as dumped by hotspot -dump_rc """
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            data = f.read()
+        magic, n, nblocks, nnz, self.key, self.ambient = struct.unpack_from('<iiiiQd', data)
+        if magic != RC_DUMP_MAGIC:
+            raise ValueError(f'{filename} is not a HotSpot RC network dump')
+        offset = struct.calcsize('<iiiiQd')
+
+        def take(dtype, count):
+            nonlocal offset
+            array = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes
+            return array
+
+        self.n = n
+        self.capacitances = take('<f8', n)
+        self.slope0 = take('<f8', n)
+        rows = take('<i4', nnz)
+        cols = take('<i4', nnz)
+        jacobian = take('<f8', nnz)
+        self.power = take('<f8', nblocks * n).reshape(nblocks, n)
+
+        # C dT/dt = C J T + C slope0, hence G = -C J
+        self.conductance = SparseMatrix(n, rows, cols, -self.capacitances[rows] * jacobian)
+
+    def check(self):
+        """ the network is at rest at ambient temperature when there is no power """
+        residual = -self.conductance.matmul(np.full(self.n, self.ambient)) / self.capacitances + self.slope0
+        scale = np.abs(self.slope0).max() or 1.
+        if np.abs(residual).max() > 1e-6 * scale:
+            raise ValueError('the RC network has heat sources other than the power inputs and the ambient')
+
+
+class SparseMatrix(object):
+    """ sparse matrix in compressed sparse row format """
+    def __init__(self, n, rows, cols, vals):
+        order = np.lexsort((cols, rows))
+        self.n = n
+        self.rows = rows[order]
+        self.cols = cols[order]
+        self.vals = vals[order]
+        self.rowptr = np.searchsorted(self.rows, np.arange(n + 1))
+        if (np.diff(self.rowptr) == 0).any():
+            raise ValueError('node without a conductance to the rest of the network')
+        self.diagonal = np.zeros(n)
+        diagonal = self.rows == self.cols
+        self.diagonal[self.rows[diagonal]] = self.vals[diagonal]
+        self._dense_inverse = None
+
+    def matmul(self, x):
+        products = self.vals.reshape((-1,) + (1,) * (x.ndim - 1)) * x[self.cols]
+        return np.add.reduceat(products, self.rowptr[:-1], axis=0)
+
+    def dense(self):
+        a = np.zeros((self.n, self.n))
+        np.add.at(a, (self.rows, self.cols), self.vals)
+        return a
+
+    def solve(self, b, tol=1e-12, maxiter=100000):
+        """ G^-1 b, dense for small networks, Jacobi preconditioned BiCGSTAB otherwise """
+        if self.n <= DENSE_LIMIT:
+            if self._dense_inverse is None:
+                self._dense_inverse = np.linalg.inv(self.dense())
+            return self._dense_inverse @ b
+
+        def divide(a, b):
+            return np.divide(a, b, out=np.zeros_like(a), where=b != 0)
+
+        # one independent BiCGSTAB iteration per column
+        d = self.diagonal[:, None]
+        x = np.zeros_like(b)
+        r = b.copy()
+        r0 = r.copy()
+        p = np.zeros_like(b)
+        v = np.zeros_like(b)
+        rho = alpha = omega = np.ones(b.shape[1])
+        limit = tol * np.linalg.norm(b, axis=0)
+        for _ in range(maxiter):
+            rho_new = (r0 * r).sum(axis=0)
+            beta = divide(rho_new, rho) * divide(alpha, omega)
+            rho = rho_new
+            p = r + beta * (p - omega * v)
+            y = p / d
+            v = self.matmul(y)
+            alpha = divide(rho, (r0 * v).sum(axis=0))
+            s = r - alpha * v
+            z = s / d
+            t = self.matmul(z)
+            omega = divide((t * s).sum(axis=0), (t * t).sum(axis=0))
+            x += alpha * y + omega * z
+            r = s - omega * t
+            if (np.linalg.norm(r, axis=0) <= limit).all():
+                return x
+        raise RuntimeError('BiCGSTAB did not converge')
+
+
+def c_orthonormalize(block, basis, capacitances, tol):
+    """ columns spanning block, C-orthonormal among themselves and to basis; dependent columns are dropped """
+    for _ in range(2):
+        for v in basis:
+            block = block - v @ (v.T @ (capacitances[:, None] * block))
+    sqrt_c = np.sqrt(capacitances)[:, None]
+    u, s, _ = np.linalg.svd(sqrt_c * block, full_matrices=False)
+    if not len(s) or s[0] == 0:
+        return block[:, :0]
+    return u[:, s > tol * s[0]] / sqrt_c
+
+
+def reduce(network, moments=2, tol=1e-8):
+    """
+    returns the decay rates, the modes and the left modes of the reduced model.
+    HotSpot's package network is not quite reciprocal (the substrate sees the
+    solder balls, not the other way round), so G is not symmetric and the
+    projected system is diagonalized with left and right eigenvectors
+    """
+    capacitances = network.capacitances
+    g = network.conductance
+    inputs = network.power[np.abs(network.power).sum(axis=1) > 0].T
+
+    basis = []
+    block = g.solve(inputs)
+    for _ in range(moments):
+        v = c_orthonormalize(block, basis, capacitances, tol)
+        if not v.shape[1]:
+            break
+        basis.append(v)
+        block = g.solve(capacitances[:, None] * v)
+    v = np.hstack(basis)
+
+    # V'CV = I: dz/dt = -V'GV z + V'p
+    gr = v.T @ g.matmul(v)
+    rates, q = np.linalg.eig(gr)
+    if np.abs(rates.imag).max() > 1e-6 * np.abs(rates).max():
+        raise ValueError('reduced model has oscillating modes')
+    # (nearly) repeated rates may come as complex conjugate pairs. their real
+    # and imaginary parts span the same, real, invariant subspace
+    pairs = np.flatnonzero(rates.imag > 0)
+    q[:, pairs + 1] = q[:, pairs].imag
+    q = q.real
+    rates = np.diag(np.linalg.solve(q, gr @ q)).copy()
+    if (rates <= 0).any():
+        raise ValueError('reduced model is not stable')
+    order = np.argsort(rates)
+    rates, q = rates[order], q[:, order]
+    return rates, v @ q, v @ np.linalg.inv(q).T
+
+
+def steady_state_error(network, rates, modes, left_modes):
+    """ largest error (K) of the steady state temperatures for all blocks at unit power """
+    p = network.power.sum(axis=0)
+    exact = network.conductance.solve(p[:, None])[:, 0]
+    reduced = modes @ ((left_modes.T @ p) / rates)
+    return np.abs(exact - reduced).max(), np.abs(exact).max()
+
+
+def write_rom(filename, key, rates, modes, left_modes):
+    n, order = modes.shape
+    with open(filename + '.tmp', 'wb') as f:
+        f.write(struct.pack('<iiiiQ', ROM_MAGIC, n, order, 0, key))
+        f.write(np.ascontiguousarray(rates, dtype='<f8').tobytes())
+        f.write(np.ascontiguousarray(modes, dtype='<f8').tobytes())
+        f.write(np.ascontiguousarray(left_modes, dtype='<f8').tobytes())
+    os.rename(filename + '.tmp', filename)
+
+
+def dump_rc(hotspot_args, hotspot=HOTSPOT):
+    """ the RC network of the grid model that hotspot builds from hotspot_args """
+    fd, filename = tempfile.mkstemp(suffix='.rc')
+    os.close(fd)
+    try:
+        subprocess.check_call([hotspot] + list(hotspot_args) + ['-p', os.devnull, '-dump_rc', filename],
+                              stdout=subprocess.DEVNULL)
+        return RCNetwork(filename)
+    finally:
+        os.unlink(filename)
+
+
+def build(hotspot_args, out, moments=2, hotspot=HOTSPOT, verbose=True):
+    network = dump_rc(hotspot_args, hotspot)
+    network.check()
+    rates, modes, left_modes = reduce(network, moments)
+    write_rom(out, network.key, rates, modes, left_modes)
+    if verbose:
+        error, rise = steady_state_error(network, rates, modes, left_modes)
+        print(f'{out}: {network.n} nodes reduced to {len(rates)} modes, '
+              f'steady state error {error:.3g}K for a {rise:.3g}K rise at 1W per block')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='build a reduced order model for hotspot -transient_solver rom')
+    parser.add_argument('--out', help='reduced order model file', required=True)
+    parser.add_argument('--moments', help='no. of block moments matched (default: 2)', type=int, default=2)
+    parser.add_argument('--hotspot', help='hotspot binary', default=HOTSPOT)
+    parser.add_argument('hotspot_args', nargs=argparse.REMAINDER, help='-- followed by the hotspot options of the simulation')
+    args = parser.parse_args()
+
+    hotspot_args = args.hotspot_args[1:] if args.hotspot_args[:1] == ['--'] else args.hotspot_args
+    if not hotspot_args:
+        parser.error('hotspot options missing')
+    build(hotspot_args, args.out, args.moments, args.hotspot)
+
+
+if __name__ == '__main__':
+    main()
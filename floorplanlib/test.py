@@ -7,6 +7,7 @@ import sys
 
 
 FloorplanTestConfig = namedtuple('FloorplanTestConfig', ['name', 'commandline_args'])
+GridTestConfig = namedtuple('GridTestConfig', ['name', 'commandline_args', 'grids'])
 
 
 def check_result(test_name):
@@ -79,6 +80,49 @@ def run(test, expect_fail=False):
         return True
 
 
+def read_grid(config_filename):
+    grid = {}
+    with open(config_filename) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 2 and fields[0] in ('-grid_rows', '-grid_cols'):
+                grid[fields[0]] = int(fields[1])
+    return grid['-grid_rows'], grid['-grid_cols']
+
+
+def run_grid(test):
+    # the grid resolution (rows, cols) chosen for each stack, test.grids maps the stack names to the expected one
+    actual = os.path.join('test/actual', test.name)
+    args = test.commandline_args + ['--out', actual]
+
+    if os.path.exists(actual):
+        shutil.rmtree(actual)
+
+    print(f'{test.name:<35s}: ', end='')
+    try:
+        subprocess.check_output(['python3', 'create.py'] + args, stderr=subprocess.STDOUT)
+    except subprocess.CalledProcessError as e:
+        print(f'ERROR (call failed)')
+        for line in e.output.decode('utf-8').splitlines():
+            print(f'   {line}')
+        return False
+
+    errors = []
+    for stack, expected in sorted(test.grids.items()):
+        grid = read_grid(os.path.join(actual, f'{stack}_hotspot.config'))
+        if grid != expected:
+            errors.append(f'{stack}: grid {grid[0]}x{grid[1]}, expected {expected[0]}x{expected[1]}')
+
+    if errors:
+        print(f'ERROR')
+        for error in errors:
+            print(f'   {error}')
+        return False
+    else:
+        print(f'ok')
+        return True
+
+
 def main():
     TESTS = [
         FloorplanTestConfig(
@@ -141,6 +185,15 @@ def main():
                 '--banks', '8x8x4', '--bankx', '0.45mm', '--banky', '0.45mm',
             ]
         ),
+        FloorplanTestConfig(
+            name='3d_offchip_auto_grid',
+            commandline_args=[
+                '--mode', '3Dmem',
+                '--cores', '4x4', '--corex', '1mm', '--corey', '1mm',
+                '--banks', '8x8x2', '--bankx', '0.9mm', '--banky', '0.9mm',
+                '--grid', 'auto',
+            ]
+        ),
         FloorplanTestConfig(
             name='2d_subcore',
             commandline_args=[
@@ -176,6 +229,41 @@ def main():
         ),
     ]
 
+    GRID_TESTS = [
+        # at least two cells across a core and never coarser than the default 8x8 with cores,
+        # two cells across a bank for the memory stack
+        GridTestConfig(
+            name='auto_grid_3d_offchip',
+            commandline_args=[
+                '--mode', '3Dmem',
+                '--cores', '4x4', '--corex', '1mm', '--corey', '1mm',
+                '--banks', '8x8x2', '--bankx', '0.9mm', '--banky', '0.9mm',
+                '--grid', 'auto',
+            ],
+            grids={'cores': (8, 8), 'mem': (16, 16)},
+        ),
+        GridTestConfig(
+            name='auto_grid_2d_large_banks',
+            commandline_args=[
+                '--mode', 'DDR',
+                '--cores', '2x2', '--corex', '1mm', '--corey', '1mm',
+                '--banks', '2x2', '--bankx', '2mm', '--banky', '2mm',
+                '--grid', 'auto',
+            ],
+            grids={'cores': (8, 8), 'mem': (4, 4)},
+        ),
+        GridTestConfig(
+            name='auto_grid_2d_subcore',
+            commandline_args=[
+                '--mode', 'DDR',
+                '--cores', '2x2', '--corex', '1mm', '--corey', '1mm', '--subcore-template', 'test/files/subcore_1mm.flp',
+                '--banks', '8x8', '--bankx', '0.9mm', '--banky', '0.9mm',
+                '--grid', 'auto',
+            ],
+            grids={'cores': (16, 8), 'mem': (16, 16)},
+        ),
+    ]
+
     EXPECT_TO_FAIL_TESTS = [
         FloorplanTestConfig(
             name='2d_subcore_floorplan_does_not_exist',
@@ -205,6 +293,13 @@ def main():
             fails += 1
         total += 1
 
+    for test in GRID_TESTS:
+        assert test.name not in seen_names
+        seen_names.add(test.name)
+        if not run_grid(test):
+            fails += 1
+        total += 1
+
     for test in EXPECT_TO_FAIL_TESTS:
         assert test.name not in seen_names
         seen_names.add(test.name)
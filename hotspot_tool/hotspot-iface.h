@@ -92,6 +92,10 @@ typedef struct thermal_config_t_st
 	char grid_map_mode[STR_SIZE];
 	char all_transient_file[STR_SIZE];
  	int steady_state_print_disable;	
+	int transient_only;	/* skip the steady state solve	*/
+	char transient_solver[STR_SIZE];
+	int implicit_steps;
+	char state_format[STR_SIZE];
 	int detailed_3D_used; //BU_3D: Added parameter to check for heterogenous R-C model 
 }thermal_config_t;
 
@@ -10,6 +10,7 @@
 #include <string.h>
 #include <ctype.h>
 #include <math.h>
+#include <unistd.h>
 
 #include "flp.h"
 #include "package.h"
@@ -83,6 +84,10 @@ void usage(int argc, char **argv)
   fprintf(stdout, "           \toverride the options from config file. e.g. \"-model_type block\" selects\n");
   fprintf(stdout, "           \tthe block model while \"-model_type grid\" selects the grid model\n");
   fprintf(stdout, "  [-detailed_3D <on/off]>\tHeterogeneous R-C assignments for specified layers. Requires a .lcf file to be specified\n"); //BU_3D: added detailed_3D option
+  fprintf(stdout, "  [-server <0/1>]\tkeep the model resident and read one power vector per epoch\n");
+  fprintf(stdout, "            \tfrom stdin instead of the power trace (the trace header is still read)\n");
+  fprintf(stdout, "  [-dump_rc <file>]\twrite the RC network of the grid model to file and exit\n");
+  fprintf(stdout, "            \t(input of floorplanlib/rom.py, see -transient_solver rom)\n");
 }
 
 /* 
@@ -168,6 +173,20 @@ void global_config_from_strs(global_config_t *config, str_pair *table, int size)
       strcpy(config->bm_infile, NULLFILE);
   }
 
+  if ((idx = get_str_index(table, size, "server")) >= 0) {
+      if(sscanf(table[idx].value, "%d", &config->server) != 1)
+        fatal("invalid format for configuration  parameter server\n");
+  } else {
+      config->server = 0;
+  }
+
+  if ((idx = get_str_index(table, size, "dump_rc")) >= 0) {
+      if(sscanf(table[idx].value, "%s", config->rc_dump_file) != 1)
+        fatal("invalid format for configuration  parameter rc_dump_file\n");
+  } else {
+      strcpy(config->rc_dump_file, NULLFILE);
+  }
+
 }
 
 /* 
@@ -372,6 +391,173 @@ void free_names(char **m)
   free(m);
 }
 
+/* fill the per-core leakage enable flags from leakage_vector	*/
+void parse_leakage_vector(void)
+{
+  int i;
+  int length_lv = strlen(leakage_vector);
+
+  for (i = 0; i < (length_lv/2); ++i)
+    leakage[i] = 1;
+
+  for (i = 0; i < length_lv; ++i) {
+      if (leakage_vector[i] == '0')
+        leakage[(int)i/2] = 0;
+      if (leakage_vector[i] == '1')
+        leakage[(int)i/2] = 1;
+  }
+}
+
+/* fill the per-core normalized voltages (x10) from volt_vector	*/
+void parse_volt_vector(void)
+{
+  int i;
+  int length_v = strlen(volt_vector);
+
+  for (i = 0; i < 4; ++i)
+    volt[i] = 10;
+
+  for (i = 0; i < length_v; ++i) {
+      if (i == 2) {
+          volt[0] = 10 * (volt_vector[0] - '0') + (volt_vector[2] - '0');
+          continue;
+      }
+      if (i > 2 && volt_vector[i-3] == ',')
+        volt[(int)i/4] = 10 * (volt_vector[i-2] - '0') + (volt_vector[i] - '0');
+  }
+}
+
+/* 
+ * floorplan (model) index of each trace column. computed once from
+ * the trace header so that the power and temperature vectors of every
+ * line can be permuted without looking up the unit names again
+ */
+int *trace_to_model_map(RC_model_t *model, flp_t *flp, char **names, int n)
+{
+  int i, j, base, count;
+  int *map = ivector(n);
+
+  if (model->type == BLOCK_MODEL)
+    for(i=0; i < n; i++)
+      map[i] = get_blk_index(flp, names[i]);
+  else
+    for(i=0, base=0, count=0; i < model->grid->n_layers; i++) {
+        if(model->grid->layers[i].has_power) {
+            for(j=0; j < model->grid->layers[i].flp->n_units; j++)
+              map[count+j] = base + get_blk_index(model->grid->layers[i].flp, names[count+j]);
+            count += model->grid->layers[i].flp->n_units;
+        }
+        base += model->grid->layers[i].flp->n_units;
+    }
+  return map;
+}
+
+/* permute the power numbers according to the floorplan order	*/
+void trace_to_model_order(int *map, int n, double *vals, double *power)
+{
+  int i;
+  for(i=0; i < n; i++)
+    power[map[i]] = vals[i];
+}
+
+/* permute back to the trace file order	*/
+void model_to_trace_order(int *map, int n, double *temp, double *power_withLeak,
+                          double *vals, double *vals_withLeak)
+{
+  int i;
+  for(i=0; i < n; i++) {
+      vals[i] = temp[map[i]];
+      vals_withLeak[i] = power_withLeak[map[i]];
+  }
+}
+
+/*
+ * resident solver mode. the model stays allocated for the whole
+ * simulation and the caller drives it through line-based commands
+ * on stdin:
+ *   v <volt_vector>	update the normalized core voltages
+ *   bm			followed by the two lines of a bank mode trace
+ *   p [<interval>]	followed by one line of power values, in the
+ *   			column order of the power trace header. replies
+ *   			with one line of temperatures and one line of
+ *   			total power (with leakage). the power is applied
+ *   			for <interval> seconds, sampling_intvl if omitted
+ *   dump <file>	dump the transient temperatures (cf. all_transient_file)
+ *   quit
+ * 'temp' carries the state from one epoch to the next just like the
+ * init_file does in the one-shot mode. replies go to the original
+ * stdout, everything else the solver prints is sent to stderr.
+ */
+void serve_epochs(RC_model_t *model, flp_t *flp, int *map, int n, double *temp,
+                  str_pair *table, int size, int natural)
+{
+  char line[LINE_SIZE], arg[LINE_SIZE];
+  double *vals, *vals_withLeak;
+  double *power, *power_withLeak;
+  double avg_sink_temp, interval;
+  float bank_modes[MAX_UNITS];
+  int i, num;
+  FILE *reply;
+
+  reply = fdopen(dup(fileno(stdout)), "w");
+  if (!reply)
+    fatal("unable to open reply stream\n");
+  fflush(stdout);
+  dup2(fileno(stderr), fileno(stdout));
+  /* anything printed while the model was built precedes this line	*/
+  fprintf(reply, "ready\n");
+  fflush(reply);
+
+  vals = dvector(MAX_UNITS);
+  vals_withLeak = dvector(MAX_UNITS);
+  power = hotspot_vector(model);
+  power_withLeak = hotspot_vector(model);
+
+  while (fgets(line, LINE_SIZE, stdin)) {
+      if (!strncmp(line, "p", 1) && isspace((int)line[1])) {
+          if (sscanf(line, "p %lf", &interval) != 1)
+            interval = model->config->sampling_intvl;
+          if ((num = read_vals(stdin, vals)) != n)
+            fatal("invalid power vector\n");
+          trace_to_model_order(map, n, vals, power);
+          /* if natural convection is considered, update transient convection resistance first */
+          if (natural) {
+              avg_sink_temp = calc_sink_temp(model, temp);
+              natural = package_model(model->config, table, size, avg_sink_temp);
+              populate_R_model(model, flp);
+          }
+          compute_temp(model, power, temp, power_withLeak, interval);
+          model_to_trace_order(map, n, temp, power_withLeak, vals, vals_withLeak);
+          write_vals(reply, vals, n);
+          write_vals_power(reply, vals_withLeak, n);
+      } else if (!strncmp(line, "bm", 2) && isspace((int)line[2])) {
+          num = read_bank_modes(stdin, bank_modes);
+          for (i = 0; i < num && i < model->banks_nr; i++)
+            model->bank_modes[i] = bank_modes[i];
+          fprintf(reply, "ok\n");
+      } else if (sscanf(line, "v %s", arg) == 1) {
+          if (strlen(arg) >= sizeof(volt_vector))
+            fatal("volt_vector too long\n");
+          strcpy(volt_vector, arg);
+          parse_volt_vector();
+          fprintf(reply, "ok\n");
+      } else if (sscanf(line, "dump %s", arg) == 1) {
+          dump_state(model, temp, arg);
+          fprintf(reply, "ok\n");
+      } else if (!strncmp(line, "quit", 4)) {
+          break;
+      } else
+        fatal("unknown server command\n");
+      fflush(reply);
+  }
+
+  fclose(reply);
+  free_dvector(power);
+  free_dvector(power_withLeak);
+  free_dvector(vals);
+  free_dvector(vals_withLeak);
+}
+
 /* 
  * main function - reads instantaneous power values (in W) from a trace
  * file (e.g. "gcc.ptrace") and outputs instantaneous temperature values (in C) to
@@ -386,9 +572,11 @@ void free_names(char **m)
  */
 int main(int argc, char **argv)
 {
-  int i, j, idx, base = 0, count = 0, n = 0;
+  int i, j, idx, base = 0, n = 0;
   int num, size, lines = 0, do_transient = TRUE;
   char **names;
+  /* trace column to floorplan index map	*/
+  int *map;
   double *vals;
   double *vals_withLeak;
 
@@ -432,42 +620,8 @@ int main(int argc, char **argv)
   size = parse_cmdline(table, MAX_ENTRIES, argc, argv);
   global_config_from_strs(&global_config, table, size);
 
-  // printf("LOKESH leakage_vector: %s, length = %d",leakage_vector, strlen(leakage_vector));
-  int length_lv = strlen(leakage_vector);	
-for (i = 0; i < (length_lv/2); ++i)
-    leakage[i] = 1;
-
-for (i = 0; i < length_lv; ++i)
-{
-
-  if (leakage_vector[i] == '0')
-    leakage[(int)i/2] = 0;
-  if (leakage_vector[i] == '1')
-    leakage[(int)i/2] = 1;
-  if (leakage_vector[i] == ',')
-    continue;
-}
-
-
-  int length_v = strlen(volt_vector);
-//  printf("length_v = %d\n", length_v);  
-
-//for (i = 0; i < (int)(length_v+1)/4; ++i)
-for (i = 0; i < 4; ++i)
-    volt[i] = 10;
-
-for (i = 0; i < length_v; ++i)
-{
-  if (i==2)
-  {
-    volt[0] = 10 * (volt_vector[0] - '0') + (volt_vector[2] - '0');
-    continue;
-  }
-  if (i>2 && volt_vector[i-3] == ',')
-//    printf ("i = %d", i);
-    volt[(int)i/4] = 10 * (volt_vector[i-2] - '0') + (volt_vector[i] - '0');      
-}
-
+  parse_leakage_vector();
+  parse_volt_vector();
 
 
 //   printf("LOKESH leakage\n", leakage[i]);
@@ -487,6 +641,9 @@ for (i = 0; i < length_v; ++i)
   /* no transient simulation, only steady state	*/
   if(!strcmp(global_config.t_outfile, NULLFILE))
     do_transient = FALSE;
+  /* the resident solver always steps the transient model	*/
+  if (global_config.server)
+    do_transient = TRUE;
 
   /* read configuration file	*/
   if (strcmp(global_config.config, NULLFILE))
@@ -552,6 +709,17 @@ for (i = 0; i < length_v; ++i)
   if (do_transient)
     populate_C_model(model, flp);
 
+  /* only dump the RC network for floorplanlib/rom.py	*/
+  if (strcmp(global_config.rc_dump_file, NULLFILE)) {
+      if (model->type != GRID_MODEL)
+        fatal("the RC network can only be dumped for the grid model\n");
+      if (!do_transient)
+        populate_C_model(model, flp);
+      dump_rc_grid(model->grid, global_config.rc_dump_file);
+      delete_RC_model(model);
+      return 0;
+  }
+
 #if VERBOSE > 2
   debug_print_model(model);
 #endif
@@ -590,15 +758,16 @@ for (i = 0; i < length_v; ++i)
 
   if(!(pin = fopen(global_config.p_infile, "r")))
     fatal("unable to open power trace input file\n");
-  if(do_transient && !(tout = fopen(global_config.t_outfile, "w")))
+  if(do_transient && !global_config.server && !(tout = fopen(global_config.t_outfile, "w")))
     fatal("unable to open temperature trace file for output\n");
-  if(do_transient && !(pout_withLeak = fopen(global_config.pTot_outfile, "w")))
+  if(do_transient && !global_config.server && !(pout_withLeak = fopen(global_config.pTot_outfile, "w")))
     fatal("unable to open power trace file (total power with leakage) for output\n");
 
   /* names of functional units	*/
   names = alloc_names(MAX_UNITS, STR_SIZE);
   if(read_names(pin, names) != n)
     fatal("no. of units in floorplan and trace file differ\n");
+  map = trace_to_model_map(model, flp, names, n);
 
   // Count the number of banks. Necessary for low power mode.
   for (int i = 0; i < n; i++)
@@ -612,7 +781,7 @@ for (i = 0; i < length_v; ++i)
   model->banks_nr = banks_nr;
 
   /* header line of temperature trace	*/
-  if (do_transient){
+  if (do_transient && !global_config.server){
     write_names(tout, names, n);
     write_names(pout_withLeak, names, n);
   }
@@ -643,6 +812,21 @@ for (i = 0; i < length_v; ++i)
   {
     model->bank_modes[i] = bank_modes[i];
   }
+
+  /* resident solver: power vectors come from stdin from here on	*/
+  if (global_config.server) {
+      serve_epochs(model, flp, map, n, temp, table, size, natural);
+      fclose(pin);
+      delete_RC_model(model);
+      free_dvector(temp);
+      free_dvector(power);
+      free_dvector(power_withLeak);
+      free_dvector(steady_temp);
+      free_dvector(overall_power);
+      free_names(names);
+      free_ivector(map);
+      return 0;
+  }
   
   /* read the instantaneous power trace	*/
   vals = dvector(MAX_UNITS);
@@ -652,20 +836,7 @@ for (i = 0; i < length_v; ++i)
         fatal("invalid trace file format\n");
 
       /* permute the power numbers according to the floorplan order	*/
-      if (model->type == BLOCK_MODEL)
-        for(i=0; i < n; i++)
-          power[get_blk_index(flp, names[i])] = vals[i];
-      else
-        for(i=0, base=0, count=0; i < model->grid->n_layers; i++) {
-            if(model->grid->layers[i].has_power) {
-                for(j=0; j < model->grid->layers[i].flp->n_units; j++) {
-                    idx = get_blk_index(model->grid->layers[i].flp, names[count+j]);
-                    power[base+idx] = vals[count+j];
-                }
-                count += model->grid->layers[i].flp->n_units;
-            }	
-            base += model->grid->layers[i].flp->n_units;	
-        }
+      trace_to_model_order(map, n, vals, power);
 
       /* compute temperature	*/
       if (do_transient) {
@@ -687,23 +858,7 @@ for (i = 0; i < length_v; ++i)
             compute_temp(model, power, NULL, power_withLeak, model->config->sampling_intvl);
 
           /* permute back to the trace file order	*/
-          if (model->type == BLOCK_MODEL)
-            for(i=0; i < n; i++){
-              vals[i] = temp[get_blk_index(flp, names[i])];
-              vals_withLeak[i] = power_withLeak[get_blk_index(flp, names[i])];
-			}
-          else
-            for(i=0, base=0, count=0; i < model->grid->n_layers; i++) {
-                if(model->grid->layers[i].has_power) {
-                    for(j=0; j < model->grid->layers[i].flp->n_units; j++) {
-                        idx = get_blk_index(model->grid->layers[i].flp, names[count+j]);
-                        vals[count+j] = temp[base+idx];
-                        vals_withLeak[count+j] = power_withLeak[base+idx];
-                    }
-                    count += model->grid->layers[i].flp->n_units;	
-                }	
-                base += model->grid->layers[i].flp->n_units;	
-            }
+          model_to_trace_order(map, n, temp, power_withLeak, vals, vals_withLeak);
 
           /* output instantaneous temperature trace	*/
           write_vals(tout, vals, n);
@@ -711,16 +866,18 @@ for (i = 0; i < length_v; ++i)
       }		
 
       /* for computing average	*/
-      if (model->type == BLOCK_MODEL)
-        for(i=0; i < n; i++)
-          overall_power[i] += power[i];
-      else
-        for(i=0, base=0; i < model->grid->n_layers; i++) {
-            if(model->grid->layers[i].has_power)
-              for(j=0; j < model->grid->layers[i].flp->n_units; j++)
-                overall_power[base+j] += power[base+j];
-            base += model->grid->layers[i].flp->n_units;	
-        }
+      if (!model->config->transient_only) {
+          if (model->type == BLOCK_MODEL)
+            for(i=0; i < n; i++)
+              overall_power[i] += power[i];
+          else
+            for(i=0, base=0; i < model->grid->n_layers; i++) {
+                if(model->grid->layers[i].has_power)
+                  for(j=0; j < model->grid->layers[i].flp->n_units; j++)
+                    overall_power[base+j] += power[base+j];
+                base += model->grid->layers[i].flp->n_units;	
+            }
+      }
 
       lines++;
   }
@@ -728,63 +885,66 @@ for (i = 0; i < length_v; ++i)
   if(!lines)
     fatal("no power numbers in trace file\n");
 
-  /* for computing average	*/
-  if (model->type == BLOCK_MODEL)
-    for(i=0; i < n; i++) {
-        overall_power[i] /= lines;
-        total_power += overall_power[i];
-    }
-  else
-    for(i=0, base=0; i < model->grid->n_layers; i++) {
-        if(model->grid->layers[i].has_power)
-          for(j=0; j < model->grid->layers[i].flp->n_units; j++) {
-              overall_power[base+j] /= lines;
-              total_power += overall_power[base+j];
-          }
-        base += model->grid->layers[i].flp->n_units;	
-    }
+  /* transient-only runs skip the steady state solve and its outputs	*/
+  if (!model->config->transient_only) {
+      /* for computing average	*/
+      if (model->type == BLOCK_MODEL)
+        for(i=0; i < n; i++) {
+            overall_power[i] /= lines;
+            total_power += overall_power[i];
+        }
+      else
+        for(i=0, base=0; i < model->grid->n_layers; i++) {
+            if(model->grid->layers[i].has_power)
+              for(j=0; j < model->grid->layers[i].flp->n_units; j++) {
+                  overall_power[base+j] /= lines;
+                  total_power += overall_power[base+j];
+              }
+            base += model->grid->layers[i].flp->n_units;	
+        }
 
-  /* natural convection r_convec iteration, for steady-state only */ 		
-  natural_convergence = 0;
-  if (natural) { /* natural convection is used */
-      while (!natural_convergence) {
-          r_convec_old = model->config->r_convec;
-          /* steady state temperature	*/
-          steady_state_temp(model, overall_power, steady_temp);
-          avg_sink_temp = calc_sink_temp(model, steady_temp) + SMALL_FOR_CONVEC;
-          natural = package_model(model->config, table, size, avg_sink_temp);
-          populate_R_model(model, flp);
-          if (avg_sink_temp > MAX_SINK_TEMP)
-            fatal("too high power for a natural convection package -- possible thermal runaway\n");
-          if (fabs(model->config->r_convec-r_convec_old)<NATURAL_CONVEC_TOL) 
-            natural_convergence = 1;
-      }
-  }	else /* natural convection is not used, no need for iterations */
-    /* steady state temperature	*/
-    steady_state_temp(model, overall_power, steady_temp);
+      /* natural convection r_convec iteration, for steady-state only */ 		
+      natural_convergence = 0;
+      if (natural) { /* natural convection is used */
+          while (!natural_convergence) {
+              r_convec_old = model->config->r_convec;
+              /* steady state temperature	*/
+              steady_state_temp(model, overall_power, steady_temp);
+              avg_sink_temp = calc_sink_temp(model, steady_temp) + SMALL_FOR_CONVEC;
+              natural = package_model(model->config, table, size, avg_sink_temp);
+              populate_R_model(model, flp);
+              if (avg_sink_temp > MAX_SINK_TEMP)
+                fatal("too high power for a natural convection package -- possible thermal runaway\n");
+              if (fabs(model->config->r_convec-r_convec_old)<NATURAL_CONVEC_TOL) 
+                natural_convergence = 1;
+          }
+      }	else /* natural convection is not used, no need for iterations */
+        /* steady state temperature	*/
+        steady_state_temp(model, overall_power, steady_temp);
 
-  /* print steady state results	*/
-  //BU_3D: Only print steady state results to stdout when DEBUG3D flag is not set
-    // printf(" HERE 1\n");
+      /* print steady state results	*/
+      //BU_3D: Only print steady state results to stdout when DEBUG3D flag is not set
+      // printf(" HERE 1\n");
 #if DEBUG3D < 1
-// printf("Value=%d\n",model->config->steady_state_print_disable);
- if(model->config->steady_state_print_disable == 0) {
-  fprintf(stdout, "Unit\tSteady(Kelvin)\n");
-  dump_temp(model, steady_temp, "stdout");
- }
+      // printf("Value=%d\n",model->config->steady_state_print_disable);
+      if(model->config->steady_state_print_disable == 0) {
+          fprintf(stdout, "Unit\tSteady(Kelvin)\n");
+          dump_temp(model, steady_temp, "stdout");
+      }
 #endif //end->BU_3D
 
-  /* dump steady state temperatures on to file if needed	*/
-  if (strcmp(model->config->steady_file, NULLFILE))
-    dump_temp(model, steady_temp, model->config->steady_file);
-
-  // printf(" HERE 2\n");
-  /* for the grid model, optionally dump the most recent 
-   * steady state temperatures of the grid cells	
-   */
-  if (model->type == GRID_MODEL &&
-      strcmp(model->config->grid_steady_file, NULLFILE))
-    dump_steady_temp_grid(model->grid, model->config->grid_steady_file);
+      /* dump steady state temperatures on to file if needed	*/
+      if (strcmp(model->config->steady_file, NULLFILE))
+        dump_temp(model, steady_temp, model->config->steady_file);
+
+      // printf(" HERE 2\n");
+      /* for the grid model, optionally dump the most recent 
+       * steady state temperatures of the grid cells	
+       */
+      if (model->type == GRID_MODEL &&
+          strcmp(model->config->grid_steady_file, NULLFILE))
+        dump_steady_temp_grid(model->grid, model->config->grid_steady_file);
+  }
 
   // printf(" HERE 3\n");
 #if VERBOSE > 2
@@ -807,7 +967,7 @@ for (i = 0; i < length_v; ++i)
 
   fprintf(stdout, "Dumping transient temperatures for init in file %s\n", model->config->all_transient_file);
   fprintf(stdout, "Unit\tSteady(Kelvin)\n");
-  dump_temp(model, temp, model->config->all_transient_file);
+  dump_state(model, temp, model->config->all_transient_file);
 
 
   /* cleanup	*/
@@ -822,6 +982,7 @@ for (i = 0; i < length_v; ++i)
   free_dvector(steady_temp);
   free_dvector(overall_power);
   free_names(names);
+  free_ivector(map);
   free_dvector(vals);
 
   return 0;
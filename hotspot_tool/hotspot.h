@@ -24,7 +24,13 @@ typedef struct global_config_t_st
 	
 	/*BU_3D: Option to turn on heterogenous R-C assignment*/
 	char detailed_3D[STR_SIZE];
-	
+
+	/* keep the model resident and read power vectors from stdin */
+	int server;
+
+	/* output file for the RC network of the grid model (floorplanlib/rom.py) */
+	char rc_dump_file[STR_SIZE];
+
 }global_config_t;
 
 /* 
@@ -105,6 +105,19 @@ thermal_config_t default_thermal_config(void)
 	strcpy(config.type, "3Dmem");
 
         config.steady_state_print_disable = 0;
+	/* run the steady state solve after the transient trace	*/
+	config.transient_only = 0;
+	/* integrate the grid model with adaptive rk4 steps	*/
+	strcpy(config.transient_solver, TRANSIENT_RK4_STR);
+	config.implicit_steps = 2;
+	/* dump the transient state in the text init file format	*/
+	strcpy(config.state_format, STATE_TEXT_STR);
+	/* evaluate the grid cells in a single thread	*/
+	config.grid_threads = 1;
+	/* no reduced order model	*/
+	strcpy(config.rom_file, NULLFILE);
+	/* no on-disk cache of the probed jacobian	*/
+	strcpy(config.jacobian_cache_dir, NULLFILE);
 	config.detailed_3D_used = 0;	//BU_3D: by default detailed 3D modeling is disabled.	
 	return config;
 }
@@ -269,6 +282,27 @@ void thermal_config_add_from_strs(thermal_config_t *config, str_pair *table, int
         if ((idx = get_str_index(table, size, "steady_state_print_disable")) >= 0)
                 if(sscanf(table[idx].value, "%d", &config->steady_state_print_disable) != 1)
                         fatal("invalid format for configuration  parameter steady_state_print_disable\n");
+	if ((idx = get_str_index(table, size, "transient_only")) >= 0)
+		if(sscanf(table[idx].value, "%d", &config->transient_only) != 1)
+			fatal("invalid format for configuration  parameter transient_only\n");
+	if ((idx = get_str_index(table, size, "transient_solver")) >= 0)
+		if(sscanf(table[idx].value, "%s", config->transient_solver) != 1)
+			fatal("invalid format for configuration  parameter transient_solver\n");
+	if ((idx = get_str_index(table, size, "implicit_steps")) >= 0)
+		if(sscanf(table[idx].value, "%d", &config->implicit_steps) != 1)
+			fatal("invalid format for configuration  parameter implicit_steps\n");
+	if ((idx = get_str_index(table, size, "state_format")) >= 0)
+		if(sscanf(table[idx].value, "%s", config->state_format) != 1)
+			fatal("invalid format for configuration  parameter state_format\n");
+	if ((idx = get_str_index(table, size, "grid_threads")) >= 0)
+		if(sscanf(table[idx].value, "%d", &config->grid_threads) != 1)
+			fatal("invalid format for configuration  parameter grid_threads\n");
+	if ((idx = get_str_index(table, size, "rom_file")) >= 0)
+		if(sscanf(table[idx].value, "%s", config->rom_file) != 1)
+			fatal("invalid format for configuration  parameter rom_file\n");
+	if ((idx = get_str_index(table, size, "jacobian_cache_dir")) >= 0)
+		if(sscanf(table[idx].value, "%s", config->jacobian_cache_dir) != 1)
+			fatal("invalid format for configuration  parameter jacobian_cache_dir\n");
         if ((idx = get_str_index(table, size, "type")) >= 0)
                 if(sscanf(table[idx].value, "%s", config->type) != 1)
                         fatal("invalid format for configuration  parameter type\n");
@@ -304,6 +338,20 @@ void thermal_config_add_from_strs(thermal_config_t *config, str_pair *table, int
 		strcasecmp(config->grid_map_mode, GRID_MAX_STR) &&
 		strcasecmp(config->grid_map_mode, GRID_CENTER_STR))
 		fatal("invalid mapping mode. use 'avg', 'min', 'max' or 'center'\n");
+	if (strcasecmp(config->transient_solver, TRANSIENT_RK4_STR) &&
+		strcasecmp(config->transient_solver, TRANSIENT_IMPLICIT_STR) &&
+		strcasecmp(config->transient_solver, TRANSIENT_ROM_STR))
+		fatal("invalid transient solver. use 'rk4', 'implicit' or 'rom'\n");
+	if (!strcasecmp(config->transient_solver, TRANSIENT_ROM_STR) &&
+		!strcmp(config->rom_file, NULLFILE))
+		fatal("the rom transient solver needs a rom_file\n");
+	if (config->implicit_steps <= 0)
+		fatal("implicit_steps should be greater than zero\n");
+	if (strcasecmp(config->state_format, STATE_TEXT_STR) &&
+		strcasecmp(config->state_format, STATE_BINARY_STR))
+		fatal("invalid state format. use 'text' or 'binary'\n");
+	if (config->grid_threads < 1)
+		fatal("grid_threads should be at least 1\n");
 }
 
 /* 
@@ -312,7 +360,7 @@ void thermal_config_add_from_strs(thermal_config_t *config, str_pair *table, int
  */
 int thermal_config_to_strs(thermal_config_t *config, str_pair *table, int max_entries)
 {
-	if (max_entries < 51)
+	if (max_entries < 59)
 		fatal("not enough entries in table\n");
 
 	sprintf(table[0].name, "t_chip");
@@ -367,6 +415,13 @@ int thermal_config_to_strs(thermal_config_t *config, str_pair *table, int max_en
         sprintf(table[49].name, "all_transient_file");
         sprintf(table[50].name, "steady_state_print_disable");
         sprintf(table[51].name, "type");
+	sprintf(table[52].name, "transient_only");
+	sprintf(table[53].name, "transient_solver");
+	sprintf(table[54].name, "implicit_steps");
+	sprintf(table[55].name, "state_format");
+	sprintf(table[56].name, "grid_threads");
+	sprintf(table[57].name, "rom_file");
+	sprintf(table[58].name, "jacobian_cache_dir");
 
 	sprintf(table[0].value, "%lg", config->t_chip);
 	sprintf(table[1].value, "%lg", config->k_chip);
@@ -420,8 +475,15 @@ int thermal_config_to_strs(thermal_config_t *config, str_pair *table, int max_en
 	sprintf(table[49].value, "%s", config->all_transient_file);
 	sprintf(table[50].value, "%d", config->steady_state_print_disable);
 	sprintf(table[51].value, "%s", config->type);
-
-	return 52;
+	sprintf(table[52].value, "%d", config->transient_only);
+	sprintf(table[53].value, "%s", config->transient_solver);
+	sprintf(table[54].value, "%d", config->implicit_steps);
+	sprintf(table[55].value, "%s", config->state_format);
+	sprintf(table[56].value, "%d", config->grid_threads);
+	sprintf(table[57].value, "%s", config->rom_file);
+	sprintf(table[58].value, "%s", config->jacobian_cache_dir);
+
+	return 59;
 }
 
 /* package parameter routines	*/
@@ -1214,13 +1276,118 @@ void copy_temp(RC_model_t *model, double *dst, double *src)
  */ 
 void read_temp(RC_model_t *model, double *temp, char *file, int clip)
 {
-	if (model->type == BLOCK_MODEL)
+	if (is_binary_state_file(file))
+		read_temp_binary(model, temp, file, clip);
+	else if (model->type == BLOCK_MODEL)
 		read_temp_block(model->block, temp, file, clip);
 	else if (model->type == GRID_MODEL)	
 		read_temp_grid(model->grid, temp, file, clip);
 	else fatal("unknown model type\n");	
 }
 
+/* no. of elements in a vector alloced using 'hotspot_vector'	*/
+int hotspot_vector_size(RC_model_t *model)
+{
+	if (model->type == BLOCK_MODEL)
+		return model->block->n_nodes;
+	else if (model->type == GRID_MODEL)	{
+		if (model->grid->config.model_secondary)
+			return model->grid->total_n_blocks + EXTRA + EXTRA_SEC;
+		else
+			return model->grid->total_n_blocks + EXTRA;
+	} else fatal("unknown model type\n");	
+	return 0;
+}
+
+/* dump the transient state in the configured 'state_format'	*/
+void dump_state(RC_model_t *model, double *temp, char *file)
+{
+	if (!strcasecmp(model->config->state_format, STATE_BINARY_STR))
+		dump_temp_binary(model, temp, file);
+	else
+		dump_temp(model, temp, file);
+}
+
+/* 
+ * binary state file. the temperature vector is written as is, 
+ * without names, so it is only valid for the same model (floorplan,
+ * layers and package) that dumped it. the size in the header guards 
+ * against obvious mismatches
+ */
+void dump_temp_binary(RC_model_t *model, double *temp, char *file)
+{
+	char str[STR_SIZE];
+	int header[2];
+	FILE *fp;
+
+	fp = fopen (file, "wb");
+	if (!fp) {
+		sprintf (str,"error: %s could not be opened for writing\n", file);
+		fatal(str);
+	}
+	header[0] = hotspot_vector_size(model);
+	header[1] = 0;
+	if (fwrite(STATE_MAGIC, 1, STATE_MAGIC_LEN, fp) != STATE_MAGIC_LEN ||
+		fwrite(header, sizeof(int), 2, fp) != 2 ||
+		fwrite(temp, sizeof(double), header[0], fp) != header[0])
+		fatal("error writing binary state file\n");
+	fclose(fp);
+}
+
+/* does 'file' start with the binary state magic?	*/
+int is_binary_state_file(char *file)
+{
+	char magic[STATE_MAGIC_LEN];
+	int binary = FALSE;
+	FILE *fp;
+
+	if (!strcasecmp(file, "stdin"))
+		return FALSE;
+	fp = fopen (file, "rb");
+	if (!fp)
+		return FALSE;
+	if (fread(magic, 1, STATE_MAGIC_LEN, fp) == STATE_MAGIC_LEN &&
+		!strncmp(magic, STATE_MAGIC, STATE_MAGIC_LEN))
+		binary = TRUE;
+	fclose(fp);
+	return binary;
+}
+
+/* read a state dumped by 'dump_temp_binary'. clipping is as in read_temp	*/
+void read_temp_binary(RC_model_t *model, double *temp, char *file, int clip)
+{
+	char str[STR_SIZE], magic[STATE_MAGIC_LEN];
+	int i, n, header[2];
+	double max, factor;
+	FILE *fp;
+
+	fp = fopen (file, "rb");
+	if (!fp) {
+		sprintf (str,"error: %s could not be opened for reading\n", file);
+		fatal(str);
+	}
+	n = hotspot_vector_size(model);
+	if (fread(magic, 1, STATE_MAGIC_LEN, fp) != STATE_MAGIC_LEN ||
+		strncmp(magic, STATE_MAGIC, STATE_MAGIC_LEN) ||
+		fread(header, sizeof(int), 2, fp) != 2)
+		fatal("invalid binary state file format\n");
+	if (header[0] != n)
+		fatal("no. of values in the binary state file does not match the model\n");
+	if (fread(temp, sizeof(double), n, fp) != n)
+		fatal("not enough values in binary state file\n");
+	fclose(fp);
+
+	/* clipping	*/
+	max = find_max_temp(model, temp);
+	if (clip && (max > model->config->thermal_threshold)) {
+		/* scale down all temperature differences (from ambient) by the same factor	*/
+		factor = (model->config->thermal_threshold - model->config->ambient) / 
+				 (max - model->config->ambient);
+		for (i=0; i < n; i++)
+			temp[i] = (temp[i]-model->config->ambient)*factor + model->config->ambient;
+	}
+}
+
 /* dump power numbers to file	*/
 void dump_power(RC_model_t *model, double *power, char *file)
 {
@@ -23,6 +23,23 @@
 #define	GRID_MAX_STR	"max"
 #define	GRID_CENTER_STR	"center"
 
+/* transient solver of the grid model	*/
+#define	TRANSIENT_RK4		0
+#define	TRANSIENT_IMPLICIT	1
+#define	TRANSIENT_ROM		2
+#define	TRANSIENT_RK4_STR	"rk4"
+#define	TRANSIENT_IMPLICIT_STR	"implicit"
+#define	TRANSIENT_ROM_STR	"rom"
+
+/* format of the transient state (all_transient_file) dumps	*/
+#define	STATE_TEXT_STR		"text"
+#define	STATE_BINARY_STR	"binary"
+/* binary state file - an 8-byte magic, the no. of values and a
+ * reserved word, followed by the raw temperature vector
+ */
+#define	STATE_MAGIC		"HSSTATE1"
+#define	STATE_MAGIC_LEN	8
+
 /* temperature-leakage loop constants */
 #define LEAKAGE_MAX_ITER 100 /* max thermal-leakage iteration number, if exceeded, report thermal runaway*/
 #define LEAK_TOL	0.01 /* thermal-leakage temperature convergence criterion */
@@ -218,6 +235,22 @@ typedef struct thermal_config_t_st
  	int steady_state_print_disable;	
        /* type of memory passed for specific customization DDR, 3Dmem, 2.5D, 3D*/
  	char type[STR_SIZE];	
+	/* only compute the transient trace, skip the steady state solve and its outputs */
+	int transient_only;
+	/* transient solver of the grid model - adaptive rk4, implicit (fixed step TR-BDF2)
+	 * or rom (reduced order model read from rom_file)
+	 */
+	char transient_solver[STR_SIZE];
+	/* reduced order model of the grid (floorplanlib/rom.py)	*/
+	char rom_file[STR_SIZE];
+	/* no. of fixed implicit steps per sampling interval	*/
+	int implicit_steps;
+	/* format of all_transient_file - text (init file format) or binary	*/
+	char state_format[STR_SIZE];
+	/* no. of threads evaluating the grid cells of the transient solver (OpenMP builds)	*/
+	int grid_threads;
+	/* directory to cache the probed jacobian in (implicit solver, rc dump)	*/
+	char jacobian_cache_dir[STR_SIZE];
 	int detailed_3D_used; //BU_3D: Added parameter to check for heterogenous R-C model 
 }thermal_config_t;
 
@@ -385,6 +418,14 @@ void set_temp (RC_model_t *model, double *temp, double val);
 void dump_temp (RC_model_t *model, double *temp, char *file);
 void copy_temp (RC_model_t *model, double *dst, double *src);
 void read_temp (RC_model_t *model, double *temp, char *file, int clip);
+/* no. of elements in a vector alloced using 'hotspot_vector'	*/
+int hotspot_vector_size(RC_model_t *model);
+/* dump the transient state in the configured 'state_format'	*/
+void dump_state(RC_model_t *model, double *temp, char *file);
+/* binary state files - read_temp recognizes them by their magic	*/
+void dump_temp_binary(RC_model_t *model, double *temp, char *file);
+int is_binary_state_file(char *file);
+void read_temp_binary(RC_model_t *model, double *temp, char *file, int clip);
 void dump_power(RC_model_t *model, double *power, char *file);
 void read_power (RC_model_t *model, double *power, char *file);
 double find_max_temp(RC_model_t *model, double *temp);
@@ -6,6 +6,7 @@
 #define strncasecmp   _strnicmp
 #else
 #include <strings.h>
+#include <unistd.h>
 #endif
 #include <math.h>
 
@@ -742,6 +743,12 @@ grid_model_t *alloc_grid_model(thermal_config_t *config, flp_t *flp_default, int
     model->map_mode = GRID_CENTER;
   else
     fatal("unknown mapping mode\n");
+  if(!strcasecmp(model->config.transient_solver, TRANSIENT_IMPLICIT_STR))
+    model->transient_solver = TRANSIENT_IMPLICIT;
+  else if(!strcasecmp(model->config.transient_solver, TRANSIENT_ROM_STR))
+    model->transient_solver = TRANSIENT_ROM;
+  else
+    model->transient_solver = TRANSIENT_RK4;
 
   /* layer configuration file specified?	*/
   if(strcmp(model->config.grid_layer_file, NULLFILE))
@@ -891,6 +898,17 @@ void populate_R_model_grid(grid_model_t *model, flp_t *flp)
       //}
   }
 
+  /* R's have changed. the implicit solver's matrix is stale	*/
+  if (model->implicit) {
+      free_implicit_solver(model->implicit);
+      model->implicit = NULL;
+  }
+  /* and so is the reduced order model (read again on next use)	*/
+  if (model->rom) {
+      free_rom(model->rom);
+      model->rom = NULL;
+  }
+
   /* done	*/
   model->r_ready = TRUE;
 }
@@ -942,6 +960,17 @@ void populate_C_model_grid(grid_model_t *model, flp_t *flp)
                                  (model->config.s_pcb * model->config.s_pcb);
   }
 
+  /* C's have changed. the implicit solver's matrix is stale	*/
+  if (model->implicit) {
+      free_implicit_solver(model->implicit);
+      model->implicit = NULL;
+  }
+  /* and so is the reduced order model (read again on next use)	*/
+  if (model->rom) {
+      free_rom(model->rom);
+      model->rom = NULL;
+  }
+
   /* done	*/	
   model->c_ready = TRUE;
 }
@@ -1001,6 +1030,10 @@ void delete_grid_model(grid_model_t *model)
 
   free_grid_model_vector(model->last_steady);
   free_grid_model_vector(model->last_trans);
+  if (model->implicit)
+    free_implicit_solver(model->implicit);
+  if (model->rom)
+    free_rom(model->rom);
   free(model->layers);
   free(model);
 }
@@ -3117,7 +3150,7 @@ void slope_fn_pack(grid_model_t *model, double *v, grid_model_vector_t *p, doubl
  */
 void slope_fn_grid(grid_model_t *model, double *v, grid_model_vector_t *p, double *dv)
 {
-  int n, i, j;
+  int n, i, j, k;
   /* sum of the currents(power values)	*/
   double psum;
 
@@ -3145,9 +3178,17 @@ void slope_fn_grid(grid_model_t *model, double *v, grid_model_vector_t *p, doubl
       pcbidx = LAYER_PCB;	
   }
 
-  /* for each grid cell	*/
-  for(n=0; n < nl; n++)
-    for(i=0; i < nr; i++)
+  /* for each grid cell. cells do not depend on each other, so the
+   * rows of all layers are split among the grid_threads threads
+   * (OpenMP builds). each cell is computed exactly as in a single
+   * thread, hence the results do not depend on the no. of threads
+   */
+#ifdef _OPENMP
+#pragma omp parallel for num_threads(c->grid_threads) schedule(static) private(n, i, j, psum) if (c->grid_threads > 1)
+#endif
+  for(k=0; k < nl*nr; k++) {
+      n = k / nr;
+      i = k % nr;
       for(j=0; j < nc; j++) {
           /* sum the currents(power values) to cells north, south, 
            * east, west, above and below
@@ -3245,15 +3286,785 @@ void slope_fn_grid(grid_model_t *model, double *v, grid_model_vector_t *p, doubl
           else
             A3D(dv,n,i,j,nl,nr,nc) = (p->cuboid[n][i][j] + psum) / l[n].c;
       }
-  /* for each grid cell	*/
+  }
+  /* package nodes - a few serial sums over the boundary cells	*/
   slope_fn_pack(model, v, p, dv);
 }
 
+/* 
+ * implicit transient solver. slope_fn_grid is affine in the
+ * temperatures, i.e., dV = JV + g where g holds the power and
+ * ambient terms. an implicit step of size h hence solves linear
+ * systems with the matrix (I - dhJ), which depends only on the
+ * R's, C's and h. so, it is assembled and factored (incomplete LU) 
+ * once. every step after that is a handful of preconditioned 
+ * BiCGSTAB iterations warm-started from the previous temperatures.
+ */
+
+/* probing colour of a grid cell. cells within a unit distance
+ * of each other never share a colour
+ */
+#define PROBE_COLOR(n,i,j)	(((n)%3)*9 + ((i)%3)*3 + ((j)%3))
+
+/* is the grid cell connected to one of the package nodes?	*/
+int is_pack_boundary_grid(grid_model_t *model, int n, int i, int j)
+{
+  int nl = model->n_layers;
+
+  if (i != 0 && i != model->rows-1 && j != 0 && j != model->cols-1)
+    return FALSE;
+  if (n == nl - DEFAULT_PACK_LAYERS + LAYER_SP || 
+      n == nl - DEFAULT_PACK_LAYERS + LAYER_SINK)
+    return TRUE;
+  if (model->config.model_secondary && 
+      (n == LAYER_SUB || n == LAYER_SOLDER || n == LAYER_PCB))
+    return TRUE;
+  return FALSE;
+}
+
+/* extract the jacobian J of slope_fn_grid by probing it with unit
+ * temperatures. returns the no. of non-zeroes, in coordinate format.
+ * package nodes and the grid cells they connect to are probed one at 
+ * a time. the rest of the cells are probed together, one colour at a 
+ * time, as each row then sees only one probed cell
+ */
+int probe_jacobian_grid(grid_model_t *model, int **rows_out, int **cols_out, double **vals_out)
+{
+  int n, i, j, k, r, c, color, nnz, max_nnz, probed;
+  int *rows, *cols, *single;
+  double *vals, *v, *f0, *f1;
+  grid_model_vector_t *zero;
+
+  /* shortcuts	*/
+  int nl = model->n_layers;
+  int nr = model->rows;
+  int nc = model->cols;
+  int ncells = nl*nr*nc;
+  int dim;
+
+  /* neighbour offsets	*/
+  int dn[7] = {0, -1, 1, 0, 0, 0, 0};
+  int di[7] = {0, 0, 0, -1, 1, 0, 0};
+  int dj[7] = {0, 0, 0, 0, 0, -1, 1};
+
+  if (model->config.model_secondary)
+    dim = ncells + EXTRA + EXTRA_SEC;
+  else
+    dim = ncells + EXTRA;
+
+  v = dvector(dim);
+  f0 = dvector(dim);
+  f1 = dvector(dim);
+  single = ivector(dim);
+  zero = new_grid_model_vector(model);
+  zero_dvector(zero->cuboid[0][0], dim);
+
+  /* at most 7 entries per cell in the interior. package rows
+   * and columns are bounded by their no. of boundary cells
+   */
+  max_nnz = 7 * dim;
+  for(k=0; k < dim; k++) {
+      if (k >= ncells)
+        single[k] = TRUE;
+      else
+        single[k] = is_pack_boundary_grid(model, k / (nr*nc), (k / nc) % nr, k % nc);
+      if (single[k])
+        max_nnz += dim - ncells + 2 * (nr + nc);
+  }
+  rows = ivector(max_nnz);
+  cols = ivector(max_nnz);
+  vals = dvector(max_nnz);
+  nnz = 0;
+
+  /* slope at zero temperatures	*/
+  zero_dvector(v, dim);
+  slope_fn_grid(model, v, zero, f0);
+
+  /* probe the package nodes and the cells connected to them individually	*/
+  for(k=0; k < dim; k++) {
+      if (!single[k])
+        continue;
+      v[k] = 1.0;
+      slope_fn_grid(model, v, zero, f1);
+      v[k] = 0.0;
+      for(r=0; r < dim; r++)
+        if (f1[r] != f0[r]) {
+            if (nnz >= max_nnz)
+              fatal("too many non-zeroes in the grid jacobian\n");
+            rows[nnz] = r;
+            cols[nnz] = k;
+            vals[nnz++] = f1[r] - f0[r];
+        }
+  }
+
+  /* probe the rest of the cells one colour at a time	*/
+  for(color=0; color < 27; color++) {
+      probed = FALSE;
+      for(n=0; n < nl; n++)
+        for(i=0; i < nr; i++)
+          for(j=0; j < nc; j++)
+            if (PROBE_COLOR(n,i,j) == color && !single[n*nr*nc + i*nc + j]) {
+                v[n*nr*nc + i*nc + j] = 1.0;
+                probed = TRUE;
+            }
+      if (!probed)
+        continue;
+      slope_fn_grid(model, v, zero, f1);
+      for(r=0; r < dim; r++) {
+          if (f1[r] == f0[r])
+            continue;
+          if (r >= ncells)
+            fatal("package node coupled to an unexpected grid cell\n");
+          n = r / (nr*nc);
+          i = (r / nc) % nr;
+          j = r % nc;
+          /* the only probed cell among the row's own cell and its neighbours	*/
+          for(k=0, c=-1; k < 7; k++) {
+              if (n+dn[k] < 0 || n+dn[k] >= nl || i+di[k] < 0 || i+di[k] >= nr ||
+                  j+dj[k] < 0 || j+dj[k] >= nc)
+                continue;
+              if (v[(n+dn[k])*nr*nc + (i+di[k])*nc + (j+dj[k])] != 0.0) {
+                  c = (n+dn[k])*nr*nc + (i+di[k])*nc + (j+dj[k]);
+                  break;
+              }
+          }
+          if (c < 0)
+            fatal("grid cell coupled to a non-adjacent grid cell\n");
+          if (nnz >= max_nnz)
+            fatal("too many non-zeroes in the grid jacobian\n");
+          rows[nnz] = r;
+          cols[nnz] = c;
+          vals[nnz++] = f1[r] - f0[r];
+      }
+      zero_dvector(v, ncells);
+  }
+
+  free_ivector(single);
+  free_dvector(v);
+  free_dvector(f0);
+  free_dvector(f1);
+  free_grid_model_vector(zero);
+
+  *rows_out = rows;
+  *cols_out = cols;
+  *vals_out = vals;
+  return nnz;
+}
+
+/* constructor - form (I - dhJ) from the probed jacobian J 
+ * and its ILU(0) factors
+ */
+implicit_solver_t *new_implicit_solver(grid_model_t *model, double h)
+{
+  int i, k, r, c, nnz;
+  int *rows, *cols, *count, *iw;
+  double *vals, *lu, dh;
+  implicit_solver_t *s;
+  int dim;
+
+  if (model->config.model_secondary)
+    dim = model->n_layers * model->rows * model->cols + EXTRA + EXTRA_SEC;
+  else
+    dim = model->n_layers * model->rows * model->cols + EXTRA;
+
+  nnz = jacobian_grid(model, &rows, &cols, &vals);
+
+  /* assemble (I - dhJ) in compressed sparse row format	*/
+  s = (implicit_solver_t *) calloc (1, sizeof(implicit_solver_t));
+  if (!s)
+    fatal("memory allocation error\n");
+  s->n = dim;
+  s->h = h;
+  dh = (1.0 - 1.0 / sqrt(2.0)) * h;
+  s->row_ptr = ivector(dim+1);
+  s->col_idx = ivector(nnz);
+  s->val = dvector(nnz);
+  s->diag = ivector(dim);
+  s->lu = dvector(nnz);
+  s->work = dvector(10*dim);
+
+  count = ivector(dim);
+  zero_ivector(count, dim);
+  for(k=0; k < nnz; k++)
+    count[rows[k]]++;
+  s->row_ptr[0] = 0;
+  for(r=0; r < dim; r++) {
+      s->row_ptr[r+1] = s->row_ptr[r] + count[r];
+      count[r] = s->row_ptr[r];
+  }
+  for(k=0; k < nnz; k++) {
+      s->col_idx[count[rows[k]]] = cols[k];
+      s->val[count[rows[k]]++] = -dh * vals[k];
+  }
+
+  /* sort each row by column (insertion sort - rows are short)
+   * and add the identity
+   */
+  for(r=0; r < dim; r++) {
+      for(k=s->row_ptr[r]+1; k < s->row_ptr[r+1]; k++) {
+          int ctmp = s->col_idx[k];
+          double vtmp = s->val[k];
+          for(i=k-1; i >= s->row_ptr[r] && s->col_idx[i] > ctmp; i--) {
+              s->col_idx[i+1] = s->col_idx[i];
+              s->val[i+1] = s->val[i];
+          }
+          s->col_idx[i+1] = ctmp;
+          s->val[i+1] = vtmp;
+      }
+      s->diag[r] = -1;
+      for(k=s->row_ptr[r]; k < s->row_ptr[r+1]; k++)
+        if (s->col_idx[k] == r)
+          s->diag[r] = k;
+      if (s->diag[r] < 0)
+        fatal("grid node without a self term in the implicit solver matrix\n");
+      s->val[s->diag[r]] += 1.0;
+  }
+
+  /* ILU(0) factorization in place of a copy of the matrix	*/
+  lu = s->lu;
+  copy_dvector(lu, s->val, nnz);
+  iw = count;
+  for(r=0; r < dim; r++)
+    iw[r] = -1;
+  for(r=0; r < dim; r++) {
+      for(k=s->row_ptr[r]; k < s->row_ptr[r+1]; k++)
+        iw[s->col_idx[k]] = k;
+      for(k=s->row_ptr[r]; k < s->diag[r]; k++) {
+          c = s->col_idx[k];
+          lu[k] /= lu[s->diag[c]];
+          for(i=s->diag[c]+1; i < s->row_ptr[c+1]; i++)
+            if (iw[s->col_idx[i]] >= 0)
+              lu[iw[s->col_idx[i]]] -= lu[k] * lu[i];
+      }
+      if (lu[s->diag[r]] == 0.0)
+        fatal("zero pivot in the implicit solver factorization\n");
+      for(k=s->row_ptr[r]; k < s->row_ptr[r+1]; k++)
+        iw[s->col_idx[k]] = -1;
+  }
+
+  free_ivector(count);
+  free_ivector(rows);
+  free_ivector(cols);
+  free_dvector(vals);
+
+  return s;
+}
+
+/* destructor	*/
+void free_implicit_solver(implicit_solver_t *s)
+{
+  free_ivector(s->row_ptr);
+  free_ivector(s->col_idx);
+  free_dvector(s->val);
+  free_ivector(s->diag);
+  free_dvector(s->lu);
+  free_dvector(s->work);
+  free(s);
+}
+
+/* y = Ax	*/
+void implicit_matvec(implicit_solver_t *s, double *x, double *y)
+{
+  int r, k;
+  for(r=0; r < s->n; r++) {
+      y[r] = 0.0;
+      for(k=s->row_ptr[r]; k < s->row_ptr[r+1]; k++)
+        y[r] += s->val[k] * x[s->col_idx[k]];
+  }
+}
+
+/* y = (LU)^-1 x - forward and backward substitution with the ILU(0) factors	*/
+void implicit_precond(implicit_solver_t *s, double *x, double *y)
+{
+  int r, k;
+  for(r=0; r < s->n; r++) {
+      y[r] = x[r];
+      for(k=s->row_ptr[r]; k < s->diag[r]; k++)
+        y[r] -= s->lu[k] * y[s->col_idx[k]];
+  }
+  for(r=s->n-1; r >= 0; r--) {
+      for(k=s->diag[r]+1; k < s->row_ptr[r+1]; k++)
+        y[r] -= s->lu[k] * y[s->col_idx[k]];
+      y[r] /= s->lu[s->diag[r]];
+  }
+}
+
+double implicit_dot(double *x, double *y, int n)
+{
+  int i;
+  double sum = 0.0;
+  for(i=0; i < n; i++)
+    sum += x[i] * y[i];
+  return sum;
+}
+
+/* solve (I - dhJ)x = b with preconditioned BiCGSTAB. x holds
+ * the initial guess on entry
+ */
+void implicit_solve(implicit_solver_t *s, double *b, double *x)
+{
+  int i, iter, n = s->n;
+  double rho, rho_old = 1.0, alpha = 1.0, omega = 1.0, beta, tol;
+  /* scratch vectors	*/
+  double *r = s->work + 3*n, *rhat = r + n, *p = rhat + n;
+  double *q = p + n, *t = q + n, *phat = t + n, *shat = phat + n;
+
+  tol = IMPLICIT_TOL * IMPLICIT_TOL * implicit_dot(b, b, n);
+
+  /* initial residual	*/
+  implicit_matvec(s, x, r);
+  for(i=0; i < n; i++) {
+      r[i] = b[i] - r[i];
+      rhat[i] = r[i];
+      p[i] = q[i] = 0.0;
+  }
+
+  for(iter=0; iter < IMPLICIT_MAX_ITER; iter++) {
+      if (implicit_dot(r, r, n) <= tol)
+        return;
+      rho = implicit_dot(rhat, r, n);
+      if (rho == 0.0)
+        break;
+      beta = (rho / rho_old) * (alpha / omega);
+      for(i=0; i < n; i++)
+        p[i] = r[i] + beta * (p[i] - omega * q[i]);
+      implicit_precond(s, p, phat);
+      implicit_matvec(s, phat, q);
+      alpha = rho / implicit_dot(rhat, q, n);
+      /* r now holds the intermediate residual	*/
+      for(i=0; i < n; i++)
+        r[i] -= alpha * q[i];
+      if (implicit_dot(r, r, n) <= tol) {
+          for(i=0; i < n; i++)
+            x[i] += alpha * phat[i];
+          return;
+      }
+      implicit_precond(s, r, shat);
+      implicit_matvec(s, shat, t);
+      omega = implicit_dot(t, r, n) / implicit_dot(t, t, n);
+      for(i=0; i < n; i++) {
+          x[i] += alpha * phat[i] + omega * shat[i];
+          r[i] -= omega * t[i];
+      }
+      rho_old = rho;
+  }
+  if (implicit_dot(r, r, n) > tol)
+    warning("implicit transient solver did not converge\n");
+}
+
+/* one TR-BDF2 step of size h. a trapezoidal stage to t+gh followed 
+ * by a BDF2 stage to t+h. with g = 2-sqrt(2), both the stages solve 
+ * with the same matrix (I - dhJ), d = g/2. the scheme is second order 
+ * accurate and L-stable, i.e., the stiff (fast) modes are damped 
+ * instead of ringing as they would with plain Crank-Nicolson
+ */
+void implicit_step_grid(implicit_solver_t *s, double *v, double *g)
+{
+  int i, n = s->n;
+  double gamma = 2.0 - sqrt(2.0);
+  double dh = gamma / 2.0 * s->h;
+  double a = 1.0 / (gamma * (2.0 - gamma));
+  double c = (1.0 - gamma) * (1.0 - gamma) / (gamma * (2.0 - gamma));
+  /* scratch vectors	*/
+  double *b = s->work, *vn = b + n, *av = vn + n;
+
+  copy_dvector(vn, v, n);
+
+  /* trapezoidal stage: (I - dhJ)v_g = v + dhJv + 2dhg. dhJv = v - (I - dhJ)v	*/
+  implicit_matvec(s, vn, av);
+  for(i=0; i < n; i++)
+    b[i] = 2.0 * vn[i] - av[i] + 2.0 * dh * g[i];
+  implicit_solve(s, b, v);
+
+  /* BDF2 stage: (I - dhJ)v' = a v_g - c v + dhg	*/
+  for(i=0; i < n; i++)
+    b[i] = a * v[i] - c * vn[i] + dh * g[i];
+  implicit_solve(s, b, v);
+}
+
+/* 
+ * reduced order model. floorplanlib/rom.py projects the grid RC
+ * network, C dV/dt = -G(V - ambient) + P, onto a few of its modes
+ * and hotspot then only advances the modal coordinates. the RC
+ * network is handed to rom.py with 'hotspot -dump_rc <file>'
+ */
+#define RC_DUMP_MAGIC	0x43525348	/* 'HSRC'	*/
+#define ROM_MAGIC	0x4d4f5248	/* 'HROM'	*/
+
+/* 64-bit FNV-1a	*/
+static unsigned long long hash_bytes(unsigned long long h, void *data, size_t n)
+{
+  unsigned char *b = (unsigned char *) data;
+  size_t i;
+  for (i = 0; i < n; i++) {
+      h ^= b[i];
+      h *= 0x100000001b3ULL;
+  }
+  return h;
+}
+
+static int grid_dim(grid_model_t *model)
+{
+  if (model->config.model_secondary)
+    return model->n_layers * model->rows * model->cols + EXTRA + EXTRA_SEC;
+  return model->n_layers * model->rows * model->cols + EXTRA;
+}
+
+/* the denominators of slope_fn_grid and slope_fn_pack	*/
+void grid_node_capacitances(grid_model_t *model, double *c)
+{
+  int n, i, j;
+  package_RC_t *pk = &model->pack;
+  int nl = model->n_layers;
+  int nr = model->rows;
+  int nc = model->cols;
+  double *x = c + nl*nr*nc;
+
+  for(n=0; n < nl; n++)
+    for(i=0; i < nr; i++)
+      for(j=0; j < nc; j++)
+        if (model->config.detailed_3D_used == 1)
+          A3D(c,n,i,j,nl,nr,nc) = find_cap_3D(n, i, j, model);
+        else
+          A3D(c,n,i,j,nl,nr,nc) = model->layers[n].c;
+
+  x[SINK_N] = x[SINK_S] = x[SINK_W] = x[SINK_E] = pk->c_hs_per + pk->c_amb_per;
+  x[SINK_C_N] = x[SINK_C_S] = pk->c_hs_c_per_y + pk->c_amb_c_per_y;
+  x[SINK_C_W] = x[SINK_C_E] = pk->c_hs_c_per_x + pk->c_amb_c_per_x;
+  x[SP_N] = x[SP_S] = pk->c_sp_per_y;
+  x[SP_W] = x[SP_E] = pk->c_sp_per_x;
+  if (model->config.model_secondary) {
+      x[PCB_N] = x[PCB_S] = x[PCB_W] = x[PCB_E] = pk->c_pcb_per + pk->c_amb_sec_per;
+      x[PCB_C_N] = x[PCB_C_S] = pk->c_pcb_c_per_y + pk->c_amb_sec_c_per_y;
+      x[PCB_C_W] = x[PCB_C_E] = pk->c_pcb_c_per_x + pk->c_amb_sec_c_per_x;
+      x[SOLDER_N] = x[SOLDER_S] = pk->c_solder_per_y;
+      x[SOLDER_W] = x[SOLDER_E] = pk->c_solder_per_x;
+      x[SUB_N] = x[SUB_S] = pk->c_sub_per_y;
+      x[SUB_W] = x[SUB_E] = pk->c_sub_per_x;
+  }
+}
+
+/* hash of the capacitances, the layer and per-cell resistances 
+ * and the package parameters - cheap enough to check every run
+ */
+unsigned long long rc_network_key(grid_model_t *model)
+{
+  int n, i, j, k;
+  double r;
+  int dim = grid_dim(model);
+  double *c = dvector(dim);
+  unsigned long long h = 0xcbf29ce484222325ULL;
+
+  h = hash_bytes(h, &dim, sizeof(int));
+  grid_node_capacitances(model, c);
+  h = hash_bytes(h, c, dim * sizeof(double));
+  for(n=0; n < model->n_layers; n++) {
+      h = hash_bytes(h, &model->layers[n].rx, sizeof(double));
+      h = hash_bytes(h, &model->layers[n].ry, sizeof(double));
+      h = hash_bytes(h, &model->layers[n].rz, sizeof(double));
+      if (model->config.detailed_3D_used == 1)
+        for(i=0; i < model->rows; i++)
+          for(j=0; j < model->cols; j++)
+            for(k=1; k <= 3; k++) {
+                r = find_res_3D(n, i, j, model, k);
+                h = hash_bytes(h, &r, sizeof(double));
+            }
+  }
+  h = hash_bytes(h, &model->pack, sizeof(package_RC_t));
+  free_dvector(c);
+  return h;
+}
+
+static void write_or_die(void *data, size_t size, size_t n, FILE *fp, char *file)
+{
+  char str[STR_SIZE];
+  if (fwrite(data, size, n, fp) != n) {
+      sprintf(str, "error writing to %s\n", file);
+      fatal(str);
+  }
+}
+
+static void read_or_die(void *data, size_t size, size_t n, FILE *fp, char *file)
+{
+  char str[STR_SIZE];
+  if (fread(data, size, n, fp) != n) {
+      sprintf(str, "%s is truncated\n", file);
+      fatal(str);
+  }
+}
+
+/* on-disk cache of the probed jacobian. probing takes a few
+ * hundred slope evaluations and dominates the set up of the 
+ * implicit solver, which a hotspot relaunched every sampling 
+ * interval otherwise repeats for the same chip. files are named
+ * after the network key and the grid size: magic, no. of nodes
+ * and no. of non-zeroes (ints), the key, then the jacobian
+ * (rows, columns, values)
+ */
+#define JACOBIAN_CACHE_MAGIC	0x43414a48	/* 'HJAC'	*/
+
+static void jacobian_cache_file(grid_model_t *model, unsigned long long key, char *file)
+{
+  snprintf(file, STR_SIZE, "%s/hotspot-jacobian-%016llx.bin", model->config.jacobian_cache_dir, key);
+}
+
+/* returns the no. of non-zeroes, 0 if there is no usable cache file	*/
+static int jacobian_cache_load(grid_model_t *model, unsigned long long key, int dim,
+                            int **rows_out, int **cols_out, double **vals_out)
+{
+  char file[STR_SIZE];
+  FILE *fp;
+  int header[3], nnz, ok;
+  unsigned long long stored;
+  int *rows, *cols;
+  double *vals;
+
+  jacobian_cache_file(model, key, file);
+  if (!(fp = fopen(file, "rb")))
+    return 0;
+
+  ok = fread(header, sizeof(int), 3, fp) == 3 && fread(&stored, sizeof(stored), 1, fp) == 1 &&
+       header[0] == JACOBIAN_CACHE_MAGIC && header[1] == dim && header[2] > 0 && stored == key;
+  if (!ok) {
+      fclose(fp);
+      return 0;
+  }
+  nnz = header[2];
+  rows = ivector(nnz);
+  cols = ivector(nnz);
+  vals = dvector(nnz);
+  ok = fread(rows, sizeof(int), nnz, fp) == nnz && fread(cols, sizeof(int), nnz, fp) == nnz &&
+       fread(vals, sizeof(double), nnz, fp) == nnz;
+  fclose(fp);
+  if (!ok) {
+      free_ivector(rows);
+      free_ivector(cols);
+      free_dvector(vals);
+      return 0;
+  }
+  *rows_out = rows;
+  *cols_out = cols;
+  *vals_out = vals;
+  return nnz;
+}
+
+/* best effort - the jacobian is still used if it cannot be cached	*/
+static void jacobian_cache_store(grid_model_t *model, unsigned long long key, int dim,
+                              int nnz, int *rows, int *cols, double *vals)
+{
+  char file[STR_SIZE], tmp[STR_SIZE];
+  FILE *fp;
+  int header[3] = {JACOBIAN_CACHE_MAGIC, dim, nnz};
+  int ok;
+
+  jacobian_cache_file(model, key, file);
+  /* written to a temporary file first so that concurrent runs never read a partial file	*/
+  snprintf(tmp, STR_SIZE, "%s.%d.tmp", file, (int) getpid());
+  if (!(fp = fopen(tmp, "wb"))) {
+      fprintf(stderr, "warning: cannot write jacobian cache file %s\n", tmp);
+      return;
+  }
+  ok = fwrite(header, sizeof(int), 3, fp) == 3 && fwrite(&key, sizeof(key), 1, fp) == 1 &&
+       fwrite(rows, sizeof(int), nnz, fp) == nnz && fwrite(cols, sizeof(int), nnz, fp) == nnz &&
+       fwrite(vals, sizeof(double), nnz, fp) == nnz;
+  if (fclose(fp) || !ok || rename(tmp, file)) {
+      fprintf(stderr, "warning: cannot write jacobian cache file %s\n", file);
+      remove(tmp);
+  }
+}
+
+/* probe_jacobian_grid, read from 'jacobian_cache_dir' instead if
+ * the same network was probed before
+ */
+int jacobian_grid(grid_model_t *model, int **rows_out, int **cols_out, double **vals_out)
+{
+  int nnz;
+  int dim = grid_dim(model);
+  unsigned long long key;
+
+  if (!strcmp(model->config.jacobian_cache_dir, NULLFILE))
+    return probe_jacobian_grid(model, rows_out, cols_out, vals_out);
+
+  /* the key alone does not tell a transposed grid apart	*/
+  key = rc_network_key(model);
+  key = hash_bytes(key, &model->rows, sizeof(int));
+  key = hash_bytes(key, &model->cols, sizeof(int));
+  if ((nnz = jacobian_cache_load(model, key, dim, rows_out, cols_out, vals_out)))
+    return nnz;
+
+  nnz = probe_jacobian_grid(model, rows_out, cols_out, vals_out);
+  jacobian_cache_store(model, key, dim, nnz, *rows_out, *cols_out, *vals_out);
+  return nnz;
+}
+
+/* binary dump of the RC network: magic, no. of nodes, no. of
+ * blocks and no. of non-zeroes of the jacobian (ints), the 
+ * network key, the ambient temperature, the node capacitances,
+ * the slope at zero temperatures and power, the jacobian of 
+ * the slope (rows, columns, values) and the grid power of a 
+ * unit power in each block (one row of nodes per block)
+ */
+void dump_rc_grid(grid_model_t *model, char *file)
+{
+  int k, nnz, *rows, *cols;
+  int header[4];
+  unsigned long long key = rc_network_key(model);
+  double *vals, *c, *v, *f0, *power;
+  grid_model_vector_t *p;
+  int dim = grid_dim(model);
+  char str[STR_SIZE];
+  FILE *fp;
+
+  if (!(fp = fopen(file, "wb"))) {
+      sprintf(str, "unable to open file %s\n", file);
+      fatal(str);
+  }
+
+  c = dvector(dim);
+  v = dvector(dim);
+  f0 = dvector(dim);
+  p = new_grid_model_vector(model);
+  power = hotspot_vector_grid(model);
+
+  grid_node_capacitances(model, c);
+  zero_dvector(v, dim);
+  zero_dvector(p->cuboid[0][0], dim);
+  slope_fn_grid(model, v, p, f0);
+  nnz = jacobian_grid(model, &rows, &cols, &vals);
+
+  header[0] = RC_DUMP_MAGIC;
+  header[1] = dim;
+  header[2] = model->total_n_blocks;
+  header[3] = nnz;
+  write_or_die(header, sizeof(int), 4, fp, file);
+  write_or_die(&key, sizeof(key), 1, fp, file);
+  write_or_die(&model->config.ambient, sizeof(double), 1, fp, file);
+  write_or_die(c, sizeof(double), dim, fp, file);
+  write_or_die(f0, sizeof(double), dim, fp, file);
+  write_or_die(rows, sizeof(int), nnz, fp, file);
+  write_or_die(cols, sizeof(int), nnz, fp, file);
+  write_or_die(vals, sizeof(double), nnz, fp, file);
+  for(k=0; k < model->total_n_blocks; k++) {
+      zero_dvector(power, model->total_n_blocks);
+      set_internal_power_grid(model, power);
+      power[k] = 1.0;
+      zero_dvector(p->cuboid[0][0], dim);
+      xlate_vector_b2g(model, power, p, V_POWER);
+      write_or_die(p->cuboid[0][0], sizeof(double), dim, fp, file);
+  }
+  fclose(fp);
+
+  free_ivector(rows);
+  free_ivector(cols);
+  free_dvector(vals);
+  free_dvector(c);
+  free_dvector(v);
+  free_dvector(f0);
+  free_dvector(power);
+  free_grid_model_vector(p);
+}
+
+/* reduced order model file: magic, no. of nodes, order and a 
+ * padding int, the key of the RC network it was built from,
+ * the decay rates, the n x order modes and the n x order left
+ * modes
+ */
+rom_model_t *read_rom(grid_model_t *model, char *file)
+{
+  int header[4];
+  unsigned long long key;
+  rom_model_t *rom;
+  char str[STR_SIZE];
+  FILE *fp;
+
+  if (!(fp = fopen(file, "rb"))) {
+      sprintf(str, "unable to open reduced order model %s\n", file);
+      fatal(str);
+  }
+  read_or_die(header, sizeof(int), 4, fp, file);
+  read_or_die(&key, sizeof(key), 1, fp, file);
+  if (header[0] != ROM_MAGIC) {
+      sprintf(str, "%s is not a reduced order model\n", file);
+      fatal(str);
+  }
+  if (header[1] != grid_dim(model) || key != rc_network_key(model)) {
+      sprintf(str, "%s was built for another floorplan, layer stack or package. rebuild it with floorplanlib/rom.py\n", file);
+      fatal(str);
+  }
+
+  rom = (rom_model_t *) calloc (1, sizeof(rom_model_t));
+  if (!rom)
+    fatal("memory allocation error\n");
+  rom->n = header[1];
+  rom->order = header[2];
+  rom->lambda = dvector(rom->order);
+  rom->w = dvector(rom->n * rom->order);
+  rom->wl = dvector(rom->n * rom->order);
+  rom->cap = dvector(rom->n);
+  rom->z = dvector(rom->order);
+  rom->u = dvector(rom->order);
+  read_or_die(rom->lambda, sizeof(double), rom->order, fp, file);
+  read_or_die(rom->w, sizeof(double), rom->n * rom->order, fp, file);
+  read_or_die(rom->wl, sizeof(double), rom->n * rom->order, fp, file);
+  fclose(fp);
+  grid_node_capacitances(model, rom->cap);
+
+  return rom;
+}
+
+void free_rom(rom_model_t *rom)
+{
+  free_dvector(rom->lambda);
+  free_dvector(rom->w);
+  free_dvector(rom->wl);
+  free_dvector(rom->cap);
+  free_dvector(rom->z);
+  free_dvector(rom->u);
+  free(rom);
+}
+
+/* project the temperatures onto the modes (z = Wl'C(v - ambient)),
+ * advance them exactly for constant power and expand them back
+ * (v = ambient + Wz). anything outside the span of the modes is 
+ * dropped
+ */
+void rom_step_grid(grid_model_t *model, double *v, double *p, double h)
+{
+  rom_model_t *rom = model->rom;
+  int k, m;
+  int n = rom->n, order = rom->order;
+  double ambient = model->config.ambient;
+  double x, e, *w;
+  double *z = rom->z, *u = rom->u;
+
+  zero_dvector(z, order);
+  zero_dvector(u, order);
+  for(k=0; k < n; k++) {
+      w = &rom->wl[k*order];
+      x = (v[k] - ambient) * rom->cap[k];
+      for(m=0; m < order; m++) {
+          z[m] += w[m] * x;
+          u[m] += w[m] * p[k];
+      }
+  }
+  for(m=0; m < order; m++) {
+      e = exp(-rom->lambda[m] * h);
+      z[m] = e * z[m] + (1.0 - e) / rom->lambda[m] * u[m];
+  }
+  for(k=0; k < n; k++) {
+      w = &rom->w[k*order];
+      x = 0.0;
+      for(m=0; m < order; m++)
+        x += w[m] * z[m];
+      v[k] = ambient + x;
+  }
+}
+
 void compute_temp_grid(grid_model_t *model, double *power, double *temp, double time_elapsed)
 {
   double t, h, new_h;
-  int extra_nodes;
-  grid_model_vector_t *p;
+  int n, steps, extra_nodes;
+  grid_model_vector_t *p, *g, *zero;
 #if VERBOSE > 1
   unsigned int i = 0;
 #endif
@@ -3283,6 +4094,53 @@ void compute_temp_grid(grid_model_t *model, double *power, double *temp, double
       model->last_temp = temp;
   }
 
+  /* fixed TR-BDF2 steps with the factored system. the
+   * power and ambient terms of the slope are the same for all of them
+   */
+  if (model->transient_solver == TRANSIENT_IMPLICIT && time_elapsed > 0) {
+      /* a multiple of the sampling interval (epochs skipped by the
+       * caller) takes more steps of the usual size with the same factors
+       */
+      steps = (int) floor(time_elapsed / model->config.sampling_intvl + 0.5);
+      if (steps > 1 && fabs(steps * model->config.sampling_intvl - time_elapsed) <= 1e-6 * time_elapsed) {
+          h = model->config.sampling_intvl / model->config.implicit_steps;
+          steps *= model->config.implicit_steps;
+      } else {
+          h = time_elapsed / model->config.implicit_steps;
+          steps = model->config.implicit_steps;
+      }
+      if (model->implicit && model->implicit->h != h) {
+          free_implicit_solver(model->implicit);
+          model->implicit = NULL;
+      }
+      if (!model->implicit)
+        model->implicit = new_implicit_solver(model, h);
+
+      g = new_grid_model_vector(model);
+      zero = new_grid_model_vector(model);
+      zero_dvector(zero->cuboid[0][0], model->rows * model->cols * model->n_layers + extra_nodes);
+      slope_fn_grid(model, zero->cuboid[0][0], p, g->cuboid[0][0]);
+      for (n = 0; n < steps; n++)
+        implicit_step_grid(model->implicit, model->last_trans->cuboid[0][0], g->cuboid[0][0]);
+      free_grid_model_vector(zero);
+      free_grid_model_vector(g);
+
+      xlate_temp_g2b(model, model->last_temp, model->last_trans);
+      free_grid_model_vector(p);
+      return;
+  }
+
+  /* reduced order model - a single exact step of the modes	*/
+  if (model->transient_solver == TRANSIENT_ROM && time_elapsed > 0) {
+      if (!model->rom)
+        model->rom = read_rom(model, model->config.rom_file);
+      rom_step_grid(model, model->last_trans->cuboid[0][0], p->cuboid[0][0], time_elapsed);
+
+      xlate_temp_g2b(model, model->last_temp, model->last_trans);
+      free_grid_model_vector(p);
+      return;
+  }
+
   /* Obtain temp at time (t+time_elapsed). 
    * Instead of getting the temperature at t+time_elapsed directly, we
    * do it in multiple steps with the correct step size at each time 
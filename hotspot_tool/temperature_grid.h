@@ -56,6 +56,12 @@
    Effective only when the detailed 3D modeling is turned on. */
 #define OCCUPANCY_THRESHOLD 0.95
 
+/* convergence criterion of the implicit transient solver -
+ * residual norm relative to that of the right hand side
+ */
+#define IMPLICIT_TOL		1.0e-12
+#define IMPLICIT_MAX_ITER	500
+
 /* block list: block to grid mapping data structure.
  * list of blocks mapped to a grid cell	
  */
@@ -129,6 +135,52 @@ typedef struct grid_model_vector_t_st
   double *extra;
 }grid_model_vector_t;
 
+/* implicit transient solver. the sparse matrix (I - dhJ) of a
+ * TR-BDF2 step of size h and its incomplete LU factors are
+ * computed once and re-used for every subsequent step
+ */
+typedef struct implicit_solver_t_st
+{
+  /* no. of nodes	*/
+  int n;
+  /* step size the matrix was built for	*/
+  double h;
+  /* matrix in compressed sparse row format	*/
+  int *row_ptr;
+  int *col_idx;
+  double *val;
+  /* position of the diagonal element of each row	*/
+  int *diag;
+  /* ILU(0) factors - same sparsity as 'val'	*/
+  double *lu;
+  /* scratch vectors of the iterative solve	*/
+  double *work;
+}implicit_solver_t;
+
+/* reduced order model of the grid (floorplanlib/rom.py). the
+ * temperatures above ambient are approximated by 'order' modes,
+ * v = ambient + W z, with C-orthonormal columns of W and 
+ * dz/dt = -lambda z + W'p for power p. as the modes are
+ * decoupled, a step of any size is exact for constant power
+ */
+typedef struct rom_model_t_st
+{
+  int n;
+  int order;
+  /* decay rate of each mode	*/
+  double *lambda;
+  /* modes (expansion) and left modes (projection onto the
+   * modal coordinates), n x order, row-major
+   */
+  double *w;
+  double *wl;
+  /* node capacitances	*/
+  double *cap;
+  /* modal coordinates	*/
+  double *z;
+  double *u;
+}rom_model_t;
+
 /* grid thermal model	*/
 typedef struct grid_model_t_st
 {
@@ -153,6 +205,12 @@ typedef struct grid_model_t_st
   int total_n_blocks;
   /* grid-to-block mapping mode	*/
   int map_mode;
+  /* transient solver	*/
+  int transient_solver;
+  /* factored implicit system (built on first use)	*/
+  implicit_solver_t *implicit;
+  /* reduced order model (read on first use)	*/
+  rom_model_t *rom;
 
   /* flags	*/
   int r_ready;	/* are the R's initialized?	*/
@@ -225,6 +283,31 @@ void xlate_temp_g2b(grid_model_t *model, double *b, grid_model_vector_t *g);
 /* debug print	*/
 void debug_print_grid(grid_model_t *model);
 
+/* implicit transient solver routines	*/
+/* jacobian of the grid slope in coordinate format, probed or read
+ * from 'jacobian_cache_dir' if it was cached for the same network
+ */
+int jacobian_grid(grid_model_t *model, int **rows, int **cols, double **vals);
+/* assemble and factor (I - dhJ) for the current R's and C's	*/
+implicit_solver_t *new_implicit_solver(grid_model_t *model, double h);
+void free_implicit_solver(implicit_solver_t *s);
+/* one TR-BDF2 step of the grid temperatures 'v'. 'g' is the slope
+ * at zero temperatures, i.e., the power and ambient terms
+ */
+void implicit_step_grid(implicit_solver_t *s, double *v, double *g);
+
+/* reduced order model routines	*/
+/* capacitance of every grid cell and package node	*/
+void grid_node_capacitances(grid_model_t *model, double *c);
+/* identifies the RC network a reduced order model was built for	*/
+unsigned long long rc_network_key(grid_model_t *model);
+/* dump the RC network for floorplanlib/rom.py	*/
+void dump_rc_grid(grid_model_t *model, char *file);
+rom_model_t *read_rom(grid_model_t *model, char *file);
+void free_rom(rom_model_t *rom);
+/* advance the grid temperatures 'v' by 'h' seconds under the grid power 'p'	*/
+void rom_step_grid(grid_model_t *model, double *v, double *p, double h);
+
 #if SUPERLU > 0
 /* steady-state solver */
 void direct_SLU(grid_model_t *model, grid_model_vector_t *power, grid_model_vector_t *temp);
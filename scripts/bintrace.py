@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+bintrace.py
+
+Binary format of the traces that cover the entire simulation (full_* and
+combined_*), written instead of the tab separated text when
+hotspot/trace_format = binary. A trace <name> is stored as <name>.bin:
+
+  8 bytes   magic 'BTRACE1\\n'
+  uint32    number of columns
+  uint32    length of the column names
+  ...       column names, tab separated, zero padded to a multiple of 8 bytes
+  ...       one row per epoch of float32 values
+
+All numbers are little endian. Rows are appended as the simulation runs,
+a partially written last row is ignored when reading. The matrix can be
+mapped into memory (memmap, needs numpy) or read without numpy (read).
+
+Used as a tool, it converts binary traces back into the text format:
+
+  bintrace.py <name>.bin [<output file (default: <name>)>]
+"""
+
+import os, struct, sys
+
+MAGIC = b'BTRACE1\n'
+SUFFIX = '.bin'
+
+
+def binary_filename(filename):
+  return filename + SUFFIX
+
+
+def create(filename, columns):
+  names = '\t'.join(columns).encode('utf-8')
+  padding = -(len(MAGIC) + 8 + len(names)) % 8
+  with open(filename, 'wb') as f:
+    f.write(MAGIC + struct.pack('<II', len(columns), len(names)) + names + b'\0' * padding)
+
+
+def append(filename, rows):
+  # rows: lists of numbers, as many as there are columns
+  ncolumns = layout(filename)[1]
+  row_format = '<%df' % ncolumns
+  data = []
+  for row in rows:
+    if len(row) != ncolumns:
+      raise ValueError('%s: row of %d values for %d columns' % (filename, len(row), ncolumns))
+    data.append(struct.pack(row_format, *row))
+  with open(filename, 'ab') as f:
+    f.write(b''.join(data))
+
+
+def layout(filename):
+  # returns (column names, number of columns, offset of the first row, number of complete rows)
+  with open(filename, 'rb') as f:
+    head = f.read(len(MAGIC) + 8)
+    if len(head) < len(MAGIC) + 8 or head[:len(MAGIC)] != MAGIC:
+      raise ValueError('%s is not a binary trace' % filename)
+    ncolumns, length = struct.unpack('<II', head[len(MAGIC):])
+    columns = f.read(length).decode('utf-8').split('\t') if length else []
+  offset = len(MAGIC) + 8 + length + (-(len(MAGIC) + 8 + length) % 8)
+  nrows = (os.path.getsize(filename) - offset) // (4 * ncolumns) if ncolumns else 0
+  return columns, ncolumns, offset, nrows
+
+
+def read(filename):
+  # returns (column names, list of rows)
+  columns, ncolumns, offset, nrows = layout(filename)
+  row_format = '<%df' % ncolumns
+  rows = []
+  with open(filename, 'rb') as f:
+    f.seek(offset)
+    data = f.read(nrows * 4 * ncolumns)
+  for i in range(nrows):
+    rows.append(list(struct.unpack_from(row_format, data, i * 4 * ncolumns)))
+  return columns, rows
+
+
+def memmap(filename):
+  # returns (column names, read-only numpy matrix of rows x columns backed by the file)
+  import numpy
+  columns, ncolumns, offset, nrows = layout(filename)
+  if not nrows:
+    return columns, numpy.zeros((0, ncolumns), dtype = numpy.float32)
+  return columns, numpy.memmap(filename, dtype = '<f4', mode = 'r', offset = offset, shape = (nrows, ncolumns))
+
+
+def to_text(filename, output):
+  # writes the trace in the tab separated text format; %.7g keeps every float32 digit
+  columns, rows = read(filename)
+  with open(output, 'w') as f:
+    f.write(''.join([ c + '\t' for c in columns ]) + '\n')
+    for row in rows:
+      f.write(''.join([ '%.7g\t' % v for v in row ]) + '\n')
+
+
+if __name__ == '__main__':
+  if len(sys.argv) not in (2, 3) or not sys.argv[1].endswith(SUFFIX):
+    sys.stderr.write('Usage: %s <trace>%s [<output file>]\n' % (sys.argv[0], SUFFIX))
+    sys.exit(1)
+  to_text(sys.argv[1], sys.argv[2] if len(sys.argv) == 3 else sys.argv[1][:-len(SUFFIX)])
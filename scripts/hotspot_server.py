@@ -0,0 +1,64 @@
+"""
+hotspot_server.py
+
+Drives a resident HotSpot process (hotspot -server 1). The model is built
+once when the process starts and every epoch only exchanges one power
+vector and one temperature vector over a pipe.
+"""
+
+import subprocess
+
+
+class HotSpotServer:
+  def __init__(self, command):
+    # command is the usual hotspot command line; -p is only used for the header
+    self.proc = subprocess.Popen(command.split() + ['-server', '1'],
+                                 stdin = subprocess.PIPE, stdout = subprocess.PIPE,
+                                 universal_newlines = True)
+    # everything printed while the model was built comes before 'ready'
+    while self.read_reply() != 'ready':
+      pass
+
+  def read_reply(self):
+    line = self.proc.stdout.readline()
+    if not line:
+      raise RuntimeError('hotspot server exited unexpectedly (return code %s)' % self.proc.poll())
+    return line.rstrip('\r\n')
+
+  def send(self, text):
+    self.proc.stdin.write(text)
+    self.proc.stdin.flush()
+
+  def set_vdd(self, vdd_str):
+    self.send('v %s\n' % vdd_str)
+    self.read_reply()
+
+  def set_bank_modes(self, header, modes):
+    # same two lines as in the bank mode trace file
+    self.send('bm\n%s\n%s\n' % (header.rstrip('\r\n'), modes.rstrip('\r\n')))
+    self.read_reply()
+
+  def step(self, power_line, interval = None):
+    # returns the temperature line and the power line with leakage, in trace column order
+    self.start_step(power_line, interval)
+    return self.finish_step()
+
+  def start_step(self, power_line, interval = None):
+    # hands the power vector over without waiting, so other work (e.g. another stack) can overlap the solve.
+    # The power is applied for interval seconds, the sampling interval of the command line if None
+    command = 'p' if interval is None else 'p %r' % interval
+    self.send('%s\n%s\n' % (command, power_line.rstrip('\r\n')))
+
+  def finish_step(self):
+    temperatures = self.read_reply()
+    power_with_leakage = self.read_reply()
+    return temperatures, power_with_leakage
+
+  def dump(self, filename):
+    self.send('dump %s\n' % filename)
+    self.read_reply()
+
+  def close(self):
+    if self.proc.poll() is None:
+      self.send('quit\n')
+      self.proc.wait()
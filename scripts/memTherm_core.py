@@ -3,8 +3,12 @@ memTherm_core.py
 
 """
 
-import sys, os, sim
+import sys, os, sim, subprocess, shutil
 import reliability as rlb
+from hotspot_server import HotSpotServer
+from power_surrogate import PowerSurrogate
+from stats_snapshot import StatsSnapshot
+import bintrace
 
 LOW_POWER = 0
 NORMAL_POWER = 1
@@ -27,6 +31,23 @@ logic_core_power = float(sim.config.get('memory/logic_core_power'))
 sampling_interval = int(sim.config.get('hotspot/sampling_interval'))    #time in ns
 interval_sec = sampling_interval * 1e-9
 timestep = sampling_interval/1000                       # in uS. Should be in sync with hotspot.config (sampling_intvl)
+resident_solver = sim.config.get_bool('hotspot/resident_solver')    # keep the hotspot models resident instead of relaunching every epoch
+concurrent_stacks = sim.config.get_bool('hotspot/concurrent_stacks')  # solve the separate core and memory stacks (DDR, 3Dmem) at the same time
+transient_only = sim.config.get_bool('hotspot/transient_only')      # skip the steady state solve (its outputs are not used here)
+transient_solver = sim.config.get('hotspot/transient_solver')       # rk4, implicit (factored once, fixed steps per epoch) or rom (<layer file>.rom, see floorplanlib/rom.py)
+state_format = sim.config.get('hotspot/state_format')               # text or binary all_transient_file handed to the next epoch as init_file
+pipelined = sim.config.get_bool('hotspot/pipelined')                # overlap McPAT with the simulation of the next epoch (temperatures lag one epoch); hotspot is not overlapped
+trace_flush_interval = int(sim.config.get('hotspot/trace_flush_interval'))  # epochs of full_* and combined_* trace rows kept in memory before appending them
+trace_format = sim.config.get('hotspot/trace_format')               # text or binary (float32 <trace>.bin, see scripts/bintrace.py) full_* and combined_* traces
+jacobian_cache = sim.config.get_bool('hotspot/jacobian_cache')      # hotspot keeps the jacobian probed by the implicit solver in jacobian_cache_dir
+jacobian_cache_dir = sim.config.get('hotspot/jacobian_cache_dir') or os.path.join(sim.config.output_dir, 'hotspot-jacobian')
+grid_threads = int(sim.config.get('hotspot/grid_threads'))          # threads of hotspot's grid transient solver
+power_surrogate = sim.config.get_bool('power/surrogate/enabled')    # linear power model fitted to McPAT instead of running McPAT every epoch
+in_memory_stats = sim.config.get_bool('power/in_memory_stats')      # hand McPAT the statistics delta instead of snapshots in sim.stats.sqlite3
+adaptive_sampling = sim.config.get_bool('hotspot/adaptive/enabled') and (power_surrogate or not pipelined)  # skip the evaluation of epochs with unchanged activity
+adaptive_activity_threshold = float(sim.config.get('hotspot/adaptive/activity_threshold'))
+adaptive_drift_bound = float(sim.config.get('hotspot/adaptive/drift_bound'))
+adaptive_max_skip = int(sim.config.get('hotspot/adaptive/max_skip'))
 t_refi = float(sim.config.get('memory/t_refi'))
 no_refesh_commands_in_t_refw = int(sim.config.get('memory/no_refesh_commands_in_t_refw'))
 rows_refreshed_in_refresh_interval = no_rows/no_refesh_commands_in_t_refw  # for 512Mb bank, 8 rows per refresh => for 64Mb bank, 1 rows per refresh
@@ -50,6 +71,15 @@ core_frequency_step = float(sim.config.get('perf_model/core/frequency_step_size'
 #is_2_5d = sim.config.get_bool('memory/is_2_5d')
 type_of_stack = sim.config.get('memory/type_of_stack')
 
+# the separate memory stack (DDR, 3Dmem) can be solved at a lower rate than the cores: every mem_epochs epochs
+sampling_interval_mem = int(sim.config.get('hotspot/sampling_interval_mem')) or sampling_interval    #time in ns
+if sampling_interval_mem % sampling_interval:
+  raise ValueError('hotspot/sampling_interval_mem (%d ns) is not a multiple of hotspot/sampling_interval (%d ns)' % (sampling_interval_mem, sampling_interval))
+mem_epochs = sampling_interval_mem / sampling_interval
+if mem_epochs > 1 and type_of_stack not in ("DDR", "3Dmem"):
+  print '[memTherm] hotspot/sampling_interval_mem is ignored, the %s stack holds the cores and the memory' % type_of_stack
+  mem_epochs = 1
+
 # Core Floorplan info
 cores_in_x = int(sim.config.get('memory/cores_in_x'))
 cores_in_y = int(sim.config.get('memory/cores_in_y'))
@@ -128,7 +158,6 @@ combined_insttemperature_trace_file = sim.config.get('hotspot/log_files/combined
 combined_power_trace_file = sim.config.get('hotspot/log_files/combined_power_trace_file')
 combined_instpower_trace_file = sim.config.get('hotspot/log_files/combined_instpower_trace_file')
 combined_power_trace_file_total = combined_power_trace_file.replace(".","_total.")       #appending _total to the power trace with leakage power
-combined_instpower_trace_file_total = 'tmmpFile_power1'
 #memory related files
 hotspot_steady_temp_file = sim.config.get('hotspot/log_files_mem/steady_temp_file')
 hotspot_grid_steady_file = sim.config.get('hotspot/log_files_mem/grid_steady_file')
@@ -159,6 +188,7 @@ c_init_file = sim.config.get('hotspot/log_files_core/init_file')
 #The power trace of core is combined with memory power trace for 3D and 2.5D architectures, else used separately in another hotspot run
 #Invoke hotspot to generate temperature trace for the corresponding power trace. 
 #The generated transient temperature trace (all_transient_file) is used as an init file for the next iteration
+#The sampling interval is added to the hotspot command lines by start_hotspot, an evaluation may cover several epochs
 
 hotspot_command = executable  \
                   + ' -c ' + hotspot_config_file \
@@ -172,13 +202,23 @@ hotspot_command = executable  \
                   + ' -steady_state_print_disable 1 ' \
                   + ' -l 1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1, ' \
                   + ' -type ' + type_of_stack \
-                  + ' -sampling_intvl ' + str(interval_sec) \
                   + ' -grid_layer_file ' + hotspot_layer_file \
                   + ' -detailed_3D on'
 #                  + ' -f ' + hotspot_floorplan_file \
 
 if mem_dtm != "off":
   hotspot_command += ' -bm '+ bank_mode_trace_file
+if transient_only:
+  hotspot_command += ' -transient_only 1'
+hotspot_command += ' -transient_solver ' + transient_solver
+if transient_solver == 'rom':
+  hotspot_command += ' -rom_file ' + os.path.splitext(hotspot_layer_file)[0] + '.rom'
+hotspot_command += ' -state_format ' + state_format
+hotspot_command += ' -grid_threads ' + str(grid_threads)
+if jacobian_cache:
+  hotspot_command += ' -jacobian_cache_dir ' + jacobian_cache_dir
+#cache directories of hotspot, created when the first hotspot is started
+hotspot_cache_dirs = [ jacobian_cache_dir ] if jacobian_cache else []
                
 #if type_of_stack!="DDR":
 #hotspot_command = hotspot_command + ' -grid_layer_file ' + hotspot_layer_file \
@@ -284,6 +324,151 @@ def gen_ptrace_header():
     return ptrace_header
     
 
+#returns the column names in the first line of a (text) trace file, None if there is none
+def read_header(filename):
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'r') as f:
+        return f.readline().split() or None
+
+#bank access counts (read, write, read and write in low power mode, each per bank) of several epochs added up:
+#sums (None for none yet) plus weight times access_rates
+def add_accesses(sums, access_rates, weight = 1):
+    if sums is None:
+        return [ [ a * weight for a in accesses ] for accesses in access_rates ]
+    return [ [ s + a * weight for s, a in zip(totals, accesses) ] for totals, accesses in zip(sums, access_rates) ]
+
+#returns the last line of a file, as 'tail -1' does. Only the end of the file is read, the full traces
+#and logs it is used on grow every epoch
+def read_last_line(filename):
+    with open(filename, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        size = 4096
+        while True:
+            start = max(0, end - size)
+            f.seek(start)
+            text = f.read(end - start)
+            newline = text.rfind('\n', 0, len(text) - 1)
+            if newline >= 0 or start == 0:
+                return text[newline + 1:]
+            size *= 2
+
+#state kept from one epoch to the next: the trace headers, whether an epoch has been finished before,
+#and the rows of the traces that cover the entire simulation (full_* and combined_*), which are
+#appended to their files every flush_interval epochs and at the end of the simulation.
+#With binary = True, the rows go to <trace>.bin instead, with the columns of the header that was
+#written to the text file, which is removed then
+class EpochState:
+  def __init__(self, combined_header, flush_interval, binary = False):
+    self.ptrace_header = gen_ptrace_header()
+    self.mem_header = gen_mem_header()
+    self.combined_header = combined_header
+    self.first_run = True
+    self.flush_interval = max(1, flush_interval)
+    self.binary = binary
+    self.binary_created = set()
+    self.epochs = 0
+    self.rows = {}
+    self.last_rows = {}
+
+  def append(self, filename, row):
+    self.rows.setdefault(filename, []).append(row)
+    self.last_rows[filename] = row
+
+  def repeat(self, exclude = ()):
+    #appends the last row of every trace (but those in exclude) again, for an epoch that was not evaluated
+    for filename, row in self.last_rows.items():
+      if filename not in exclude:
+        self.rows.setdefault(filename, []).append(row)
+
+  def end_epoch(self):
+    self.first_run = False
+    self.epochs += 1
+    if self.epochs % self.flush_interval == 0:
+      self.flush()
+
+  def flush(self):
+    for filename, rows in self.rows.items():
+      if self.binary:
+        self.append_binary(filename, rows)
+      else:
+        with open(filename, 'a') as f:
+          f.write(''.join(rows))
+    self.rows = {}
+
+  def append_binary(self, filename, rows):
+    rows = [ map(float, row.split()) for row in rows ]
+    binary_file = bintrace.binary_filename(filename)
+    if filename not in self.binary_created:
+      #the first rows of this run: start a new binary trace
+      columns = read_header(filename) or [ 'V%d' % i for i in range(len(rows[0])) ]
+      bintrace.create(binary_file, columns)
+      if os.path.exists(filename):
+        os.unlink(filename)
+      self.binary_created.add(filename)
+    bintrace.append(binary_file, rows)
+
+
+#decides which epochs skip the McPAT/hotspot evaluation (adaptive_sampling). An epoch is skipped while its
+#instruction and bank access counts stay within activity_threshold of the last evaluated epoch, the core
+#frequencies and bank modes are the same, and the largest temperature change per epoch seen between the last
+#two evaluations, extrapolated over the skipped epochs, stays within drift_bound. The next evaluation covers
+#the skipped epochs as well, with the bank accesses kept here averaged over all of them.
+class AdaptiveSampling:
+  def __init__(self, activity_threshold, drift_bound, max_skip):
+    self.activity_threshold = activity_threshold
+    self.drift_bound = drift_bound
+    self.max_skip = max_skip
+    self.reference = None       # activity of the last evaluated epoch
+    self.temperatures = None    # combined temperatures of the last evaluated epoch
+    self.drift = None           # largest temperature change per epoch between the last two evaluations
+    self.skipped = 0            # epochs skipped since the last evaluation
+    self.accesses = None        # bank access counts summed over those epochs
+    self.evaluated_epochs = 0
+    self.skipped_epochs = 0
+
+  def skip(self, activity):
+    #activity is (counts, levels): lists of counters compared within activity_threshold, and values that must match
+    if self.reference is None or self.drift is None or self.skipped >= self.max_skip:
+      return False
+    if (self.skipped + 1) * self.drift > self.drift_bound:
+      return False
+    counts, levels = activity
+    reference_counts, reference_levels = self.reference
+    if levels != reference_levels:
+      return False
+    for values, reference in zip(counts, reference_counts):
+      change = sum([ abs(v - r) for v, r in zip(values, reference) ])
+      if change > self.activity_threshold * max(sum(reference), 1):
+        return False
+    return True
+
+  def add_skipped(self, access_rates):
+    self.accesses = add_accesses(self.accesses, access_rates)
+    self.skipped += 1
+    self.skipped_epochs += 1
+
+  def average_accesses(self, access_rates):
+    #bank accesses per epoch over the skipped epochs and the one being evaluated
+    epochs = float(self.skipped + 1)
+    return tuple([ [ s / epochs for s in sums ] for sums in add_accesses(self.accesses, access_rates) ])
+
+  def evaluated(self, activity, temperatures, epochs):
+    #an evaluation covering epochs epochs (the skipped ones and itself) has finished
+    if self.temperatures is not None:
+      self.drift = max([ abs(t - l) for t, l in zip(temperatures, self.temperatures) ]) / epochs
+    self.reference = activity
+    self.temperatures = temperatures
+    self.skipped = 0
+    self.accesses = None
+    self.evaluated_epochs += 1
+
+  def report(self):
+    epochs = self.evaluated_epochs + self.skipped_epochs
+    print '[ADAPTIVE SAMPLING] evaluated %d of %d epochs, skipped %d' % (self.evaluated_epochs, epochs, self.skipped_epochs)
+
+
 #The main portion which invokes hotspot to generate temperature.trace
 class memTherm:
   def setup(self, args):
@@ -318,6 +503,16 @@ class memTherm:
       self.isTerminal = True
     #create an instance for core power computation
     self.ES = EnergyStats()
+    #resident hotspot processes (resident_solver), started on their first epoch
+    self.hotspot_servers = {}
+    self.hotspot_state_files = {}
+    #epoch whose power/thermal evaluation is still in flight (pipelined mode)
+    self.pending_epoch = None
+    #epochs skipped while the activity does not change (adaptive_sampling)
+    self.adaptive = AdaptiveSampling(adaptive_activity_threshold, adaptive_drift_bound, adaptive_max_skip) if adaptive_sampling else None
+    #epochs since the last memory stack solve (mem_epochs) and their bank accesses
+    self.mem_pending = 0
+    self.mem_accesses = None
 
     self.sd = sim.util.StatsDelta()
 
@@ -325,6 +520,7 @@ class memTherm:
       self.stats = {
         'time': [ self.getStatsGetter('performance_model', core, 'elapsed_time') for core in range(sim.config.ncores) ],
         'ffwd_time': [ self.getStatsGetter('fastforward_performance_model', core, 'fastforwarded_time') for core in range(sim.config.ncores) ],
+        'instructions': [ self.getStatsGetter('performance_model', core, 'instruction_count') for core in range(sim.config.ncores) ],
         'stat_rd': [ self.getStatsGetter(stat_component_rd, bank, stat_name_read) for bank in range(NUM_BANKS) ],
         'stat_wr': [ self.getStatsGetter(stat_component_wr, bank, stat_name_write) for bank in range(NUM_BANKS) ],
         'stat_rd_lowpower': [ self.getStatsGetter(stat_component_rd_lowpower, bank, stat_name_read_lowpower) for bank in range(NUM_BANKS) ],
@@ -335,17 +531,26 @@ class memTherm:
       self.stats = {
       'time': [ self.getStatsGetter('performance_model', core, 'elapsed_time') for core in range(sim.config.ncores) ],
       'ffwd_time': [ self.getStatsGetter('fastforward_performance_model', core, 'fastforwarded_time') for core in range(sim.config.ncores) ],
+      'instructions': [ self.getStatsGetter('performance_model', core, 'instruction_count') for core in range(sim.config.ncores) ],
       'stat_rd': [ self.getStatsGetter(stat_component_rd, bank, stat_name_read) for bank in range(NUM_BANKS) ],
       'stat_wr': [ self.getStatsGetter(stat_component_wr, bank, stat_name_write) for bank in range(NUM_BANKS) ],
       'stat_bank_mode': [ self.getStatsGetter(stat_component_bank_mode, bank, stat_name_bank_mode) for bank in range(NUM_BANKS)],
       }
+    #headers, first-run flag and buffered trace rows kept between epochs
+    self.epoch = EpochState(self.gen_combined_trace_header(), trace_flush_interval, trace_format == 'binary')
+    if trace_format != 'binary':
+      #a <trace>.bin left by an earlier binary run would be read instead of the new text trace
+      for filename in (full_temperature_trace_file, full_power_trace_file, full_bank_mode_trace_file, c_full_temperature_trace_file,
+                       combined_temperature_trace_file, combined_power_trace_file, combined_power_trace_file_total,
+                       rlb.comb_periodic_trace_file, rlb.c_full_rvalue_trace_file, rlb.m_full_rvalue_trace_file):
+        if os.path.exists(bintrace.binary_filename(filename)):
+          os.unlink(bintrace.binary_filename(filename))
     #print the initial header into different log/trace files
-    gen_ptrace_header()
-    ptrace_header = gen_ptrace_header()
+    ptrace_header = self.epoch.ptrace_header
     with open(full_temperature_trace_file, "w") as f:
         f.write("%s\n" %(ptrace_header))
     f.close()
-    combined_header = self.gen_combined_trace_header()
+    combined_header = self.epoch.combined_header
     with open(combined_temperature_trace_file, "w") as f:
         f.write("%s\n" %(combined_header))
     f.close()
@@ -363,7 +568,7 @@ class memTherm:
         rlb.clean_reliability_files()
         rlb.init_reliability_files(combined_header, ptrace_header)
 
-    mem_header = gen_mem_header()
+    mem_header = self.epoch.mem_header
     with open(full_bank_mode_trace_file, "w") as f:
         f.write("%s\n" %(mem_header))
     f.close()
@@ -443,7 +648,7 @@ class memTherm:
       # print(bank_mode_trace[bank])
       bank_mode_trace_string = bank_mode_trace_string + str(bank_mode_trace[bank]) + '\t'
     bank_mode_trace_string += "\r\n"
-    bank_mode_header = gen_mem_header()
+    bank_mode_header = self.epoch.mem_header
     # Write bank mode information into the trace file for use by hotspot.
     with open("%s" %(bank_mode_trace_file), "w") as f:
         f.write("%s\n" %(bank_mode_header))
@@ -466,7 +671,7 @@ class memTherm:
       # print(bank_mode_trace[bank])
       bank_mode_trace_string = bank_mode_trace_string + "{:.2f}".format(leakage) + '\t'
     bank_mode_trace_string += "\r\n"
-    bank_mode_header = gen_mem_header()
+    bank_mode_header = self.epoch.mem_header
     # Write bank mode information to the trace file for use by hotspot.
     with open("%s" %(bank_mode_trace_file), "w") as f:
         f.write("%s\n" %(bank_mode_header))
@@ -475,8 +680,10 @@ class memTherm:
 
 
     # calculate power trace using access rate and other parameters
-  def calc_power_trace(self, time, time_delta):
-    accesses_read, accesses_write, accesses_read_lowpower, accesses_write_lowpower = self.get_access_rates(time, time_delta)
+  def calc_power_trace(self, time, time_delta, access_rates = None):
+    if access_rates is None:
+      access_rates = self.get_access_rates(time, time_delta)
+    accesses_read, accesses_write, accesses_read_lowpower, accesses_write_lowpower = access_rates
  #    print accesses 
 
     avg_no_refresh_intervals_in_timestep =  timestep/t_refi                                                     # 20/7.8 = 2.56 refreshes on an average 
@@ -542,7 +749,7 @@ class memTherm:
         #print c_power_data
 
     power_trace = power_trace + c_power_data + "\r\n"
-    ptrace_header = gen_ptrace_header()
+    ptrace_header = self.epoch.ptrace_header
    #write power information into the trace file for use by hotspot
     with open("%s" %(power_trace_file), "w") as f:
         f.write("%s\n" %(ptrace_header))
@@ -550,19 +757,15 @@ class memTherm:
     f.close()
     return power_trace
 
-  def execute_core_hotspot(self, vdd_str):
+  def execute_core_hotspot(self, vdd_str, epochs = 1):
      #the function to execute core hotspot separately. It is called only for 3Dmem and 2D arch.
+     #Returns the run still in flight (see finish_core_hotspot), None without core thermal simulation.
     c_executable = hotspot_path + 'hotspot'
  #  hotspot_steady_temp_file = config.get('hotspot_c/hotspot_steady_temp_file')
  #  hotspot_grid_steady_file = config.get('hotspot_c/hotspot_grid_steady_file')
  #  hotspot_all_transient_file = config.get('hotspot_c/all_transient_file')
 
-    c_powerLogFileName = file(c_full_power_trace_file, 'a');
-    #c_powerInstantaneousFileName = file(c_power_trace_file, 'r');
-    if (core_thermal_enabled == 'true'):
-     c_thermalLogFileName = file(c_full_temperature_trace_file, 'a');
-    
-    first_run = (sum(1 for linee in open(combined_temperature_trace_file, 'r')) == 1) 
+    first_run = self.epoch.first_run
 #    needInitializing = os.stat(c_full_power_trace_file).st_size == 0
     if (core_thermal_enabled == 'true'):
      c_hotspot_args = c_executable  \
@@ -577,26 +780,98 @@ class memTherm:
                     + ' -steady_state_print_disable 1 ' \
                     + ' -l 1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1, ' \
                     + ' -type Core ' \
-                    + ' -sampling_intvl ' + str(interval_sec) \
                     + ' -grid_layer_file ' + c_hotspot_layer_file \
                     + ' -v ' + vdd_str \
                     + ' -detailed_3D on'
                     #+ ' -f ' + c_hotspot_floorplan_file \
+     if transient_only:
+         c_hotspot_args += ' -transient_only 1'
+     c_hotspot_args += ' -transient_solver ' + transient_solver
+     if transient_solver == 'rom':
+         c_hotspot_args += ' -rom_file ' + os.path.splitext(c_hotspot_layer_file)[0] + '.rom'
+     c_hotspot_args += ' -state_format ' + state_format
+     c_hotspot_args += ' -grid_threads ' + str(grid_threads)
+     if jacobian_cache:
+         c_hotspot_args += ' -jacobian_cache_dir ' + jacobian_cache_dir
      if (c_init_file_external!= "None") or (not first_run):
          c_hotspot_args += ' -init_file ' + c_init_file
 
      #print hotspot_binary, hotspot_args
 #     c_temperatures = subprocess.check_output([hotspot_binary] + hotspot_args)
      #print c_hotspot_args
-     os.system(c_hotspot_args)
-     os.system("cp -f " + c_hotspot_all_transient_file + " " + c_init_file)
+     return self.start_hotspot('core', c_hotspot_args, vdd_str, c_power_trace_file, c_temperature_trace_file, c_power_trace_file_total, c_hotspot_all_transient_file,
+                               epochs = epochs)
+
+  def finish_core_hotspot(self, run):
+    self.finish_hotspot(run)
+    if not resident_solver:
+      shutil.copyfile(c_hotspot_all_transient_file, c_init_file)
 
-     with open(c_temperature_trace_file, 'r') as instTemperatureFile:
-       instTemperatureFile.readline()  # ignore first line that contains the header
-       c_thermalLogFileName.write(instTemperatureFile.readline())
-     c_thermalLogFileName.close()
+    with open(c_temperature_trace_file, 'r') as instTemperatureFile:
+      instTemperatureFile.readline()  # ignore first line that contains the header
+      self.epoch.append(c_full_temperature_trace_file, instTemperatureFile.readline())
           
 
+  def start_hotspot(self, name, command, vdd_str, power_file, temperature_file, power_total_file, all_transient_file, bank_mode_file = None, epochs = 1):
+    #starts hotspot for one epoch and returns the run in flight, finish_hotspot waits for it. With resident_solver,
+    #the hotspot started by the first epoch is kept alive and fed the new power vector, writing the same trace files
+    #as a fresh run would. The thermal state stays in the resident process, so all_transient_file is only dumped at
+    #the end of the simulation. The power is applied for epochs sampling intervals (epochs skipped by adaptive_sampling).
+    while hotspot_cache_dirs:
+      directory = hotspot_cache_dirs.pop()
+      if not os.path.isdir(directory):
+        os.makedirs(directory)
+    if not resident_solver:
+      command += ' -sampling_intvl ' + str(interval_sec * epochs)
+      return (subprocess.Popen(command.split()), None, None, None)
+    if name not in self.hotspot_servers:
+      self.hotspot_servers[name] = HotSpotServer(command + ' -sampling_intvl ' + str(interval_sec))
+      self.hotspot_state_files[name] = all_transient_file
+    server = self.hotspot_servers[name]
+    server.set_vdd(vdd_str)
+    if bank_mode_file:
+      with open(bank_mode_file, 'r') as f:
+        server.set_bank_modes(f.readline(), f.readline())
+    with open(power_file, 'r') as f:
+      header = f.readline().split()
+      power_line = f.readline()
+    server.start_step(power_line, interval_sec * epochs if epochs > 1 else None)
+    return (server, header, temperature_file, power_total_file)
+
+  def finish_hotspot(self, run):
+    process, header, temperature_file, power_total_file = run
+    if not resident_solver:
+      process.wait()
+      return
+    temperatures, power_with_leakage = process.finish_step()
+    with open(temperature_file, 'w') as f:
+      f.write('%s\n%s\n' % ('\t'.join(header), temperatures))
+    with open(power_total_file, 'w') as f:
+      f.write('%s\n%s\n' % ('\t'.join(header), power_with_leakage))
+
+  def hook_sim_end(self):
+    if self.pending_epoch:
+      self.ES.wait_power()
+      self.finish_epoch()
+    #EnergyStats is not registered itself: clean up its last snapshot and print the McPAT cache report
+    self.ES.hook_sim_end()
+    if self.adaptive and self.adaptive.skipped:
+      #the memory rows of the epochs skipped at the end
+      self.mem_pending += self.adaptive.skipped
+      self.mem_accesses = add_accesses(self.mem_accesses, self.adaptive.accesses)
+    if self.mem_pending:
+      #the epochs since the last memory solve still need their rows in the memory traces
+      self.finish_memory(self.start_memory(sim.stats.time(), 0, self.get_core_vdd_for_hotspot()))
+    self.epoch.flush()
+    for filename in (power_trace_file_total, c_power_trace_file_total):
+      if os.path.exists(filename):
+        os.unlink(filename)
+    for name, server in self.hotspot_servers.items():
+      server.dump(self.hotspot_state_files[name])
+      server.close()
+    if self.adaptive:
+      self.adaptive.report()
+
   def gen_combined_trace_header(self):
     trace_header = ""
     for x in range(NUM_CORES):
@@ -605,7 +880,8 @@ class memTherm:
         trace_header = trace_header + "B_" + str(x) + "\t"
     return trace_header
 
-  # this function merges the separate core and mem trace files or reorders a single core+mem trace file, all to a uniform format
+  # this function merges the separate core and mem trace files or reorders a single core+mem trace file, all to a uniform format.
+  # Returns the combined row
   def format_trace_file(self, skip_header, c_inst_trace_file, inst_trace_file, combined_trace_file, combined_instTrace_file):
     if (type_of_stack == "DDR" or type_of_stack == "3Dmem"):        #separate mem and core traces are combined
         with open(c_inst_trace_file, 'r') as core_data_file:
@@ -656,16 +932,17 @@ class memTherm:
 
     #finally combine core and memory traces and print to the file
     final_data = core_data + "\t" + mem_data + "\r"
-    with open("%s" %(combined_trace_file), "a") as f:
-        f.write("%s\n" %(final_data))
-    f.close()
-
-    #combined, instantaneous power/temperature file generated
-    combined_header = self.gen_combined_trace_header()
-    with open("%s" %(combined_instTrace_file), "w") as f:
-        f.write("%s\n" %(combined_header))
-        f.write("%s\n" %(final_data))
-    f.close()
+    self.epoch.append(combined_trace_file, "%s\n" %(final_data))
+
+    #combined, instantaneous power/temperature file generated (read by reliability)
+    #and published to the scheduler under the same name
+    if combined_instTrace_file:
+        with open("%s" %(combined_instTrace_file), "w") as f:
+            f.write("%s\n" %(self.epoch.combined_header))
+            f.write("%s\n" %(final_data))
+        sim.telemetry.publish(combined_instTrace_file, self.epoch.combined_header.split(),
+                              [ float(v) for v in final_data.split() ])
+    return final_data
 
   def get_core_vdd_for_hotspot(self):
     lfreq = [ sim.dvfs.get_frequency(core) for core in range(sim.config.ncores) ]
@@ -688,40 +965,129 @@ class memTherm:
 
   # invokes hotspot to generate the temperature trace
   def calc_temperature_trace(self, time, time_delta):
-#   print power_trace
-    #invoke energystats function to compute core power trace
-    self.ES.periodic(time, time_delta)
+    if not pipelined or power_surrogate:
+      #the surrogate power model leaves no McPAT run to overlap with
+      activity = self.get_activity() if self.adaptive else None
+      if self.adaptive and self.adaptive.skip(activity):
+        self.skip_epoch(time, time_delta)
+        return
+      #invoke energystats function to compute core power trace
+      self.ES.periodic(time, time_delta)
+      self.capture_epoch(time, time_delta)
+      self.finish_epoch(activity)
+      return
+    #pipelined: McPAT for the previous epoch ran while this epoch was simulated. Finish that epoch
+    #first (it needs the files written when it was captured), then start McPAT for this one.
+    if self.pending_epoch:
+      self.ES.wait_power()
+      self.finish_epoch()
+    self.ES.update(wait = False)
+    self.capture_epoch(time, time_delta)
+
+  def capture_epoch(self, time, time_delta):
+    #everything that needs the simulator's state at the end of this epoch
     vdd_string = self.get_core_vdd_for_hotspot()     #used to scale core leakage power in hotspot
-
     self.write_bank_leakage_trace(time, time_delta)
+    #in pipelined mode the bank statistics have moved on by the time the epoch is finished
+    access_rates = self.get_access_rates(time, time_delta) if pipelined else None
+    epochs = 1
+    if self.adaptive and self.adaptive.skipped:
+      #this evaluation covers the skipped epochs too; McPAT's statistics already span all of them
+      access_rates = self.adaptive.average_accesses(access_rates or self.get_access_rates(time, time_delta))
+      epochs += self.adaptive.skipped
+    self.pending_epoch = (time, time_delta, vdd_string, access_rates, epochs)
+
+  def get_activity(self):
+    #what adaptive_sampling compares between epochs: instructions per core and accesses per bank (within a
+    #threshold), core frequencies and bank modes (exactly)
+    instructions = [ getter.last for getter in self.stats['instructions'] ]
+    accesses = [ self.stats['stat_rd'][bank].last + self.stats['stat_wr'][bank].last for bank in range(NUM_BANKS) ]
+    if mem_dtm != 'off':
+      accesses = [ a + self.stats['stat_rd_lowpower'][bank].last + self.stats['stat_wr_lowpower'][bank].last for bank, a in enumerate(accesses) ]
+    frequencies = [ sim.dvfs.get_frequency(core) for core in range(sim.config.ncores) ]
+    bank_modes = [ int(getter.last) for getter in self.stats['stat_bank_mode'] ]
+    return (instructions, accesses), (frequencies, bank_modes)
+
+  def skip_epoch(self, time, time_delta):
+    #neither McPAT nor hotspot run: every trace gets the row of the last evaluated epoch again, so they
+    #keep one row per epoch. The CPI stack log only has rows for evaluated epochs.
+    self.adaptive.add_skipped(self.get_access_rates(time, time_delta))
+    #the memory stack rows are added when it is solved next, for every epoch since its last solve
+    self.epoch.repeat((full_temperature_trace_file, full_power_trace_file))
+    for filename in (c_full_power_trace_file, 'PeriodicFrequency.log', 'PeriodicVdd.log'):
+      if os.path.exists(filename):
+        row = read_last_line(filename)
+        with open(filename, 'a') as f:
+          f.write(row)
+    self.epoch.end_epoch()
+
+  def finish_epoch(self, activity = None):
+    time, time_delta, vdd_string, access_rates, epochs = self.pending_epoch
+    self.pending_epoch = None
 
     #execute hotspot separately for core in case of 3Dmem and 2D memories
+    #the two stacks are thermally independent: with concurrent_stacks, the core hotspot solves while the
+    #memory power is computed and the memory hotspot solves
+    core_run = None
     if (core_thermal_enabled == 'true' and (type_of_stack=="3Dmem" or type_of_stack=="DDR")):
-        self.execute_core_hotspot(vdd_string)
-     #calculate memory power trace (combines with core trace in case of 3D and 2.5D within function)
-    self.calc_power_trace(time, time_delta)
-     #invoke the memory hotspot. It will include core parts automatically for 3D and 2.5D
-    hcmd = hotspot_command
-    hcmd += ' -v ' + vdd_string
-    first_run = (sum(1 for linee in open(combined_temperature_trace_file, 'r')) == 1) 
-    if (init_file_external!= "None") or (not first_run):
-        hcmd += ' -init_file ' + init_file
-    os.system(hcmd)
-    self.format_trace_file(True, c_temperature_trace_file, temperature_trace_file, combined_temperature_trace_file, combined_insttemperature_trace_file)
+        core_run = self.execute_core_hotspot(vdd_string, epochs)
+    if core_run and not concurrent_stacks:
+        self.finish_core_hotspot(core_run)
+        core_run = None
+    #the memory stack is solved on the first epoch and then every mem_epochs epochs, for the bank accesses of all
+    #of them. In between, the combined traces (and DTM) see the memory temperatures of its last solve
+    self.mem_pending += epochs
+    if mem_epochs > 1:
+      self.mem_accesses = add_accesses(self.mem_accesses, access_rates or self.get_access_rates(time, time_delta), epochs)
+    mem_run = None
+    if self.mem_pending >= mem_epochs or self.epoch.first_run:
+      mem_run = self.start_memory(time, time_delta, vdd_string, access_rates)
+    if core_run:
+        self.finish_core_hotspot(core_run)
+    if mem_run:
+        self.finish_memory(mem_run)
+    temperatures = self.format_trace_file(True, c_temperature_trace_file, temperature_trace_file, combined_temperature_trace_file, combined_insttemperature_trace_file)
     self.format_trace_file(True, c_power_trace_file, power_trace_file, combined_power_trace_file, combined_instpower_trace_file)
-    self.format_trace_file(True, c_power_trace_file_total, power_trace_file_total, combined_power_trace_file_total, combined_instpower_trace_file_total)
+    self.format_trace_file(True, c_power_trace_file_total, power_trace_file_total, combined_power_trace_file_total, None)
       #concatenate the per interval temperature trace into a single file
 
     # Update reliability values of all the cores.
     if rlb.enabled:
-        rlb.update_reliability_values(time_delta, time)
-
-    os.system("cp " + hotspot_all_transient_file + " " + init_file)
-    os.system("tail -1 " + temperature_trace_file + ">>" + full_temperature_trace_file)
-    os.system("tail -1 " + power_trace_file + " >>" + full_power_trace_file)
-
-    os.system("tail -1 " + bank_mode_trace_file + " >>" + full_bank_mode_trace_file)
-    os.system("rm -f tmmpFile_*")
+        rlb.update_reliability_values(time_delta * epochs, time, self.epoch.append)
+
+    self.epoch.append(full_bank_mode_trace_file, read_last_line(bank_mode_trace_file))
+    self.epoch.end_epoch()
+    if self.adaptive:
+      self.adaptive.evaluated(activity, [ float(t) for t in temperatures.split() ], epochs)
+
+  def start_memory(self, time, time_delta, vdd_string, access_rates = None):
+    #starts the memory hotspot for the epochs since its last solve, at their average bank accesses.
+    #Returns the run in flight and the number of epochs, see finish_memory
+    if self.mem_accesses:
+      access_rates = tuple([ [ s / float(self.mem_pending) for s in sums ] for sums in self.mem_accesses ])
+    epochs = self.mem_pending
+    self.mem_pending = 0
+    self.mem_accesses = None
+     #calculate memory power trace (combines with core trace in case of 3D and 2.5D within function)
+    self.calc_power_trace(time, time_delta, access_rates)
+     #invoke the memory hotspot. It will include core parts automatically for 3D and 2.5D
+    hcmd = hotspot_command
+    hcmd += ' -v ' + vdd_string
+    if (init_file_external!= "None") or (not self.epoch.first_run):
+        hcmd += ' -init_file ' + init_file
+    run = self.start_hotspot('mem', hcmd, vdd_string, power_trace_file, temperature_trace_file, power_trace_file_total, hotspot_all_transient_file,
+                             bank_mode_trace_file if mem_dtm != "off" else None, epochs)
+    return run, epochs
+
+  def finish_memory(self, memory_run):
+    run, epochs = memory_run
+    self.finish_hotspot(run)
+    if not resident_solver:
+      shutil.copyfile(hotspot_all_transient_file, init_file)
+    #the memory traces keep one row per epoch
+    for _ in range(epochs):
+      self.epoch.append(full_temperature_trace_file, read_last_line(temperature_trace_file))
+      self.epoch.append(full_power_trace_file, read_last_line(power_trace_file))
 
   def getStatsGetter(self, component, core, metric):
     # Some components don't exist (i.e. DRAM reads on cores that don't have a DRAM controller),
@@ -767,43 +1133,189 @@ class EnergyStats:
     self.in_stats_write = False
     self.power = {}
     self.energy = {}
+    #McPAT run in flight and the snapshot it reads, deleted once it is done
+    self.power_proc = None
+    self.name_done = None
+    #statistics since the last update, read in memory and handed to McPAT without going through sim.stats.sqlite3
+    if in_memory_stats:
+      self.stats_snapshot = StatsSnapshot()
+      self.stats_delta_file = os.path.join(sim.config.output_dir, 'energystats-temp.stats')
+    else:
+      self.stats_snapshot = None
+    #linear power model evaluated instead of McPAT (power_surrogate), fitted for each frequency/Vdd level on first use
+    if power_surrogate:
+      coefficients_file = sim.config.get('power/surrogate/coefficients_file') or os.path.join(sim.config.output_dir, 'power_surrogate.py')
+      self.surrogate = PowerSurrogate(coefficients_file)
+    else:
+      self.surrogate = None
+    #lookups of the McPAT result cache (tools/mcpat_cache.py) during this run
+    self.mcpat_cache_log = os.path.join(sim.config.output_dir, 'mcpat_cache.log')
+    if os.path.exists(self.mcpat_cache_log):
+      os.unlink(self.mcpat_cache_log)
     self.update()       #call the update function once dummy during init to preset various variables
 
   def periodic(self, time, time_delta):
-    self.update()
+    if self.surrogate:
+      self.update_surrogate()
+    else:
+      self.update()
 
   def hook_pre_stat_write(self, prefix):
-    if not self.in_stats_write:
+    if not self.in_stats_write and not self.surrogate:
       self.update()
 
   def hook_sim_end(self):
     if self.name_last:
       sim.util.db_delete(self.name_last, True)
+    self.report_mcpat_cache()
 
-  def update(self):
+  def report_mcpat_cache(self):
+    #each line is 'hit <saved s>', 'miss <McPAT s>' or 'verify <McPAT s> <relative error>'
+    if not os.path.exists(self.mcpat_cache_log):
+      return
+    hits = misses = 0
+    saved = spent = 0.
+    errors = []
+    for line in open(self.mcpat_cache_log):
+      fields = line.split()
+      if not fields:
+        continue
+      if fields[0] == 'hit':
+        hits += 1
+        saved += float(fields[1])
+      else:
+        misses += 1
+        spent += float(fields[1])
+        if fields[0] == 'verify':
+          errors.append(float(fields[2]))
+    if not hits + misses:
+      return
+    print '[MCPAT CACHE] %d evaluations, hit rate %.1f%%, saved %.1f s of %.1f s McPAT time' % (
+      hits + misses, 100. * hits / (hits + misses), saved, saved + spent)
+    if errors:
+      print '[MCPAT CACHE] error of %d verified hits: mean %.3f%%, max %.3f%%' % (
+        len(errors), 100. * sum(errors) / len(errors), 100. * max(errors))
+
+  def update(self, wait = True):
+    #with wait = False, McPAT is left running in the background and wait_power has to be called
+    #before the next update
     if sim.stats.time() == self.time_last_power:
       # Time did not advance: don't recompute
       return
     if not self.power or (sim.stats.time() - self.time_last_power >= 10 * sim.util.Time.US):
       # Time advanced significantly, or no power result yet: compute power
-      #   Save snapshot
-      current = 'energystats-temp%s' % ('B' if self.name_last and self.name_last[-1] == 'A' else 'A')
-      self.in_stats_write = True
-      sim.stats.write(current)
-      self.in_stats_write = False
-      #   If we also have a previous snapshot: update power
-      if self.name_last:
-        power = self.run_power(self.name_last, current)
-        #self.update_power(power)
-      #   Clean up previous last
-      if self.name_last:
-        sim.util.db_delete(self.name_last)
-      #   Update new last
-      self.name_last = current
+      if self.stats_snapshot:
+        #   Hand the statistics since the previous update to McPAT, if there was one
+        if self.stats_snapshot.write_delta(self.stats_delta_file):
+          self.start_power('--stats-delta=%s' % self.stats_delta_file)
+          if wait:
+            power = self.wait_power()
+      else:
+        #   Save snapshot
+        current = 'energystats-temp%s' % ('B' if self.name_last and self.name_last[-1] == 'A' else 'A')
+        self.in_stats_write = True
+        sim.stats.write(current)
+        self.in_stats_write = False
+        #   If we also have a previous snapshot: update power
+        if self.name_last:
+          self.start_power('--partial=%s:%s' % (self.name_last, current))
+          #   Clean up previous last once McPAT is done with it
+          self.name_done = self.name_last
+          if wait:
+            power = self.wait_power()
+            #self.update_power(power)
+        #   Update new last
+        self.name_last = current
       self.time_last_power = sim.stats.time()
     # Increment energy
     #self.update_energy()
 
+  def update_surrogate(self):
+    freq = [ sim.dvfs.get_frequency(core) for core in range(sim.config.ncores) ]
+    vdd = self.get_vdds(freq)
+    levels = [ '%d:%s' % (f, v) for f, v in zip(freq, vdd) ]
+    missing = self.surrogate.missing(levels)
+    if missing:
+      #fit the new levels to McPAT at the statistics since the last snapshot
+      if self.stats_snapshot:
+        self.stats_snapshot.write_delta(self.stats_delta_file)
+        self.calibrate_surrogate('--stats-delta=%s' % self.stats_delta_file, missing)
+      else:
+        current = 'energystats-temp%s' % ('B' if self.name_last and self.name_last[-1] == 'A' else 'A')
+        self.in_stats_write = True
+        sim.stats.write(current)
+        self.in_stats_write = False
+        self.calibrate_surrogate('--partial=%s:%s' % (self.name_last, current), missing)
+        sim.util.db_delete(self.name_last)
+        self.name_last = current
+      self.surrogate.load()
+    self.write_core_power_trace(self.surrogate.headings, self.surrogate.evaluate(levels, self.surrogate.rates()))
+    self.log_frequency_vdd(freq, vdd)
+
+  def calibrate_surrogate(self, stats_source, levels):
+    #stats_source: --partial=<snapshot>:<snapshot> or --stats-delta=<file>
+    subprocess.call('unset PYTHONHOME; %s -d %s -o %s -t %s %s --surrogate=%s --surrogate-levels=%s --surrogate-features=%s' % (
+      os.path.join(os.getenv('SNIPER_ROOT'), 'tools/mcpat.py'),
+      sim.config.output_dir,
+      os.path.join(sim.config.output_dir, 'energystats-temp'),
+      'dynamic',
+      stats_source,
+      self.surrogate.coefficients_file,
+      ','.join(levels),
+      ','.join(self.surrogate.features)
+    ), shell = True)
+
+  def write_core_power_trace(self, headings, power):
+    #the files written by the power trace writer of tools/mcpat.py (power_stack), in the same format
+    header = ''.join([ h + '\t' for h in headings ])
+    readings = ''.join([ str(p) + '\t' for p in power ])
+    initializing = not os.path.exists(c_full_power_trace_file) or os.stat(c_full_power_trace_file).st_size == 0
+    with open(c_full_power_trace_file, 'a') as f:
+      if initializing:
+        f.write(header + '\n')
+      f.write(readings + '\n')
+    with open(c_power_trace_file, 'w') as f:
+      f.write(header + '\n')
+      f.write(readings + ('\r\n' if type_of_stack == "DDR" or type_of_stack == "3Dmem" else ''))
+    if not initializing:
+      return
+    if (type_of_stack == "DDR" or type_of_stack == "3Dmem") and core_thermal_enabled == 'true':
+      with open(c_full_temperature_trace_file, 'a') as f:
+        f.write(header + '\n')
+    if rlb.enabled:
+      for key in ('rvalue_trace_file', 'full_rvalue_trace_file'):
+        with open(sim.config.get('reliability/log_files_core/' + key), 'w') as f:
+          f.write(header + '\n')
+      for key in ('state_file', 'delta_v_file'):
+        with open(sim.config.get('reliability/log_files_core/' + key), 'w') as f:
+          f.write('0.0\t' * len(headings) + '\n')
+
+  def log_frequency_vdd(self, freq, vdd):
+    #PeriodicFrequency.log, PeriodicVdd.log and InstantVdd.log as written by tools/mcpat.py
+    scale = { 14: 0.89, 10: 0.81, 8: 0.74 }.get(int(sim.config.get('power/technology_node')), 1.0)
+    header = '\t'.join([ 'Core%d' % i for i in range(sim.config.ncores) ]) + '\n'
+    for filename, values, mode in (('PeriodicFrequency.log', [ f / 1000. for f in freq ], 'a'),
+                                   ('PeriodicVdd.log', [ v * scale for v in vdd ], 'a'),
+                                   ('InstantVdd.log', [ v * scale for v in vdd ], 'w')):
+      row = '\t'.join([ '%.3f' % v for v in values ]) + '\n'
+      if mode == 'w':
+        #the scheduler may read it at any time: replace it in one go
+        with open(filename + '.tmp', 'w') as f:
+          f.write(header + row)
+        os.rename(filename + '.tmp', filename)
+        continue
+      write_header = not os.path.exists(filename) or os.stat(filename).st_size == 0
+      with open(filename, mode) as f:
+        if write_header:
+          f.write(header)
+        f.write(row)
+
+  def get_vdds(self, freq):
+    if rlb.enabled:
+      return [ self.get_vdd_from_freq(f) for f in rlb.target_freqs(freq) ]
+    else:
+      return [ self.get_vdd_from_freq(f) for f in freq ]
+
   def get_vdd_from_freq(self, f):
     # Assume self.dvfs_table is sorted from highest frequency to lowest
     if f > core_frequency_max:
@@ -815,10 +1327,7 @@ class EnergyStats:
 
   def gen_config(self, outputbase):
     freq = [ sim.dvfs.get_frequency(core) for core in range(sim.config.ncores) ]
-    if rlb.enabled:
-      vdd = [ self.get_vdd_from_freq(f) for f in rlb.target_freqs(freq) ]
-    else:
-      vdd = [ self.get_vdd_from_freq(f) for f in freq ]
+    vdd = self.get_vdds(freq)
     configfile = outputbase+'.cfg'
     cfg = open(configfile, 'w')
     cfg.write('''
@@ -830,22 +1339,32 @@ vdd[] = %s
     cfg.close()
     return configfile
 
-  def run_power(self, name0, name1):
+  def start_power(self, stats_source):
+    #stats_source: --partial=<snapshot>:<snapshot> or --stats-delta=<file>
     outputbase = os.path.join(sim.config.output_dir, 'energystats-temp')
 
     configfile = self.gen_config(outputbase)
 
-    os.system('unset PYTHONHOME; %s -d %s -o %s -c %s -t %s --partial=%s:%s --no-graph --no-text' % (
+    self.power_proc = subprocess.Popen('unset PYTHONHOME; %s -d %s -o %s -c %s -t %s %s --no-graph --no-text' % (
       os.path.join(os.getenv('SNIPER_ROOT'), 'tools/mcpat.py'),
       sim.config.output_dir,
       outputbase,
       configfile,
       'dynamic',
-      name0, name1
-    ))
+      stats_source
+    ), shell = True)
+
+  def wait_power(self):
+    if not self.power_proc:
+      return None
+    self.power_proc.wait()
+    self.power_proc = None
+    if self.name_done:
+      sim.util.db_delete(self.name_done)
+      self.name_done = None
 
     result = {}
-    execfile(outputbase + '.py', {}, result)
+    execfile(os.path.join(sim.config.output_dir, 'energystats-temp') + '.py', {}, result)
     return result['power']
 
 sim.util.register(memTherm())
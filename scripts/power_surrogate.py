@@ -0,0 +1,122 @@
+"""
+power_surrogate.py
+
+Linear power model that replaces the McPAT run of every epoch (power/surrogate).
+Power of every core power trace column is an intercept plus coefficients times
+the rates of a few per-core statistics. The coefficients are fitted by
+tools/mcpat.py --surrogate for every frequency/Vdd level the first time it is
+used, and kept in a file that can be shared by runs of the same configuration.
+"""
+
+import os, sim
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+# the McPAT inputs (tools/mcpat.py edit_XML) that are derived from per-core statistics.
+# %(timer)s is the timer of the core model: interval_timer or rob_timer
+FEATURES = [
+  'performance_model.instruction_count',
+  'performance_model.elapsed_time',
+  'performance_model.idle_elapsed_time',
+  '%(timer)s.uops_total',
+  '%(timer)s.uop_fp_addsub',
+  '%(timer)s.uop_fp_muldiv',
+  '%(timer)s.uop_branch',
+  '%(timer)s.uop_load',
+  '%(timer)s.uop_store',
+  '%(timer)s.uop_generic',
+  'branch_predictor.num-incorrect',
+  'L1-I.loads',
+  'L1-I.load-misses',
+  'L1-D.loads',
+  'L1-D.stores',
+  'L1-D.load-misses',
+  'L1-D.store-misses',
+  'L2.loads',
+  'L2.stores',
+  'L2.load-misses',
+  'L2.store-misses',
+  'L3.loads',
+  'L3.stores',
+  'L3.load-misses',
+  'L3.store-misses',
+]
+
+
+class PowerSurrogate:
+  def __init__(self, coefficients_file):
+    self.coefficients_file = coefficients_file
+    timer = '%s_timer' % sim.config.get('perf_model/core/type')
+    self.features = [ f % { 'timer': timer } for f in FEATURES ]
+    self.getters = [ [ self.getter(f, core) for f in self.features ] for core in range(sim.config.ncores) ]
+    self.last = self.sample()
+    self.time_last = sim.stats.time()
+    self.load()
+
+  def getter(self, feature, core):
+    objectName, metricName = feature.rsplit('.', 1)
+    # not every statistic exists in every configuration (i.e. no L3)
+    try:
+      return sim.stats.getter(objectName, core, metricName)
+    except:
+      return lambda: 0
+
+  def sample(self):
+    return [ [ float(get()) for get in getters ] for getters in self.getters ]
+
+  def load(self):
+    self.levels = {}
+    if not os.path.exists(self.coefficients_file):
+      return
+    result = {}
+    execfile(self.coefficients_file, {}, result)
+    surrogate = result['surrogate']
+    if surrogate['features'] != self.features:
+      # fitted for another configuration, will be replaced by the next calibration
+      return
+    self.headings = surrogate['headings']
+    self.owners = surrogate['owners']
+    # shared columns (owner -1) are driven by the sum of the statistics of all cores, stored after the cores
+    self.rows = [ o if o >= 0 else sim.config.ncores for o in self.owners ]
+    for level, table in surrogate['levels'].items():
+      if numpy:
+        self.levels[level] = (numpy.array(table['intercept']), numpy.array(table['coefficients']))
+      else:
+        self.levels[level] = (table['intercept'], table['coefficients'])
+
+  def missing(self, levels):
+    return sorted(set(levels) - set(self.levels))
+
+  def rates(self):
+    # statistics per second since the previous call, per core
+    now = self.sample()
+    time = sim.stats.time()
+    seconds = (time - self.time_last) / 1e15 or 1.
+    rates = [ [ (n - l) / seconds for n, l in zip(core_now, core_last) ] for core_now, core_last in zip(now, self.last) ]
+    self.last = now
+    self.time_last = time
+    return rates
+
+  def evaluate(self, levels, rates):
+    # power of every column of the core power trace. levels[core] is the level key of each core,
+    # shared columns use the level of core 0
+    col_levels = [ levels[o if o >= 0 else 0] for o in self.owners ]
+    if numpy:
+      x = numpy.array(rates)
+      x = numpy.vstack((x, x.sum(axis = 0)))[self.rows]
+      power = numpy.zeros(len(self.owners))
+      for level in set(col_levels):
+        intercept, coefficients = self.levels[level]
+        sel = numpy.array([ l == level for l in col_levels ])
+        power[sel] = intercept[sel] + (coefficients[sel] * x[sel]).sum(axis = 1)
+      return numpy.maximum(power, 0).tolist()
+    else:
+      total = [ sum(values) for values in zip(*rates) ]
+      power = []
+      for j, row in enumerate(self.rows):
+        intercept, coefficients = self.levels[col_levels[j]]
+        x = rates[row] if row < len(rates) else total
+        power.append(max(0., intercept[j] + sum([ c * v for c, v in zip(coefficients[j], x) ])))
+      return power
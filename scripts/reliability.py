@@ -104,7 +104,7 @@ def target_freqs(freqs):
 
     return new_f
 
-def execute_reliability(delta_t_ms, timestamp_ms, temperature_trace_file, vdd_trace_file, state_file, delta_v_file, instant_trace_file, periodic_trace_file):
+def execute_reliability(delta_t_ms, timestamp_ms, temperature_trace_file, vdd_trace_file, state_file, delta_v_file, instant_trace_file, periodic_trace_file, append=None):
     # Setup call to reliability binary `reliability_external`.
     reliability_cmd = "{} {} {} {} {} {} {} {} {}".format(
             reliability_exec, delta_t_ms, timestamp_ms, temperature_trace_file,
@@ -114,11 +114,17 @@ def execute_reliability(delta_t_ms, timestamp_ms, temperature_trace_file, vdd_tr
     print("[Reliability]: executing {}".format(reliability_cmd))
     os.system(reliability_cmd)
 
-    # Copy current rvalues to periodic log.
+    # Copy current rvalues to periodic log, through append(filename, row) if given,
+    # and publish them to the scheduler under the name of the instant trace.
     with open(instant_trace_file) as current_rval:
-        current_rval.readline()  # Skip header
+        header = current_rval.readline()
+        row = current_rval.readline()
+    if append:
+        append(periodic_trace_file, row)
+    else:
         with open(periodic_trace_file, 'a') as rvalues:
-            rvalues.write(current_rval.readline())
+            rvalues.write(row)
+    sim.telemetry.publish(instant_trace_file, header.split(), [ float(v) for v in row.split() ])
 
 def write_vdd_file(vdd_filename, mode):
     with open(vdd_file, 'r') as current_vdd:
@@ -148,8 +154,9 @@ def write_vdd_file(vdd_filename, mode):
             new_vdd.write('\n')
     return vdd_filename
 
-def update_reliability_values(delta_t, timestamp):
+def update_reliability_values(delta_t, timestamp, append=None):
     # Update the reliability values of the cores.
+    # append(filename, row) is used to add the rows of the periodic rvalue traces (memTherm_core's EpochState).
 
     delta_t_ms = delta_t/sim.util.Time.MS
     timestamp_ms = timestamp/sim.util.Time.MS
@@ -158,19 +165,19 @@ def update_reliability_values(delta_t, timestamp):
         c_vdd_file = write_vdd_file('InstantVdd_core.log', 'core')
         execute_reliability(delta_t_ms, timestamp_ms, c_temperature_trace_file,
                             c_vdd_file, c_state_file, c_delta_v_file,
-                            c_rvalue_trace_file, c_full_rvalue_trace_file)
+                            c_rvalue_trace_file, c_full_rvalue_trace_file, append)
 
         m_vdd_file = write_vdd_file('InstantVdd_mem.log', 'mem')
         execute_reliability(delta_t_ms, timestamp_ms, m_temperature_trace_file,
                             m_vdd_file, m_state_file, m_delta_v_file,
-                            m_rvalue_trace_file, m_full_rvalue_trace_file)
+                            m_rvalue_trace_file, m_full_rvalue_trace_file, append)
 
         comb_vdd_file = write_vdd_file('combined_InstantVdd.log', 'combined_subcore')
         execute_reliability(delta_t_ms, timestamp_ms, comb_temperature_trace_file,
                             comb_vdd_file, comb_state_file, comb_delta_v_file,
-                            comb_instant_trace_file, comb_periodic_trace_file)
+                            comb_instant_trace_file, comb_periodic_trace_file, append)
     else:
         comb_vdd_file = write_vdd_file('combined_InstantVdd.log', 'combined')
         execute_reliability(delta_t_ms, timestamp_ms, comb_temperature_trace_file,
                             comb_vdd_file, comb_state_file, comb_delta_v_file,
-                            comb_instant_trace_file, comb_periodic_trace_file)
+                            comb_instant_trace_file, comb_periodic_trace_file, append)
@@ -6,6 +6,7 @@ import sim_control as control
 import sim_bbv as bbv
 import sim_mem as mem
 import sim_thread as thread
+import sim_telemetry as telemetry
 import util
 
 import os, sqlite3
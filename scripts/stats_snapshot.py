@@ -0,0 +1,65 @@
+"""
+stats_snapshot.py
+
+In-memory statistics snapshots for the periodic McPAT runs (power/in_memory_stats).
+Instead of writing every statistic to sim.stats.sqlite3 (sim.stats.write), having
+tools/mcpat.py read two snapshots back and deleting the older one again
+(sim.util.db_delete), the statistics are read through sim.stats getters and only
+the difference with the previous snapshot is handed to McPAT, in the format of
+SniperStatsBase.parse_stats (tools/mcpat.py --stats-delta=<file>).
+
+The metrics are those listed in sim.stats.sqlite3 when the snapshot object is
+created. All models that McPAT needs statistics of are created by then.
+"""
+
+import os, sim
+try:
+  import cPickle as pickle
+except ImportError:
+  import pickle
+
+
+class StatsSnapshot:
+  def __init__(self):
+    self.ncores = sim.config.ncores
+    # [ (name, [ (index, getter), ... ]), ... ] for every index parse_stats can report (-1 .. ncores-1)
+    self.metrics = []
+    for objectName, metricName in sim.stats.db.execute('SELECT objectname, metricname FROM names ORDER BY nameid').fetchall():
+      getters = []
+      for index in range(-1, self.ncores):
+        try:
+          getters.append((index, sim.stats.getter(str(objectName), index, str(metricName))))
+        except ValueError:
+          pass
+      if getters:
+        self.metrics.append(('%s.%s' % (objectName, metricName), getters))
+    self.last = None
+
+  def sample(self):
+    return [ [ get() for index, get in getters ] for name, getters in self.metrics ]
+
+  def write_delta(self, filename):
+    # take a new snapshot and write the difference with the previous one to filename.
+    # Returns False for the first snapshot, which has nothing to compare to
+    now = self.sample()
+    last, self.last = self.last, now
+    if last is None:
+      return False
+    ncores = self.ncores
+    results = []
+    for (name, getters), values1, values2 in zip(self.metrics, last, now):
+      indices = [ index for index, get in getters ]
+      vals1 = dict(zip(indices, values1))
+      vals2 = dict(zip(indices, values2))
+      results += [ (name, idx, vals2.get(idx, 0) - vals1.get(idx, 0)) for idx in range(min(min(indices), 0), max(max(indices) + 1, ncores)) ]
+      if name == 'performance_model.elapsed_time':
+        results += [ ('performance_model.elapsed_time_begin', idx, vals1.get(idx, 0)) for idx in range(ncores) ]
+        results += [ ('performance_model.elapsed_time_end', idx, vals2.get(idx, 0)) for idx in range(ncores) ]
+      elif name == 'barrier.global_time':
+        results += [ ('barrier.global_time_begin', idx, vals1.get(idx, 0)) for idx in range(ncores) ]
+        results += [ ('barrier.global_time_end', idx, vals2.get(idx, 0)) for idx in range(ncores) ]
+    # written to a temporary file first so McPAT never reads a partial delta
+    with open(filename + '.tmp', 'wb') as fp:
+      pickle.dump(results, fp, pickle.HIGHEST_PROTOCOL)
+    os.rename(filename + '.tmp', filename)
+    return True
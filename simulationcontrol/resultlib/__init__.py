@@ -4,12 +4,15 @@ import gzip
 import io
 import os
 import re
+import sys
 try:
     from config import RESULTS_FOLDER
 except ImportError:
     from ..config import RESULTS_FOLDER
 
 HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(HERE)), 'scripts'))
+import bintrace
 RESULT_DIRS = [RESULTS_FOLDER]
 NAME_REGEX = r'results_(\d+-\d+-\d+_\d+.\d+)_([a-zA-Z0-9_\.\+]*)_((splash2|parsec)-.*)'
 
@@ -103,7 +106,21 @@ def get_individual_response_times(run):
         return [resp_times[task] for task in keys]
 
 
+def _find_binary_trace(run, filename):
+    for base_dir in RESULT_DIRS:
+        full_filename = bintrace.binary_filename(os.path.join(base_dir, run, filename))
+        if os.path.exists(full_filename):
+            return full_filename
+    return None
+
+
 def _get_traces(run, filename, multiplicator=1):
+    binary = _find_binary_trace(run, filename)
+    if binary:
+        # columns of the memory mapped matrix, not copied unless scaled
+        header, data = bintrace.memmap(binary)
+        return list(data.T if multiplicator == 1 else multiplicator * data.T)
+
     traces = []
 
     with _open_file(run, filename) as f:
@@ -116,12 +133,20 @@ def _get_traces(run, filename, multiplicator=1):
 
 
 def _get_header(run, filename):
+    binary = _find_binary_trace(run, filename)
+    if binary:
+        return bintrace.layout(binary)[0]
     with _open_file(run, filename) as f:
         header = f.readline().split()
     return header
 
 
 def _get_named_traces(run, filename, multiplicator=1):
+    binary = _find_binary_trace(run, filename)
+    if binary:
+        header, data = bintrace.memmap(binary)
+        return collections.OrderedDict((h, t) for h, t in zip(header, data.T if multiplicator == 1 else multiplicator * data.T))
+
     traces = []
 
     with _open_file(run, filename) as f:
@@ -0,0 +1,344 @@
+"""
+rethermal.py
+
+Recomputes the temperatures (and reliability values) of a finished run for
+other thermal configurations, without simulating the workload again.
+
+The saved power traces of the run (full_power_mem.trace, full_power_core.trace,
+PeriodicVdd.log and full_bank_mode.trace) are replayed epoch by epoch through
+resident HotSpot processes (hotspot -server) built from the floorplans,
+hotspot.config and layer files of each variant. Every variant is evaluated in
+its own process and written as a new run next to the original one:
+
+  results_<date>_<config>+<variant>_<tasks>
+
+with the files of the original run and a new combined_temperature.trace (and
+combined_rvalue.trace), so resultlib and the plots work on it as usual.
+
+A variant is a name and the sim.cfg options it changes, e.g.
+
+  rethermal.py <run> --variant thinsink:hotspot/hotspot_config_file_mem=config/hotspot/3D/thin_hotspot.config
+                     --variant fine:hotspot/floorplan_folder=config/hotspot/3D_fine,hotspot/layer_file_mem=config/hotspot/3D_fine/stack.lcf
+
+Paths are relative to the sniper root as in the configuration files. The power
+of the run is replayed as it was: DTM/DVFS decisions that would differ at the
+new temperatures, and the leakage feedback on the recorded power, are not
+re-simulated.
+"""
+
+import argparse
+import configparser
+import datetime
+import gzip
+import multiprocessing
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import config
+from resultlib import NAME_REGEX, find_run
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SNIPER_BASE = os.path.dirname(HERE)
+sys.path.append(os.path.join(SNIPER_BASE, 'scripts'))
+import bintrace
+from hotspot_server import HotSpotServer
+
+# files recomputed for a variant (combined_rvalue.trace only when the reliability is recomputed), all others
+# are taken over from the original run. The per-stack rvalue traces are not recomputed and stay as they were
+RECOMPUTED = ('combined_temperature.trace',
+              'combined_rvalue.trace')
+# PeriodicVdd.log holds the vdd scaled to the technology node (tools/mcpat.py)
+VDD_SCALE = {14: 0.89, 10: 0.81, 8: 0.74}
+
+
+def read_sim_config(filename):
+    """ the options of a sim.cfg as 'section/key' -> value, the default value for per-core options """
+    parser = configparser.ConfigParser(strict=False, interpolation=None)
+    parser.read(filename)
+    cfg = {}
+    for section in parser.sections():
+        # the default comes before the per-core ('key[]') value
+        for key, value in sorted(parser.items(section)):
+            value = value.split('#')[0].strip().strip('"')
+            if key.endswith('[]'):
+                key = key[:-2]
+                if ',' in value:
+                    value = value.split(',')[0].strip('"')
+            cfg.setdefault('{}/{}'.format(section, key), value)
+    return cfg
+
+
+def sniper_path(path):
+    return os.path.join(SNIPER_BASE, path)
+
+
+def read_trace(run_dir, filename):
+    """ (header, rows) of a saved trace, text (plain or gzip'd) or binary """
+    full_filename = os.path.join(run_dir, filename)
+    binary = bintrace.binary_filename(full_filename)
+    if os.path.exists(binary):
+        header, rows = bintrace.read(binary)
+        return header, [['{:.7g}'.format(v) for v in row] for row in rows]
+    if os.path.exists(full_filename):
+        f = open(full_filename, 'r')
+    elif os.path.exists(full_filename + '.gz'):
+        f = gzip.open(full_filename + '.gz', 'rt')
+    else:
+        raise FileNotFoundError('{} not found in {}'.format(filename, run_dir))
+    with f:
+        header = f.readline().split()
+        rows = [line.split() for line in f if line.strip()]
+    return header, rows
+
+
+def has_trace(run_dir, filename):
+    full_filename = os.path.join(run_dir, filename)
+    return any(os.path.exists(f) for f in (full_filename, full_filename + '.gz', bintrace.binary_filename(full_filename)))
+
+
+def write_trace(directory, filename, header, rows, binary):
+    """ a trace in the format runlib.save_output stores it in """
+    full_filename = os.path.join(directory, filename)
+    if binary:
+        bintrace.create(bintrace.binary_filename(full_filename), header)
+        bintrace.append(bintrace.binary_filename(full_filename), [[float(v) for v in row] for row in rows])
+        return
+    with gzip.open(full_filename + '.gz', 'wt') as f:
+        f.write(''.join(h + '\t' for h in header) + '\n')
+        for row in rows:
+            f.write(''.join(v + '\t' for v in row) + '\n')
+
+
+class Stack(object):
+    """ the layout of the thermal stack(s) of a run, as in memTherm_core.py """
+    def __init__(self, cfg):
+        self.type = cfg['memory/type_of_stack']
+        self.num_cores = int(cfg['general/total_cores'])
+        self.num_banks = int(cfg['memory/num_banks'])
+        self.banks_in_x = int(cfg['memory/banks_in_x'])
+        self.banks_in_y = int(cfg['memory/banks_in_y'])
+        self.banks_in_z = int(cfg['memory/banks_in_z'])
+        self.num_lc = self.banks_in_x * self.banks_in_y
+        # a separate core model only next to a DDR or off-chip 3D memory
+        self.core_model = cfg['core_thermal/enabled'] == 'true' and self.type in ('DDR', '3Dmem')
+
+    def combined_row(self, core_values, mem_values):
+        """ the core and bank columns of combined_*.trace from the hotspot output (format_trace_file) """
+        if self.type in ('DDR', '3Dmem'):
+            if self.type == '3Dmem':
+                mem_values = mem_values[self.num_lc:]
+            return core_values + mem_values
+        if self.type == '3D':
+            return mem_values[self.num_banks:] + mem_values[:self.num_banks]
+        if self.type == '2.5D':
+            mem_portion = mem_values[self.num_cores + self.num_lc + 3:]
+            banks_per_layer = self.banks_in_x * self.banks_in_y
+            banks = []
+            for layer in range(self.banks_in_z):
+                start = layer * (banks_per_layer + 3)
+                banks.extend(mem_portion[start:start + banks_per_layer])
+            return mem_values[:self.num_cores] + banks
+        raise ValueError('unknown type_of_stack {}'.format(self.type))
+
+
+def hotspot_command(cfg, name, header, stack_type):
+    """ the hotspot command line of memTherm_core.py for the 'mem' or 'core' model, without -v """
+    interval_sec = int(cfg['hotspot/sampling_interval']) * 1e-9
+    layer_file = sniper_path(cfg['hotspot/layer_file_' + name])
+    # -p only provides the column names to a resident hotspot
+    with open('power_{}.trace'.format(name), 'w') as f:
+        f.write('\t'.join(header) + '\n')
+    command = [os.path.join(sniper_path(cfg['hotspot/tool_path']), 'hotspot'),
+               '-c', sniper_path(cfg['hotspot/hotspot_config_file_' + name]),
+               '-p', 'power_{}.trace'.format(name),
+               '-o', 'temperature_{}.trace'.format(name),
+               '-model_secondary', '1', '-model_type', 'grid',
+               '-steady_state_print_disable', '1',
+               '-l', '1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,',
+               '-type', stack_type,
+               '-sampling_intvl', str(interval_sec),
+               '-grid_layer_file', layer_file,
+               '-detailed_3D', 'on',
+               '-transient_only', '1',
+               '-transient_solver', cfg['hotspot/transient_solver'],
+               '-grid_threads', cfg['hotspot/grid_threads']]
+    if cfg['hotspot/transient_solver'] == 'rom':
+        command += ['-rom_file', os.path.splitext(layer_file)[0] + '.rom']
+    if cfg['hotspot/init_file_external_' + name] != 'None':
+        command += ['-init_file', sniper_path(cfg['hotspot/init_file_external_' + name])]
+    return ' '.join(command)
+
+
+def vdd_strings(cfg, rows):
+    """ the per-epoch -v arguments of hotspot (core vdd normalized to 1.2V), from the rows of PeriodicVdd.log """
+    scale = VDD_SCALE.get(int(cfg.get('power/technology_node', 0) or 0), 1.0)
+    return [','.join(str(round(float(v) / scale / 1.2, 1)) for v in row) for row in rows]
+
+
+class Reliability(object):
+    """ the combined reliability model of scripts/reliability.py, stepped once per epoch """
+    def __init__(self, cfg, header):
+        self.executable = sniper_path(cfg['reliability/reliability_executable'])
+        self.acceleration_factor = cfg['reliability/acceleration_factor']
+        self.base_vdd = float(cfg['power/vdd'])
+        self.num_banks = int(cfg['memory/num_banks'])
+        self.header = header
+        for filename in ('rlb_state.trace', 'delta_v.trace'):
+            with open(filename, 'w') as f:
+                f.write('0.0\t' * len(header) + '\n')
+
+    def step(self, delta_t_ms, timestamp_ms, temperatures, core_vdds):
+        with open('combined_insttemperature.trace', 'w') as f:
+            f.write('\t'.join(self.header) + '\n' + '\t'.join(temperatures) + '\n')
+        with open('combined_InstantVdd.log', 'w') as f:
+            f.write('\t'.join('Core{}'.format(i) for i in range(len(core_vdds))) + '\n')
+            f.write(''.join('{}\t'.format(v) for v in core_vdds + [self.base_vdd] * self.num_banks) + '\n')
+        subprocess.check_call([self.executable, str(delta_t_ms), str(timestamp_ms), 'combined_insttemperature.trace',
+                               'combined_InstantVdd.log', 'rlb_state.trace', 'delta_v.trace',
+                               'combined_instrvalue.trace', self.acceleration_factor], stdout=subprocess.DEVNULL)
+        with open('combined_instrvalue.trace', 'r') as f:
+            f.readline()
+            return f.readline().split()
+
+
+def rethermal(run_dir, cfg, work_dir):
+    """ returns the combined temperature rows and the combined rvalue rows (None without reliability) """
+    stack = Stack(cfg)
+    os.chdir(work_dir)
+    # the lcf files refer to the floorplans relative to the run directory
+    os.mkdir('hotspot')
+    floorplan_folder = sniper_path(cfg['hotspot/floorplan_folder'])
+    shutil.copytree(floorplan_folder, os.path.join('hotspot', os.path.basename(os.path.normpath(floorplan_folder))))
+
+    mem_header, mem_power = read_trace(run_dir, 'full_power_mem.trace')
+    core_header, core_power = read_trace(run_dir, 'full_power_core.trace') if stack.core_model else (None, mem_power)
+    _, core_vdds = read_trace(run_dir, 'PeriodicVdd.log')
+    vdds = vdd_strings(cfg, core_vdds)
+    bank_modes = None
+    if cfg['scheduler/open/dram/dtm'] != 'off':
+        if has_trace(run_dir, 'full_bank_mode.trace'):
+            bank_modes = read_trace(run_dir, 'full_bank_mode.trace')
+        else:
+            print('WARNING: {} has no full_bank_mode.trace, all banks are taken as in normal power mode'.format(run_dir))
+    for filename, rows in (('full_power_core.trace', core_power),
+                           ('PeriodicVdd.log', core_vdds),
+                           ('full_bank_mode.trace', bank_modes[1] if bank_modes else mem_power)):
+        if len(rows) < len(mem_power):
+            raise ValueError('{} has {} epochs, full_power_mem.trace {}'.format(filename, len(rows), len(mem_power)))
+
+    combined_header = ['C_{}'.format(i) for i in range(stack.num_cores)] + ['B_{}'.format(i) for i in range(stack.num_banks)]
+    reliability = None
+    if cfg['reliability/enabled'] == 'true':
+        if cfg['core_power/tp'] != 'true':
+            print('WARNING: reliability with subcore components is not recomputed')
+        elif not os.path.exists(sniper_path(cfg['reliability/reliability_executable'])):
+            print('WARNING: {} not found, reliability is not recomputed'.format(cfg['reliability/reliability_executable']))
+        else:
+            reliability = Reliability(cfg, combined_header)
+    interval_ms = int(cfg['hotspot/sampling_interval']) * 1e-6
+
+    servers = {'mem': HotSpotServer(hotspot_command(cfg, 'mem', mem_header, stack.type))}
+    if stack.core_model:
+        servers['core'] = HotSpotServer(hotspot_command(cfg, 'core', core_header, 'Core'))
+
+    temperatures = []
+    rvalues = []
+    try:
+        for epoch, power in enumerate(mem_power):
+            # the core and memory stacks are independent and solve at the same time
+            core_temperatures = []
+            if stack.core_model:
+                servers['core'].set_vdd(vdds[epoch])
+                servers['core'].start_step('\t'.join(core_power[epoch]))
+            servers['mem'].set_vdd(vdds[epoch])
+            if bank_modes:
+                servers['mem'].set_bank_modes('\t'.join(bank_modes[0]), '\t'.join(bank_modes[1][epoch]))
+            servers['mem'].start_step('\t'.join(power))
+            if stack.core_model:
+                core_temperatures = servers['core'].finish_step()[0].split()
+            mem_temperatures = servers['mem'].finish_step()[0].split()
+            temperatures.append(stack.combined_row(core_temperatures, mem_temperatures))
+            if reliability:
+                rvalues.append(reliability.step(interval_ms, (epoch + 1) * interval_ms, temperatures[-1],
+                                                core_vdds[epoch]))
+    finally:
+        for server in servers.values():
+            server.close()
+    return combined_header, temperatures, rvalues if reliability else None
+
+
+def save_variant(run, name, overrides, results_folder=config.RESULTS_FOLDER):
+    """ evaluates one variant of a run and saves it as a new run, returns the name of the new run """
+    run_dir = find_run(run)
+    cfg = read_sim_config(os.path.join(run_dir, 'sim.cfg'))
+    unknown = set(overrides) - set(cfg)
+    if unknown:
+        raise ValueError('unknown options in variant {}: {}'.format(name, ', '.join(sorted(unknown))))
+    cfg.update(overrides)
+
+    started = datetime.datetime.now()
+    work_dir = tempfile.mkdtemp(prefix='rethermal-')
+    cwd = os.getcwd()
+    try:
+        header, temperatures, rvalues = rethermal(run_dir, cfg, work_dir)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir)
+    ended = datetime.datetime.now()
+
+    m = re.search(NAME_REGEX, os.path.basename(os.path.normpath(run_dir)))
+    new_run = 'results_{}_{}+{}_{}'.format(started.strftime('%Y-%m-%d_%H.%M'), m.group(2), name, m.group(3))
+    directory = os.path.join(results_folder, new_run)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    recomputed = set(RECOMPUTED) if rvalues is not None else set(RECOMPUTED) - {'combined_rvalue.trace'}
+    for filename in os.listdir(run_dir):
+        if filename.replace('.gz', '').replace(bintrace.SUFFIX, '') not in recomputed:
+            shutil.copy(os.path.join(run_dir, filename), directory)
+    binary = os.path.exists(bintrace.binary_filename(os.path.join(run_dir, 'combined_temperature.trace')))
+    write_trace(directory, 'combined_temperature.trace', header, temperatures, binary)
+    if rvalues is not None:
+        write_trace(directory, 'combined_rvalue.trace', header, rvalues, binary)
+    with open(os.path.join(directory, 'rethermalinfo.txt'), 'w') as f:
+        f.write('source:     {}\n'.format(os.path.basename(os.path.normpath(run_dir))))
+        f.write('variant:    {}\n'.format(name))
+        for key, value in sorted(overrides.items()):
+            f.write('            {} = {}\n'.format(key, value))
+        f.write('epochs:     {}\n'.format(len(temperatures)))
+        f.write('duration:   {}\n'.format(ended - started))
+    return new_run
+
+
+def parse_variant(text):
+    name, _, options = text.partition(':')
+    if not re.match(r'^[a-zA-Z0-9_\.]+$', name):
+        raise argparse.ArgumentTypeError('variant name {} is not a valid configuration tag'.format(name))
+    overrides = {}
+    for option in filter(None, options.split(',')):
+        key, sep, value = option.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError('option {} of variant {} is not key=value'.format(option, name))
+        overrides[key.strip()] = value.strip()
+    return name, overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description='recompute the temperatures of a finished run for other thermal configurations')
+    parser.add_argument('run', help='results directory (name in the results folder or path)')
+    parser.add_argument('--variant', type=parse_variant, action='append', required=True,
+                        help='name:section/key=value,... (sim.cfg options, paths relative to the sniper root)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='variants evaluated in parallel')
+    args = parser.parse_args()
+
+    with multiprocessing.Pool(min(args.jobs, len(args.variant))) as pool:
+        new_runs = pool.starmap(save_variant, [(args.run, name, overrides) for name, overrides in args.variant])
+    for new_run in new_runs:
+        print(new_run)
+
+
+if __name__ == '__main__':
+    main()
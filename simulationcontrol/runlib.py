@@ -16,6 +16,8 @@ from resultlib.plot import create_plots
 
 HERE = os.path.dirname(os.path.abspath(__file__))
 SNIPER_BASE = os.path.dirname(HERE)
+sys.path.append(os.path.join(SNIPER_BASE, 'scripts'))
+import bintrace
 BENCHMARKS = os.path.join(SNIPER_BASE, 'benchmarks')
 BATCH_START = datetime.datetime.now().strftime('%Y-%m-%d_%H.%M')
 
@@ -56,6 +58,9 @@ def change_configuration_files(configuration_tags):
 
 
 def create_video(run):
+    trace = os.path.join(BENCHMARKS, 'combined_temperature.trace')
+    if not os.path.exists(trace) and os.path.exists(bintrace.binary_filename(trace)):
+        bintrace.to_text(bintrace.binary_filename(trace), trace)
     args = [
         os.path.join(SNIPER_BASE, 'scripts', 'heatView.py'),
         '--cores_in_x', str(config.NUMBER_CORES_X),
@@ -69,7 +74,7 @@ def create_video(run):
         '--layer_to_view', str(config.VIDEO_BREAKOUT_LAYER),
         '--type_to_view', config.VIDEO_BREAKOUT_TYPE,
         '--samplingRate', '1',
-        '--traceFile', os.path.join(BENCHMARKS, 'combined_temperature.trace'),
+        '--traceFile', trace,
         '--output', os.path.join(config.RESULTS_FOLDER, run, 'video'),
         '--clean',
     ]
@@ -107,6 +112,7 @@ def save_output(configuration_tags, benchmark, console_output, started, ended):
     for f in ('combined_power.trace',  # this contains power of cores and memory banks
               'full_power_mem.trace',  # this contains power of memory banks and logic cores (memory controllers)
               'full_power_core.trace',  # this contains power of cores (included for consistency)
+              'full_bank_mode.trace',  # this contains the bank leakage factors of low power mode (replayed by rethermal.py)
               'combined_temperature.trace',
               'combined_rvalue.trace',
               'full_rvalue_mem.trace',
@@ -114,6 +120,11 @@ def save_output(configuration_tags, benchmark, console_output, started, ended):
               'PeriodicFrequency.log',
               'PeriodicVdd.log',
               'PeriodicCPIStack.log',):
+        binary = bintrace.binary_filename(os.path.join(BENCHMARKS, f))
+        if os.path.exists(binary):
+            # binary traces (hotspot/trace_format = binary) stay uncompressed so resultlib can map them into memory
+            shutil.copy(binary, directory)
+            continue
         with open(os.path.join(BENCHMARKS, f), 'rb') as f_in, gzip.open('{}.gz'.format(os.path.join(directory, f)), 'wb') as f_out:
             shutil.copyfileobj(f_in, f_out)
     create_plots(run)
@@ -105,6 +105,39 @@ def test_thermal_feature(cfg):
     print('Simulation result saved in {}'.format(result_dir))
     print('\n')
 
+def test_mcpat_cache_report(cfg):
+    # the McPAT result cache prints its hit rate and saved time at the end of the simulation
+    global test_summary
+    global pass_count
+
+    print('Running test case with the McPAT cache and configuration {}'.format(cfg))
+    print('---------------------------------------------------')
+
+    command_line = os.path.join(SNIPER_ROOT, 'run-sniper')
+    args = '-v -s memTherm_core -n {num_cores} -c {config} -g power/mcpat_cache/enabled=true -- {test_case}'  \
+        .format(num_cores=NUMBER_CORES,
+                config=cfg,
+                test_case=TEST_CASE_EXEC)
+
+    p = subprocess.Popen([command_line] + args.split(' '), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, cwd=TEST_CASE_PATH)
+    console_output = p.communicate()[0].decode('utf-8')
+
+    result_dir = os.path.join(CoMeT_RESULTS, cfg + '_mcpat_cache')
+    if not os.path.exists(result_dir):
+        os.mkdir(result_dir)
+    with open(os.path.join(result_dir, 'simulation.log'), 'w') as f:
+        f.write(console_output)
+
+    if '[MCPAT CACHE]' in console_output:
+        test_case_result = 'McPAT cache report printed for configuration {}.cfg'.format(cfg)
+        pass_count += 1
+    else:
+        test_case_result = 'McPAT cache report missing for configuration {}.cfg. Check {} for details.'.format(cfg, os.path.join(result_dir, 'simulation.log'))
+    print(test_case_result)
+    print('\n')
+    test_summary += test_case_result
+    test_summary += '\n'
+
 def test_video_generation_feature(cfg):
    
     global pass_count 
@@ -183,12 +216,13 @@ def auto_test():
     for config in test_configs:  
         test_thermal_feature(config)
         test_video_generation_feature(config)
+    test_mcpat_cache_report(CONFIG_3Dmem)
     
     f = open("test_summary.txt", "w")
     f.write("Summary of CoMet Features\n")
     f.write("=========================\n")
     f.write(test_summary)
-    f.write("\n{} of 12 cases passed".format(pass_count))
+    f.write("\n{} of {} cases passed".format(pass_count, 2 * len(test_configs) + 1))
 
     print('\nTest for all four configurations and video generation completed. Please check test_summary for details\n')
     print('Simulation results and videos stored in comet_results.\n')
@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-import os, sys, math, re, collections, buildstack, gnuplot, getopt, pprint, sniper_lib, sniper_config, sniper_stats
+import os, sys, math, re, collections, hashlib, cPickle, buildstack, gnuplot, getopt, pprint, sniper_lib, sniper_config, sniper_stats, mcpat_cache
 import math
 import subprocess
 from cpistack import cpistack_compute
@@ -23,6 +23,14 @@ DRAM_POWER_STATIC_TSV_INTERFACE = .00934/8 # 9.34mW for 64-bit data bus
 DRAM_CHIPS_PER_DIMM = 8
 DRAM_DIMMS_PER_SOCKET = 4
 
+# calibration of the linear power surrogate (calibrate_surrogate): relative size of the feature perturbations,
+# and the smallest perturbation in events/s for features that are (close to) zero at the calibration point
+SURROGATE_STEP = 0.1
+SURROGATE_MIN_RATE = 1e7
+
+# 'cfg' slots of the McPAT XML template that change between epochs (DVFS), see compile_template
+EPOCH_CONFIG_SLOTS = ('core_clock', 'core_vdd', 'L2_clock', 'L3_clock', 'NoC_clock', 'L2_vdd', 'L3_vdd', 'NoC_vdd')
+
 
 # Round up to the next nearest power of 2 if the number isn't already a power of two
 # Inspiration from http://stackoverflow.com/questions/53161/find-the-highest-order-bit-in-c
@@ -93,14 +101,21 @@ def mcpat_bin():
     suffix = ''
   bin = os.path.join(mcpatdir, 'mcpat-1.0%s' % suffix)
   if os.path.exists(bin):
-    # Fancy McPAT versions haven't been downloaded yet, use the plain old one
     return bin
   else:
-    os.path.join(mcpatdir, 'mcpat-1.0')
+    # Fancy McPAT versions haven't been downloaded yet, use the plain old one
+    return os.path.join(mcpatdir, 'mcpat-1.0')
 
-def mcpat_run(inputfile, outputfile):
-  os.system("LD_LIBRARY_PATH=$LD_LIBRARY_PATH:%s %s -print_level 5 -opt_for_clk 1 -infile %s > %s" % \
-    (mcpat_path(), mcpat_bin(), inputfile, outputfile))
+def mcpat_run(inputfile, outputfile = None):
+  # Returns McPAT's report, which is also written to outputfile if given.
+  # The binary is started directly and its output kept in memory, without a shell or a file round trip.
+  env = dict(os.environ)
+  env['LD_LIBRARY_PATH'] = ':'.join(filter(None, [ env.get('LD_LIBRARY_PATH'), mcpat_path() ]))
+  report = subprocess.Popen([ mcpat_bin(), '-print_level', '5', '-opt_for_clk', '1', '-infile', inputfile ],
+                            stdout = subprocess.PIPE, env = env).communicate()[0]
+  if outputfile:
+    file(outputfile, 'w').write(report)
+  return report
 
 
 all_items = [
@@ -142,6 +157,12 @@ def log_frequencies(results):
     f.write('\t'.join('{:.3f}'.format(f) for f in frequencies))
     f.write('\n')
 
+def replace_file(filename, text):
+  # the scheduler reads the instantaneous logs at any time, also while a pipelined McPAT
+  # writes them: the new contents replace the file in one go
+  file(filename + '.tmp', 'w').write(text)
+  os.rename(filename + '.tmp', filename)
+
 def log_vdd(results):
   ncores = int(results['config']['general/total_cores'])
   size_nm = int(results['config']['power/technology_node'])
@@ -167,13 +188,8 @@ def log_vdd(results):
     f.write('\t'.join('{:.3f}'.format(f) for f in vdd))
     f.write('\n')
 
-  filename = 'InstantVdd.log'
-  with open(filename, 'w') as f:
-    if os.stat(filename).st_size == 0:
-      f.write('\t'.join('Core{}'.format(i) for i in range(ncores)))
-      f.write('\n')
-    f.write('\t'.join('{:.3f}'.format(f) for f in vdd))
-    f.write('\n')
+  replace_file('InstantVdd.log', '\t'.join('Core{}'.format(i) for i in range(ncores)) + '\n'
+                                 + '\t'.join('{:.3f}'.format(f) for f in vdd) + '\n')
 
 def log_cpi_stack(results):
   cpiStack = cpistack_compute(data=results)
@@ -187,70 +203,46 @@ def log_cpi_stack(results):
   labels = cpiStack.cpiitems.names
   compactify = ('issue', 'sync', 'imbalance')
 
-  for filename, write_header, mode in ((cpi_stack_file, True, 'w'),
-                                       (cpi_stack_periodic_file, os.stat(cpi_stack_periodic_file).st_size == 0, 'a')):
-    with open(filename, mode) as f:
-      if write_header:
-        f.write('Metric\t')
-        f.write('\t'.join('Core{}'.format(i) for i in range(ncores)))
-        f.write('\n')
-
-      f.write('total\t')
-      f.write('\t'.join('{:.3f}'.format(sum(cpiStackData[i].values())) for i in range(ncores)))
-      f.write('\n')
-
-      for label in labels:
-        if any(label.startswith(c) for c in compactify):
-          if label not in compactify:
-            continue
-          values = []
-          for i in range(ncores):
-            h = 0
-            coreStack = cpiStackData[i]
-            for key, value in coreStack.items():
-              if key.startswith(label):
-                h += value
-            values.append(h)
-        else:
-          values = [cpiStackData[i].get(label, 0) for i in range(ncores)]
-        f.write('{}\t'.format(label))
-        if any(v > 0.001 for v in values):
-          f.write('\t'.join('{:.3f}'.format(v) for v in values))
-        else:
-          f.write('-')
-        f.write('\n')
-
-def main(jobid, resultsdir, outputfile, powertype = 'dynamic', config = None, no_graph = False, partial = None, print_stack = True, return_data = False):
-  tempfile = outputfile + '.xml'
-
-  results = sniper_lib.get_results(jobid, resultsdir, partial = partial)
-  if config:
-    # update using energystats-temp.cfg
-    results['config'] = sniper_config.parse_config(file(config).read(), results['config'])
-
-    # recompute cycle counts with updated frequencies
-    _results = sniper_lib.parse_results_from_dir(resultsdir, partial=partial, metrics=None)
-    results['results'] = sniper_lib.stats_process(results['config'], _results)
-
-  stats = sniper_stats.SniperStats(resultsdir = resultsdir, jobid = jobid)
+  header = 'Metric\t' + '\t'.join('Core{}'.format(i) for i in range(ncores)) + '\n'
+  rows = 'total\t' + '\t'.join('{:.3f}'.format(sum(cpiStackData[i].values())) for i in range(ncores)) + '\n'
 
-  power, nuca_at_level = edit_XML(stats, results['results'], results['config'])
-  power = map(lambda v: v[0], power)
-  file(tempfile, "w").write('\n'.join(power))
+  for label in labels:
+    if any(label.startswith(c) for c in compactify):
+      if label not in compactify:
+        continue
+      values = []
+      for i in range(ncores):
+        h = 0
+        coreStack = cpiStackData[i]
+        for key, value in coreStack.items():
+          if key.startswith(label):
+            h += value
+        values.append(h)
+    else:
+      values = [cpiStackData[i].get(label, 0) for i in range(ncores)]
+    rows += '{}\t'.format(label)
+    if any(v > 0.001 for v in values):
+      rows += '\t'.join('{:.3f}'.format(v) for v in values)
+    else:
+      rows += '-'
+    rows += '\n'
 
-  # Log Performance Counters
-  log_frequencies(results)
-  log_vdd(results)
-  log_cpi_stack(results)
+  replace_file(cpi_stack_file, header + rows)
+  write_header = os.stat(cpi_stack_periodic_file).st_size == 0
+  with open(cpi_stack_periodic_file, 'a') as f:
+    if write_header:
+      f.write(header)
+    f.write(rows)
 
-  # Run McPAT
-  mcpat_run(tempfile, outputfile + '.txt')
+mcpat_value_re = re.compile(' *([^=]+)= *([-+0-9.e]+)(nan)?')
+mcpat_prefix_re = re.compile('^( *)([^:(]*)')
 
-  # Parse output
-  power_txt = file(outputfile + '.txt')
+def mcpat_parse(report, nuca_at_level):
+  # McPAT's report as a dictionary per component (a list of them for Core, L2, L3 and NUCA)
+  # of values keyed by their path in the report, i.e. 'Execution Unit/Integer ALUs/Runtime Dynamic'
   power_dat = {}
 
-  components = power_txt.read().split('*'*89)[2:-1]
+  components = report.split('*'*89)[2:-1]
   for component in components:
     lines = component.strip().split('\n')
     componentname = lines[0].strip().strip(':')
@@ -260,7 +252,7 @@ def main(jobid, resultsdir, outputfile, powertype = 'dynamic', config = None, no
       if not line.strip():
         continue
       elif '=' in line:
-        res = re.match(' *([^=]+)= *([-+0-9.e]+)(nan)?', line)
+        res = mcpat_value_re.match(line)
         if res:
           name = ('/'.join(prefix + [res.group(1)])).strip()
           if res.groups()[-1] == 'nan':
@@ -275,7 +267,7 @@ def main(jobid, resultsdir, outputfile, powertype = 'dynamic', config = None, no
               raise
           values[name] = value
       else:
-        res = re.match('^( *)([^:(]*)', line)
+        res = mcpat_prefix_re.match(line)
         if res:
           j = len(res.group(1))
           while(spaces and j <= spaces[-1]):
@@ -299,6 +291,74 @@ def main(jobid, resultsdir, outputfile, powertype = 'dynamic', config = None, no
 
   if not power_dat:
     raise ValueError('No valid McPAT output found')
+  return power_dat
+
+def mcpat_cache_open(config, resultsdir):
+  if sniper_config.get_config_default(config, 'power/mcpat_cache/enabled', 'false').lower() not in ('1', 'true'):
+    return None
+  directory = sniper_config.get_config_default(config, 'power/mcpat_cache/directory', '')
+  if not directory:
+    directory = os.path.join(resultsdir, 'mcpat-cache')
+  return mcpat_cache.McpatCache(directory,
+    tolerance = float(sniper_config.get_config_default(config, 'power/mcpat_cache/tolerance', 0)),
+    max_entries = int(sniper_config.get_config_default(config, 'power/mcpat_cache/max_entries', 1024)),
+    verify_fraction = float(sniper_config.get_config_default(config, 'power/mcpat_cache/verify_fraction', 0)),
+    logfile = os.path.join(resultsdir, mcpat_cache.LOG_FILE))
+
+def parse_results(resultsdir, partial = None, stats_delta = None):
+  # sniper_lib.parse_results_from_dir. With stats_delta, the statistics are the difference of two in-memory snapshots
+  # written by scripts/stats_snapshot.py rather than two snapshots in sim.stats.sqlite3
+  if not stats_delta:
+    return sniper_lib.parse_results_from_dir(resultsdir, partial = partial, metrics = None)
+  simcfg = sniper_lib.get_config(resultsdir = resultsdir)
+  ncores = int(simcfg['general/total_cores'])
+  results = [ ('ncores', -1, ncores) ]
+  results += [ ('corefreq', idx, 1e9 * float(sniper_config.get_config(simcfg, 'perf_model/core/frequency', idx))) for idx in range(ncores) ]
+  results += cPickle.load(open(stats_delta, 'rb'))
+  return results
+
+def get_results(jobid, resultsdir, partial = None, stats_delta = None):
+  # sniper_lib.get_results, see parse_results for stats_delta
+  if not stats_delta:
+    return sniper_lib.get_results(jobid, resultsdir, partial = partial)
+  config = sniper_lib.get_config(resultsdir = resultsdir)
+  return {
+    'config': config,
+    'results': sniper_lib.stats_process(config, parse_results(resultsdir, stats_delta = stats_delta)),
+  }
+
+def main(jobid, resultsdir, outputfile, powertype = 'dynamic', config = None, no_graph = False, partial = None, print_stack = True, return_data = False, stats_delta = None):
+  tempfile = outputfile + '.xml'
+
+  results = get_results(jobid, resultsdir, partial = partial, stats_delta = stats_delta)
+  if config:
+    # update using energystats-temp.cfg
+    results['config'] = sniper_config.parse_config(file(config).read(), results['config'])
+
+    # recompute cycle counts with updated frequencies
+    _results = parse_results(resultsdir, partial = partial, stats_delta = stats_delta)
+    results['results'] = sniper_lib.stats_process(results['config'], _results)
+
+  stats = sniper_stats.SniperStats(resultsdir = resultsdir, jobid = jobid)
+
+  # the architectural part of the XML is compiled once per run and kept in the output directory
+  power, nuca_at_level = edit_XML(stats, results['results'], results['config'], os.path.join(resultsdir, 'mcpat-template.pkl'))
+  power = map(lambda v: v[0], power)
+  file(tempfile, "w").write('\n'.join(power))
+
+  # Log Performance Counters
+  log_frequencies(results)
+  log_vdd(results)
+  log_cpi_stack(results)
+
+  # Run McPAT
+  def run():
+    return mcpat_parse(mcpat_run(tempfile, outputfile + '.txt'), nuca_at_level)
+  cache = mcpat_cache_open(results['config'], resultsdir)
+  if cache:
+    power_dat = cache.evaluate('\n'.join(power), run)
+  else:
+    power_dat = run()
 
   # Add DRAM power
   dram_dyn, dram_stat = dram_power(results['results'], results['config'])
@@ -379,6 +439,70 @@ def main(jobid, resultsdir, outputfile, powertype = 'dynamic', config = None, no
   if return_data:
     return {'labels': plot_labels, 'power_data': plot_data, 'ncores': ncores, 'time_s': seconds}
 
+def surrogate_delta(feature, values, seconds):
+  # perturbation of a feature in the calibration runs, large enough to stand out in McPAT's output
+  if feature.endswith('_time'):
+    return SURROGATE_STEP * seconds * 1e15
+  return SURROGATE_STEP * max(max(values), seconds * SURROGATE_MIN_RATE)
+
+def calibrate_surrogate(jobid, resultsdir, outputfile, coefficients_file, levels, features, powertype = 'dynamic', partial = None, stats_delta = None):
+  # Fit the linear power model used by scripts/power_surrogate.py. For every level (<MHz>:<Vdd>, all cores at that level)
+  # McPAT is run at the statistics of the partial window and once more for each feature, which is perturbed on all cores.
+  # Power is linear in the features (rates in events/s, or fs/s for the *_time features) to first order, so the differences
+  # give the coefficients of every core power trace column.
+  results = get_results(jobid, resultsdir, partial = partial, stats_delta = stats_delta)
+  _results = parse_results(resultsdir, partial = partial, stats_delta = stats_delta)
+  stats = sniper_stats.SniperStats(resultsdir = resultsdir, jobid = jobid)
+  cfg = results['config']
+  ncores = int(cfg['general/total_cores'])
+  seconds = (results['results']['global.time_end'] - results['results']['global.time_begin']) / 1e15
+  getpower = power_getter(cfg, powertype)
+
+  def columns(stats_results):
+    power, nuca_at_level = edit_XML(stats, dict(stats_results), dict(cfg))
+    file(outputfile + '.xml', 'w').write('\n'.join(map(lambda v: v[0], power)))
+    headings, readings = power_trace_columns(mcpat_parse(mcpat_run(outputfile + '.xml'), nuca_at_level), cfg, getpower)
+    return headings.split('\t')[:-1], map(float, readings.split('\t')[:-1])
+
+  surrogate = None
+  if os.path.exists(coefficients_file):
+    result = {}
+    execfile(coefficients_file, {}, result)
+    surrogate = result['surrogate']
+  for level in levels:
+    frequency, vdd = level.split(':')
+    sniper_config.parse_config('[perf_model/core]\nfrequency[] = %s\n[power]\nvdd[] = %s\n' % (
+      ','.join([ '%f' % (float(frequency) / 1000.) ] * ncores), ','.join([ vdd ] * ncores)), cfg)
+    base = sniper_lib.stats_process(cfg, _results)
+    headings, power0 = columns(base)
+    owners = []
+    for heading in headings:
+      res = re.match('C_([0-9]+)', heading)
+      owners.append(int(res.group(1)) if res else -1) # -1: shared (L3), driven by the sum over all cores
+    if not surrogate or surrogate['features'] != features or surrogate['headings'] != headings:
+      # new file, or one of another configuration
+      surrogate = { 'features': features, 'headings': headings, 'owners': owners, 'levels': {} }
+    def rate(values, owner):
+      return (sum(values) if owner < 0 else values[owner]) / seconds
+    coefficients = [ [] for column in headings ]
+    intercept = list(power0)
+    for feature in features:
+      if feature not in base:
+        for column in coefficients:
+          column.append(0.)
+        continue
+      delta = surrogate_delta(feature, base[feature], seconds)
+      perturbed = dict(base)
+      perturbed[feature] = [ v + delta for v in base[feature] ]
+      headings1, power1 = columns(perturbed)
+      for j, owner in enumerate(owners):
+        c = (power1[j] - power0[j]) / ((ncores if owner < 0 else 1) * delta / seconds)
+        coefficients[j].append(c)
+        intercept[j] -= c * rate(base[feature], owner)
+    surrogate['levels'][level] = { 'intercept': intercept, 'coefficients': coefficients }
+  # replace the file in one go, it is read by the simulation
+  replace_file(coefficients_file, 'surrogate = ' + pprint.pformat(surrogate))
+
 def scale_power(suffix, power, size_nm):
   if suffix == 'Runtime Dynamic':
     if size_nm >= 22:
@@ -396,7 +520,7 @@ def scale_power(suffix, power, size_nm):
   else:
     raise Exception('do not know how to scale power: {}'.format(suffix))
 
-def power_stack(power_dat, cfg, powertype = 'total', nocollapse = False):
+def power_getter(cfg, powertype):
   size_nm = int(sniper_config.get_config(cfg, "power/technology_node"))
   def getpower(powers, key = None):
     def getcomponent(suffix):
@@ -417,49 +541,10 @@ def power_stack(power_dat, cfg, powertype = 'total', nocollapse = False):
       return getcomponent('Area') + getcomponent('Area Overhead')
     else:
       raise ValueError('Unknown powertype %s' % powertype)
-  data = {
-    'l2':               sum([ getpower(cache) for cache in power_dat.get('L2', []) ])  # shared L2
-                        + sum([ getpower(core, 'L2') for core in power_dat['Core'] ]), # private L2
-    'l3':               sum([ getpower(cache) for cache in power_dat.get('L3', []) ]),
-    'nuca':             sum([ getpower(cache) for cache in power_dat.get('NUCA', []) ]),
-    'noc':              getpower(power_dat['Processor'], 'Total NoCs'),
-    'dram':             getpower(power_dat['DRAM']),
-    'core':             sum([ getpower(core, 'Execution Unit/Instruction Scheduler')
-                              + getpower(core, 'Execution Unit/Register Files')
-                              + getpower(core, 'Execution Unit/Results Broadcast Bus')
-                              + getpower(core, 'Renaming Unit')
-                              for core in power_dat['Core']
-                            ]),
-    'core-ifetch':      sum([ getpower(core, 'Instruction Fetch Unit/Branch Predictor')
-                              + getpower(core, 'Instruction Fetch Unit/Branch Target Buffer')
-                              + getpower(core, 'Instruction Fetch Unit/Instruction Buffer')
-                              + getpower(core, 'Instruction Fetch Unit/Instruction Decoder')
-                              for core in power_dat['Core']
-                            ]),
-    'icache':           sum([ getpower(core, 'Instruction Fetch Unit/Instruction Cache') for core in power_dat['Core'] ]),
-    'dcache':           sum([ getpower(core, 'Load Store Unit/Data Cache') for core in power_dat['Core'] ]),
-    'core-alu-complex': sum([ getpower(core, 'Execution Unit/Complex ALUs') for core in power_dat['Core'] ]),
-    'core-alu-fp':      sum([ getpower(core, 'Execution Unit/Floating Point Units') for core in power_dat['Core'] ]),
-    'core-alu-int':     sum([ getpower(core, 'Execution Unit/Integer ALUs') for core in power_dat['Core'] ]),
-    'core-mem':         sum([ getpower(core, 'Load Store Unit/LoadQ')
-                              + getpower(core, 'Load Store Unit/StoreQ')
-                              + getpower(core, 'Memory Management Unit')
-                              for core in power_dat['Core']
-                            ]),
-  }
-  full_power_trace_file = cfg.get('hotspot/log_files_core/full_power_trace_file')
-  power_trace_file = cfg.get('hotspot/log_files_core/power_trace_file')
-  full_temperature_trace_file = cfg.get('hotspot/log_files_core/full_temperature_trace_file')
-  type_of_stack = cfg.get('memory/type_of_stack')
-  
-  data['core-other'] = getpower(power_dat['Processor']) - (sum(data.values()) - data['dram'])
-  powerLogFileName = file(full_power_trace_file, 'a');
-  powerInstantaneousFileName = file(power_trace_file, 'w');
-  if (type_of_stack == "DDR" or type_of_stack == "3Dmem"):
-    if (sniper_config.get_config(cfg, "core_thermal/enabled") == 'true'):
-      thermalLogFileName = file(full_temperature_trace_file, 'a');
+  return getpower
 
-  
+def power_trace_columns(power_dat, cfg, getpower):
+  # header and values of one line of the core power trace, the columns are selected by [core_power]
   id = 0
   Headings = ""
 
@@ -601,27 +686,6 @@ def power_stack(power_dat, cfg, powertype = 'total', nocollapse = False):
 
    id = id+1
    
-  os.system("touch " + full_power_trace_file)
-  needInitializing = os.stat(full_power_trace_file).st_size == 0
-  if needInitializing:
-    powerLogFileName.write (Headings+"\n")
-    if (type_of_stack == "DDR" or type_of_stack == "3Dmem"):
-      if (sniper_config.get_config(cfg, "core_thermal/enabled") == 'true'):
-       thermalLogFileName.write (Headings+"\n")
-       thermalLogFileName.close()
-
-  powerInstantaneousFileName.write (Headings+"\n")
-
-  if needInitializing and sniper_config.get_config_bool(cfg, 'reliability/enabled'):
-    data_len = len(Headings.strip().split('\t'))
-    with open(sniper_config.get_config(cfg, 'reliability/log_files_core/rvalue_trace_file'), "w") as f:
-        f.write("%s\n" %(Headings))
-    with open(sniper_config.get_config(cfg, 'reliability/log_files_core/full_rvalue_trace_file'), "w") as f:
-        f.write("%s\n" %(Headings))
-    with open(sniper_config.get_config(cfg, 'reliability/log_files_core/state_file'), "w") as f:
-        f.write("0.0\t"*data_len+"\n")
-    with open(sniper_config.get_config(cfg, 'reliability/log_files_core/delta_v_file'), "w") as f:
-        f.write("0.0\t"*data_len+"\n")
 
   Readings = ""
 
@@ -693,6 +757,76 @@ def power_stack(power_dat, cfg, powertype = 'total', nocollapse = False):
     if sniper_config.get_config_bool(cfg, "core_power/tp"):
       Readings += str(totalPower) +"\t" # Total Power
 
+  return Headings, Readings
+
+def power_stack(power_dat, cfg, powertype = 'total', nocollapse = False):
+  getpower = power_getter(cfg, powertype)
+  data = {
+    'l2':               sum([ getpower(cache) for cache in power_dat.get('L2', []) ])  # shared L2
+                        + sum([ getpower(core, 'L2') for core in power_dat['Core'] ]), # private L2
+    'l3':               sum([ getpower(cache) for cache in power_dat.get('L3', []) ]),
+    'nuca':             sum([ getpower(cache) for cache in power_dat.get('NUCA', []) ]),
+    'noc':              getpower(power_dat['Processor'], 'Total NoCs'),
+    'dram':             getpower(power_dat['DRAM']),
+    'core':             sum([ getpower(core, 'Execution Unit/Instruction Scheduler')
+                              + getpower(core, 'Execution Unit/Register Files')
+                              + getpower(core, 'Execution Unit/Results Broadcast Bus')
+                              + getpower(core, 'Renaming Unit')
+                              for core in power_dat['Core']
+                            ]),
+    'core-ifetch':      sum([ getpower(core, 'Instruction Fetch Unit/Branch Predictor')
+                              + getpower(core, 'Instruction Fetch Unit/Branch Target Buffer')
+                              + getpower(core, 'Instruction Fetch Unit/Instruction Buffer')
+                              + getpower(core, 'Instruction Fetch Unit/Instruction Decoder')
+                              for core in power_dat['Core']
+                            ]),
+    'icache':           sum([ getpower(core, 'Instruction Fetch Unit/Instruction Cache') for core in power_dat['Core'] ]),
+    'dcache':           sum([ getpower(core, 'Load Store Unit/Data Cache') for core in power_dat['Core'] ]),
+    'core-alu-complex': sum([ getpower(core, 'Execution Unit/Complex ALUs') for core in power_dat['Core'] ]),
+    'core-alu-fp':      sum([ getpower(core, 'Execution Unit/Floating Point Units') for core in power_dat['Core'] ]),
+    'core-alu-int':     sum([ getpower(core, 'Execution Unit/Integer ALUs') for core in power_dat['Core'] ]),
+    'core-mem':         sum([ getpower(core, 'Load Store Unit/LoadQ')
+                              + getpower(core, 'Load Store Unit/StoreQ')
+                              + getpower(core, 'Memory Management Unit')
+                              for core in power_dat['Core']
+                            ]),
+  }
+  full_power_trace_file = cfg.get('hotspot/log_files_core/full_power_trace_file')
+  power_trace_file = cfg.get('hotspot/log_files_core/power_trace_file')
+  full_temperature_trace_file = cfg.get('hotspot/log_files_core/full_temperature_trace_file')
+  type_of_stack = cfg.get('memory/type_of_stack')
+  
+  data['core-other'] = getpower(power_dat['Processor']) - (sum(data.values()) - data['dram'])
+  powerLogFileName = file(full_power_trace_file, 'a');
+  powerInstantaneousFileName = file(power_trace_file, 'w');
+  if (type_of_stack == "DDR" or type_of_stack == "3Dmem"):
+    if (sniper_config.get_config(cfg, "core_thermal/enabled") == 'true'):
+      thermalLogFileName = file(full_temperature_trace_file, 'a');
+
+  
+  Headings, Readings = power_trace_columns(power_dat, cfg, getpower)
+
+  needInitializing = os.stat(full_power_trace_file).st_size == 0
+  if needInitializing:
+    powerLogFileName.write (Headings+"\n")
+    if (type_of_stack == "DDR" or type_of_stack == "3Dmem"):
+      if (sniper_config.get_config(cfg, "core_thermal/enabled") == 'true'):
+       thermalLogFileName.write (Headings+"\n")
+       thermalLogFileName.close()
+
+  powerInstantaneousFileName.write (Headings+"\n")
+
+  if needInitializing and sniper_config.get_config_bool(cfg, 'reliability/enabled'):
+    data_len = len(Headings.strip().split('\t'))
+    with open(sniper_config.get_config(cfg, 'reliability/log_files_core/rvalue_trace_file'), "w") as f:
+        f.write("%s\n" %(Headings))
+    with open(sniper_config.get_config(cfg, 'reliability/log_files_core/full_rvalue_trace_file'), "w") as f:
+        f.write("%s\n" %(Headings))
+    with open(sniper_config.get_config(cfg, 'reliability/log_files_core/state_file'), "w") as f:
+        f.write("0.0\t"*data_len+"\n")
+    with open(sniper_config.get_config(cfg, 'reliability/log_files_core/delta_v_file'), "w") as f:
+        f.write("0.0\t"*data_len+"\n")
+
   if (type_of_stack == "DDR" or type_of_stack == "3Dmem"):
     powerInstantaneousFileName.write (Readings+"\r\n")
   else:
@@ -705,7 +839,7 @@ def power_stack(power_dat, cfg, powertype = 'total', nocollapse = False):
   return buildstack.merge_items({ 0: data }, all_items, nocollapse = nocollapse)
 
 
-def edit_XML(statsobj, stats, cfg):
+def edit_XML(statsobj, stats, cfg, template_file = None):
   #param = res['param']         #do it separately
 
   ncores = int(cfg['general/total_cores'])
@@ -797,38 +931,292 @@ def edit_XML(statsobj, stats, cfg):
   DRAM_writes = int(stats['dram.writes'][0])
   #branch_misprediction = stats['branch_predictor.num-incorrect'][1]
 
+  template = get_template(cfg, ncores, num_l2s, private_l2s, num_l3s, technology_node, template_file)
+  def alu_per_core(core):
+    return long(long(sniper_config.get_config(cfg, 'perf_model/core/interval_timer/dispatch_width', core)) * 1.5)
+  for i in xrange(len(template)-1):
+      if not template[i][1]:
+        continue
+      core = template[i][1][2]
+      if template[i][1][1]=="cfg":
+        clock_core = float(sniper_config.get_config(cfg, 'perf_model/core/frequency', core))*1000
+        clock_global = float(sniper_config.get_config(cfg, 'perf_model/core/frequency'))*1000
+        if 'power/vdd' in cfg:
+          vdd_global = float(sniper_config.get_config(cfg, 'power/vdd'))
+          vdd_core = float(sniper_config.get_config(cfg, 'power/vdd', core))
+        else:
+          vdd_global = 0
+          vdd_core = 0
+        def get_clock(component):
+          domain = sniper_config.get_config(cfg, component+'/dvfs_domain', core)
+          if domain == 'core':
+            return clock_core
+          elif domain == 'global':
+            return clock_global
+          else:
+            raise ValueError('Unknown DVFS domain %s' % domain)
+        def get_vdd(component):
+          domain = sniper_config.get_config(cfg, component+'/dvfs_domain', core)
+          if domain == 'core':
+            return vdd_core
+          elif domain == 'global':
+            return vdd_global
+          else:
+            raise ValueError('Unknown DVFS domain %s' % domain)
+        if template[i][1][0]=="core_clock":
+          template[i][0] = template[i][0] % clock_core
+        elif template[i][1][0]=="core_vdd":
+          template[i][0] = template[i][0] % vdd_core
+        elif template[i][1][0]=="L2_clock":
+          template[i][0] = template[i][0] % get_clock('perf_model/l2_cache')
+        elif template[i][1][0]=="L3_clock":
+          template[i][0] = template[i][0] % get_clock('perf_model/l3_cache')
+        elif template[i][1][0]=="NoC_clock":
+          template[i][0] = template[i][0] % clock_global
+        elif template[i][1][0]=="L2_vdd":
+          template[i][0] = template[i][0] % get_vdd('perf_model/l2_cache')
+        elif template[i][1][0]=="L3_vdd":
+          template[i][0] = template[i][0] % get_vdd('perf_model/l3_cache')
+        elif template[i][1][0]=="NoC_vdd":
+          template[i][0] = template[i][0] % vdd_global
+        else:
+          raise ValueError('Unknown cfg template %s' % template[i][1][0])
+      elif template[i][1][1]=="stat":
+        cores_l2s = range(l2_cacheSharedCores*core, min(ncores, l2_cacheSharedCores*core+l2_cacheSharedCores))
+        cores_l3s = range(l3_cacheSharedCores*core, min(ncores, l3_cacheSharedCores*core+l3_cacheSharedCores))
+        # core statistics
+        if template[i][1][0]=="total_cycles":
+          template[i][0] = template[i][0] % cycles[core]
+        elif template[i][1][0]=="busy_cycles":
+          template[i][0] = template[i][0] % (cycles[core] - data[core]['idle_cycles'])
+        elif template[i][1][0]=="idle_cycles":
+          template[i][0] = template[i][0] % data[core]['idle_cycles']
+        elif template[i][1][0]=="total_system_cycles":
+          template[i][0] = template[i][0] % int(max_system_cycles)
+        elif template[i][1][0]=="total_system_idle_cycles":
+          template[i][0] = template[i][0] % int(0)
+        elif template[i][1][0]=="total_system_busy_cycles":
+          template[i][0] = template[i][0] % int(max_system_cycles)
+        elif template[i][1][0]=="function_calls":
+          template[i][0] = template[i][0] % int(instrs[core] * 0.05)
+        elif template[i][1][0]=="IFU.duty_cycle":
+          if float(((instrs[core]))/max_system_cycles) > 1:
+            template[i][0] = template[i][0] % 1
+          else:
+            template[i][0] = template[i][0] % float(((instrs[core]))/max_system_cycles)
+        elif template[i][1][0]=="LSU.duty_cycle":
+          if float((long(stats['L1-D.loads'][core])+long(stats['L1-D.stores'][core]))/max_system_cycles) <= 1:
+            template[i][0] = template[i][0] % float((long(stats['L1-D.loads'][core])+long(stats['L1-D.stores'][core]))/max_system_cycles)
+          else:
+            template[i][0] = template[i][0] % 1
+        elif template[i][1][0]=="MemManU.I.duty_cycle":
+          if float((long(stats['L1-I.loads'][core])+long(stats['L1-I.stores'][core]))/max_system_cycles) <= 1:
+            template[i][0] = template[i][0] % float((long(stats['L1-I.loads'][core])+long(stats['L1-I.stores'][core]))/max_system_cycles)
+          else:
+            template[i][0] = template[i][0] % 1
+        elif template[i][1][0]=="MemManU.D.duty_cycle":
+          if float((long(stats['L1-D.loads'][core])+long(stats['L1-D.stores'][core]))/max_system_cycles) <= 1:
+            template[i][0] = template[i][0] % float((long(stats['L1-D.loads'][core])+long(stats['L1-D.stores'][core]))/max_system_cycles)
+          else:
+            template[i][0] = template[i][0] % 1
+        elif template[i][1][0]=="FPU.duty_cycle":
+          template[i][0] = template[i][0] % min(1,float((int(data[core]['FP_instructions']))/max_system_cycles))
+        elif template[i][1][0]=="MUL.duty_cycle":
+          template[i][0] = template[i][0] % min(1,float((stats.get('interval_timer.uop_fp_muldiv', stats.get('rob_timer.uop_fp_muldiv', []))[core])/max_system_cycles))
+        elif template[i][1][0]=="ALU.duty_cycle":             #check whether it is per FP  basis or total
+          template[i][0] = template[i][0] % min(1,((instrs[core] - data[core]['FP_instructions'])/(max_system_cycles *  alu_per_core(core))))
+        elif template[i][1][0]=="memory.reads":
+          template[i][0] = template[i][0] % DRAM_reads
+        elif template[i][1][0]=="memory.writes":
+          template[i][0] = template[i][0] % DRAM_writes
+        elif template[i][1][0]=="memory.accesses":
+          template[i][0] = template[i][0] % (int(DRAM_reads) + int(DRAM_writes))
+        elif template[i][1][0]=="NoC.type":
+          if 'network.shmem-1.mesh.link-in.num-requests' in stats or 'network.shmem-1.mesh.packets-in' in stats:
+            # 1 = NoC
+            template[i][0] = template[i][0] % 1
+          else:
+            # 0 = bus
+            template[i][0] = template[i][0] % 0
+        elif template[i][1][0]=="NoC.total_accesses":
+          if 'network.shmem-1.mesh.link-in.num-requests' in stats:
+            template[i][0] = template[i][0] % sum(stats['network.shmem-1.mesh.link-in.num-requests'])
+          elif 'network.shmem-1.mesh.packets-in' in stats:
+            template[i][0] = template[i][0] % sum(stats['network.shmem-1.mesh.packets-in'])
+          elif 'network.shmem-1.bus.num-requests' in stats:
+            template[i][0] = template[i][0] % int(stats['network.shmem-1.bus.num-requests'][0])  #assumption
+          elif 'network.shmem-1.bus.num-packets' in stats:
+            template[i][0] = template[i][0] % int(stats['network.shmem-1.bus.num-packets'][0])  #assumption
+          else:
+            template[i][0] = template[i][0] % int(stats['bus.num-requests'][0])  #assumption
+        elif template[i][1][0]=="NoC.duty_cycle":
+          if 'network.shmem-1.mesh.link-left.total-time-used' in stats:
+            DIRECTIONS = ('up', 'down', 'left', 'right')
+            total_time_used = sum([ sum(stats['network.shmem-1.mesh.link-%s.total-time-used' % direction]) for direction in DIRECTIONS ])
+            num_links_used = sum([ sum([ v > 0 and 1 or 0 for v in stats['network.shmem-1.mesh.link-%s.num-requests' % direction] ]) for direction in DIRECTIONS ])
+            # Not all links (e.g. boundary of mesh) are actually present in hardware
+            # Here we assume that all real links are used at least ones
+            avg_time_used = total_time_used / float(num_links_used or 1.)
+            duty_cycle = avg_time_used / (stats['global.time'] or 1.)
+            template[i][0] = template[i][0] % duty_cycle
+          elif 'network.shmem-1.mesh.packets-in' in stats:
+            # Mesh network model without proper accounting. Take a wild guess...
+            template[i][0] = template[i][0] % .5
+          elif 'network.shmem-1.bus.time-used' in stats:
+            template[i][0] = template[i][0] % min(1, cycles_scale[core]*float(stats['network.shmem-1.bus.time-used'][0])/max_system_cycles)
+          else:
+            template[i][0] = template[i][0] % min(1, cycles_scale[core]*float(stats['bus.time-used'][0])/max_system_cycles)
+        elif template[i][1][0]=="loads":
+          template[i][0] = template[i][0] % long(stats['L1-D.loads'][core])
+        elif template[i][1][0]=="stores":
+          template[i][0] = template[i][0] % long(stats['L1-D.stores'][core])
+        elif template[i][1][0]=="total_instructions":
+          template[i][0] = template[i][0] % instrs[core]
+        elif template[i][1][0]=="integer_ins":
+          template[i][0] = template[i][0] % int(int(instrs[core]) - int(data[core]['FP_instructions']) - int(data[core]['Branch_instructions']))
+        elif template[i][1][0]=="fp_ins":
+          template[i][0] = template[i][0] % int(data[core]['FP_instructions'])
+        elif template[i][1][0]=="itlb_total_accesses":
+          template[i][0] = template[i][0] % int(instrs[core]*0.5)
+        elif template[i][1][0]=="itlb_misses":
+          template[i][0] = template[i][0] % int(instrs[core]*(0.5*0.5/10000))
+        elif template[i][1][0]=="BTB.read_accesses":
+          template[i][0] = template[i][0] % int(data[core]['Branch_instructions'])  #instrs[core]
+        elif template[i][1][0]=="RAT_rename.reads":
+          template[i][0] = template[i][0] % int(2 * instrs[core])
+        elif template[i][1][0]=="RAT_rename.writes":
+          template[i][0] = template[i][0] % int(instrs[core])
+        elif template[i][1][0]=="RAT_fp_rename.reads":
+          template[i][0] = template[i][0] % int(2 * int(data[core]['FP_instructions']))
+        elif template[i][1][0]=="RAT_fp_rename.writes":
+          template[i][0] = template[i][0] % int(data[core]['FP_instructions'])
+        elif template[i][1][0]=="instr.reads":                #inst window stats
+          template[i][0] = template[i][0] % instrs[core]
+        elif template[i][1][0]=="instr.writes":
+          template[i][0] = template[i][0] % instrs[core]
+        elif template[i][1][0]=="instr.wakeup":
+          template[i][0] = template[i][0] % int(instrs[core]*2)
+        elif template[i][1][0]=="instr.fp.reads":
+          template[i][0] = template[i][0] % int(instrs[core]*0.5)
+        elif template[i][1][0]=="instr.fp.writes":
+          template[i][0] = template[i][0] % int(instrs[core]*0.5)
+        elif template[i][1][0]=="instr.fp.wakeup":
+          template[i][0] = template[i][0] % instrs[core]
+        elif template[i][1][0]=="window_switches.ialu_accesses":
+          template[i][0] = template[i][0] % int(data[core]['ialu_accesses'])
+        elif template[i][1][0]=="window_switches.fpu_accesses":
+          template[i][0] = template[i][0] % int(data[core]['FP_instructions'])
+        elif template[i][1][0]=="window_switches.mul_accesses":
+          template[i][0] = template[i][0] % int(stats.get('interval_timer.uop_fp_muldiv', stats.get('rob_timer.uop_fp_muldiv', []))[core])
+        elif template[i][1][0]=="window_switches.cdb_alu_accesses":
+          template[i][0] = template[i][0] % int(data[core]['ialu_accesses'])
+        elif template[i][1][0]=="window_switches.cdb_fpu_accesses":
+          template[i][0] = template[i][0] % int(data[core]['FP_instructions'])
+        elif template[i][1][0]=="window_switches.cdb_mul_accesses":
+          template[i][0] = template[i][0] % int(stats.get('interval_timer.uop_fp_muldiv', stats.get('rob_timer.uop_fp_muldiv', []))[core])
+        elif template[i][1][0]=="RF_accesses.int_regfile_reads":
+          template[i][0] = template[i][0] % int(instrs[core]*1.5)
+        elif template[i][1][0]=="RF_accesses.fp_regfile_reads":
+          template[i][0] = template[i][0] % int(instrs[core]*0.25)
+        elif template[i][1][0]=="RF_accesses.int_regfile_writes":
+          template[i][0] = template[i][0] % int(instrs[core]*0.75)
+        elif template[i][1][0]=="RF_accesses.fp_regfile_writes":
+          template[i][0] = template[i][0] % int(instrs[core]*0.125)
+        elif template[i][1][0]=="ROB_reads":
+          template[i][0] = template[i][0] % int(stats.get('interval_timer.uops_total', stats.get('rob_timer.uops_total', []))[core]*1)
+        elif template[i][1][0]=="ROB_writes":
+          template[i][0] = template[i][0] % int(stats.get('interval_timer.uops_total', stats.get('rob_timer.uops_total', []))[core]*1)
+        elif template[i][1][0]=="branch_ins":
+          template[i][0] = template[i][0] % int(data[core]['Branch_instructions'])
+        elif template[i][1][0]=="branch_mis":
+          template[i][0] = template[i][0] % int('branch_predictor.num-incorrect' in stats and stats['branch_predictor.num-incorrect'][core] or 0)
+        elif template[i][1][0]=="committed_ins":
+          template[i][0] = template[i][0] % int(instrs[core])
+        elif template[i][1][0]=="committed_int":
+          template[i][0] = template[i][0] % int((instrs[core])*0.5)
+        elif template[i][1][0]=="committed_fp":
+          template[i][0] = template[i][0] % int((instrs[core])*0.5)
+        elif template[i][1][0]=="itlb.total_accesses":        #itlb equals icache reads and writes
+          template[i][0] = template[i][0] % int(stats['L1-I.loads'][core] + stats['L1-I.stores'][core])
+        elif template[i][1][0]=="itlb.total_misses":
+          template[i][0] = template[i][0] % int(stats['itlb.miss'][core])
+        elif template[i][1][0]=="icache.read_accesses":
+          template[i][0] = template[i][0] % int(stats['L1-I.loads'][core])
+        elif template[i][1][0]=="icache.read_misses":
+          template[i][0] = template[i][0] % int(stats['L1-I.load-misses'][core])
+        elif template[i][1][0]=="dtlb.total_accesses":        #dtlb equals dcache reads and writes
+          template[i][0] = template[i][0] % int(stats['L1-D.loads'][core] + stats['L1-D.stores'][core])
+        elif template[i][1][0]=="dtlb.total_misses":
+          template[i][0] = template[i][0] % int(stats['L1-D.load-misses'][core] + stats['L1-D.store-misses'][core])
+        elif template[i][1][0]=="dcache.read_accesses":
+          template[i][0] = template[i][0] % int(stats['L1-D.loads'][core])
+        elif template[i][1][0]=="dcache.read_misses":
+          template[i][0] = template[i][0] % int(stats['L1-D.load-misses'][core])
+        elif template[i][1][0]=="dcache.write_accesses":
+          template[i][0] = template[i][0] % int(stats['L1-D.stores'][core])
+        elif template[i][1][0]=="dcache.write_misses":
+          template[i][0] = template[i][0] % int(stats['L1-D.store-misses'][core])
+        elif template[i][1][0]=="function_calls":
+          template[i][0] = template[i][0] % int(instrs[core] * 0.35000)
+        # L1 directory (not modeled)
+        elif template[i][1][0]=="L1_directory.read_accesses":
+          template[i][0] = template[i][0] % int(instrs[core] * 2)
+        elif template[i][1][0]=="L1_directory.write_accesses":
+          template[i][0] = template[i][0] % int(instrs[core] * 0.06667)
+        elif template[i][1][0]=="L1_directory.read_misses":
+          template[i][0] = template[i][0] % int(instrs[core] * 0.00408)
+        elif template[i][1][0]=="L1_directory.write_misses":
+          template[i][0] = template[i][0] % int(instrs[core] * 0.00005)
+        elif template[i][1][0]=="L1_directory.conflicts":
+          template[i][0] = template[i][0] % int(instrs[core]*0.00005)
+        # L2 directory (not modeled)
+        elif template[i][1][0]=="L2_directory.read_accesses":         #check for L2 or L2dir
+          template[i][0] = template[i][0] % int((instrs[core])*(0.125))
+        elif template[i][1][0]=="L2_directory.write_accesses":
+          template[i][0] = template[i][0] % int((instrs[core])*(0.0625))
+        elif template[i][1][0]=="L2_directory.read_misses":
+          template[i][0] = template[i][0] % int((instrs[core])*(0.004))
+        elif template[i][1][0]=="L2_directory.write_misses":
+          template[i][0] = template[i][0] % int((instrs[core])*(0.0004))
+        elif template[i][1][0]=="L2_directory.conflicts":
+          template[i][0] = template[i][0] % int((instrs[core])*(0.00025))
+        # L2 caches
+        elif template[i][1][0]=="L2.read_accesses":
+          template[i][0] = template[i][0] % sum([ stats['L2.loads'][c] for c in cores_l2s ])
+        elif template[i][1][0]=="L2.write_accesses":
+          template[i][0] = template[i][0] % sum([ stats['L2.stores'][c] for c in cores_l2s ])
+        elif template[i][1][0]=="L2.read_misses":
+          template[i][0] = template[i][0] % sum([ stats['L2.load-misses'][c] for c in cores_l2s ])
+        elif template[i][1][0]=="L2.write_misses":
+          template[i][0] = template[i][0] % sum([ stats['L2.store-misses'][c] for c in cores_l2s ])
+        elif template[i][1][0]=="L2_duty_cycle":
+          template[i][0] = template[i][0] % min(1,(sum([ stats['L2.loads'][c] + stats['L2.stores'][c] for c in cores_l2s ]) / float(max_system_cycles)))
+        # L3 caches
+        elif template[i][1][0]=="L3.read_accesses":
+          template[i][0] = template[i][0] % ('L3.loads' in stats and sum([ stats['L3.loads'][c] for c in cores_l3s ]) or 0)
+        elif template[i][1][0]=="L3.write_accesses":
+          template[i][0] = template[i][0] % ('L3.stores' in stats and sum([ stats['L3.stores'][c] for c in cores_l3s ]) or 0)
+        elif template[i][1][0]=="L3.read_misses":
+          template[i][0] = template[i][0] % ('L3.load-misses' in stats and sum([ stats['L3.load-misses'][c] for c in cores_l3s ]) or 0)
+        elif template[i][1][0]=="L3.write_misses":
+          template[i][0] = template[i][0] % ('L3.store-misses' in stats and sum([ stats['L3.store-misses'][c] for c in cores_l3s ]) or 0)
+        elif template[i][1][0]=="L3_duty_cycle":
+          template[i][0] = template[i][0] % min(1,('L3.loads' in stats and sum([ stats['L3.loads'][c] + stats['L3.stores'][c] for c in cores_l3s ]) / float(max_system_cycles) or 0))
+        else:
+          raise ValueError('Unknown stat template %s' % template[i][1][0])
+  return template, nuca_at_level
+#----------
+def compile_template(cfg, ncores, num_l2s, private_l2s, num_l3s, technology_node):
+  # The McPAT XML with every value that only depends on the configuration filled in. What is left are the
+  # slots of the statistics and of the frequencies and Vdd's, which edit_XML fills in every epoch.
   template=readTemplate(ncores, num_l2s, private_l2s, num_l3s, technology_node)
-  #for j in range(ncores):
   for i in xrange(len(template)-1):
-    #for j in range(ncores):
-      if template[i][1] and template[i][1][1] in ('stat', 'cfg', 'comb'):
+      if not template[i][1] or is_epoch_slot(template[i][1]):
+        continue
+      if len(template[i][1]) > 1:
         core = template[i][1][2]
       else:
         core = None
-      clock_core = float(sniper_config.get_config(cfg, 'perf_model/core/frequency', core))*1000
-      clock_global = float(sniper_config.get_config(cfg, 'perf_model/core/frequency'))*1000
-      if 'power/vdd' in cfg:
-        vdd_global = float(sniper_config.get_config(cfg, 'power/vdd'))
-        vdd_core = float(sniper_config.get_config(cfg, 'power/vdd', core))
-      else:
-        vdd_global = 0
-        vdd_core = 0
-      def get_clock(component):
-        domain = sniper_config.get_config(cfg, component+'/dvfs_domain', core)
-        if domain == 'core':
-          return clock_core
-        elif domain == 'global':
-          return clock_global
-        else:
-          raise ValueError('Unknown DVFS domain %s' % domain)
-      def get_vdd(component):
-        domain = sniper_config.get_config(cfg, component+'/dvfs_domain', core)
-        if domain == 'core':
-          return vdd_core
-        elif domain == 'global':
-          return vdd_global
-        else:
-          raise ValueError('Unknown DVFS domain %s' % domain)
       issue_width = long(sniper_config.get_config(cfg, 'perf_model/core/interval_timer/dispatch_width', core))
       peak_issue_width = long(long(sniper_config.get_config(cfg, 'perf_model/core/interval_timer/dispatch_width', core)) * 1.5)
       ALU_per_core = peak_issue_width
@@ -862,312 +1250,106 @@ def edit_XML(statsobj, stats, cfg):
       l3_cacheSize = long(sniper_config.get_config_default(cfg, 'perf_model/l3_cache/cache_size', 0, core))
       l3_cacheWriteBackTime = long(sniper_config.get_config_default(cfg, 'perf_model/l3_cache/writeback_time', 0, core))
 
-      if template[i][1]:
-           #if template[i][1][1]=="cfg":
-          #template[i][0] = template[i][0] % int(calc_param(template[i][1][0],config))
-        if len(template[i][1]) == 1:
-          # hardcoded
-          template[i][0] = template[i][0] % template[i][1][0]
-        elif template[i][1][1]=="cfg":
-          if template[i][1][0]=="core_clock":
-            template[i][0] = template[i][0] % clock_core
-          elif template[i][1][0]=="core_vdd":
-            template[i][0] = template[i][0] % vdd_core
-          elif template[i][1][0]=="issue_width":
-            template[i][0] = template[i][0] % issue_width
-          elif template[i][1][0]=="peak_issue_width":
-            template[i][0] = template[i][0] % peak_issue_width
-          elif template[i][1][0]=="ALU_per_core":
-            template[i][0] = template[i][0] % ALU_per_core
-          elif template[i][1][0]=="window_size":
-            template[i][0] = template[i][0] % window_size
-          elif template[i][1][0]=="machineType":
-            template[i][0] = template[i][0] % machineType
-          elif template[i][1][0]=="L2_clock":
-            template[i][0] = template[i][0] % get_clock('perf_model/l2_cache')
-          elif template[i][1][0]=="L3_clock":
-            template[i][0] = template[i][0] % get_clock('perf_model/l3_cache')
-          elif template[i][1][0]=="NoC_clock":
-            template[i][0] = template[i][0] % clock_global
-          elif template[i][1][0]=="L2_vdd":
-            template[i][0] = template[i][0] % get_vdd('perf_model/l2_cache')
-          elif template[i][1][0]=="L3_vdd":
-            template[i][0] = template[i][0] % get_vdd('perf_model/l3_cache')
-          elif template[i][1][0]=="NoC_vdd":
-            template[i][0] = template[i][0] % vdd_global
-          else:
-            raise ValueError('Unknown cfg template %s' % template[i][1][0])
-        elif template[i][1][1]=="stat":
-          cores_l2s = range(l2_cacheSharedCores*core, min(ncores, l2_cacheSharedCores*core+l2_cacheSharedCores))
-          cores_l3s = range(l3_cacheSharedCores*core, min(ncores, l3_cacheSharedCores*core+l3_cacheSharedCores))
-          # core statistics
-          if template[i][1][0]=="total_cycles":
-            template[i][0] = template[i][0] % cycles[core]
-          elif template[i][1][0]=="busy_cycles":
-            template[i][0] = template[i][0] % (cycles[core] - data[core]['idle_cycles'])
-          elif template[i][1][0]=="idle_cycles":
-            template[i][0] = template[i][0] % data[core]['idle_cycles']
-          elif template[i][1][0]=="total_system_cycles":
-            template[i][0] = template[i][0] % int(max_system_cycles)
-          elif template[i][1][0]=="total_system_idle_cycles":
-            template[i][0] = template[i][0] % int(0)
-          elif template[i][1][0]=="total_system_busy_cycles":
-            template[i][0] = template[i][0] % int(max_system_cycles)
-          elif template[i][1][0]=="function_calls":
-            template[i][0] = template[i][0] % int(instrs[core] * 0.05)
-          elif template[i][1][0]=="IFU.duty_cycle":
-            if float(((instrs[core]))/max_system_cycles) > 1:
-              template[i][0] = template[i][0] % 1
-            else:
-              template[i][0] = template[i][0] % float(((instrs[core]))/max_system_cycles)
-          elif template[i][1][0]=="LSU.duty_cycle":
-            if float((long(stats['L1-D.loads'][core])+long(stats['L1-D.stores'][core]))/max_system_cycles) <= 1:
-              template[i][0] = template[i][0] % float((long(stats['L1-D.loads'][core])+long(stats['L1-D.stores'][core]))/max_system_cycles)
-            else:
-              template[i][0] = template[i][0] % 1
-          elif template[i][1][0]=="MemManU.I.duty_cycle":
-            if float((long(stats['L1-I.loads'][core])+long(stats['L1-I.stores'][core]))/max_system_cycles) <= 1:
-              template[i][0] = template[i][0] % float((long(stats['L1-I.loads'][core])+long(stats['L1-I.stores'][core]))/max_system_cycles)
-            else:
-              template[i][0] = template[i][0] % 1
-          elif template[i][1][0]=="MemManU.D.duty_cycle":
-            if float((long(stats['L1-D.loads'][core])+long(stats['L1-D.stores'][core]))/max_system_cycles) <= 1:
-              template[i][0] = template[i][0] % float((long(stats['L1-D.loads'][core])+long(stats['L1-D.stores'][core]))/max_system_cycles)
-            else:
-              template[i][0] = template[i][0] % 1
-          elif template[i][1][0]=="FPU.duty_cycle":
-            template[i][0] = template[i][0] % min(1,float((int(data[core]['FP_instructions']))/max_system_cycles))
-          elif template[i][1][0]=="MUL.duty_cycle":
-            template[i][0] = template[i][0] % min(1,float((stats.get('interval_timer.uop_fp_muldiv', stats.get('rob_timer.uop_fp_muldiv', []))[core])/max_system_cycles))
-          elif template[i][1][0]=="ALU.duty_cycle":             #check whether it is per FP  basis or total
-            template[i][0] = template[i][0] % min(1,((instrs[core] - data[core]['FP_instructions'])/(max_system_cycles *  ALU_per_core)))
-          elif template[i][1][0]=="memory.reads":
-            template[i][0] = template[i][0] % DRAM_reads
-          elif template[i][1][0]=="memory.writes":
-            template[i][0] = template[i][0] % DRAM_writes
-          elif template[i][1][0]=="memory.accesses":
-            template[i][0] = template[i][0] % (int(DRAM_reads) + int(DRAM_writes))
-          elif template[i][1][0]=="NoC.type":
-            if 'network.shmem-1.mesh.link-in.num-requests' in stats or 'network.shmem-1.mesh.packets-in' in stats:
-              # 1 = NoC
-              template[i][0] = template[i][0] % 1
-            else:
-              # 0 = bus
-              template[i][0] = template[i][0] % 0
-          elif template[i][1][0]=="NoC.total_accesses":
-            if 'network.shmem-1.mesh.link-in.num-requests' in stats:
-              template[i][0] = template[i][0] % sum(stats['network.shmem-1.mesh.link-in.num-requests'])
-            elif 'network.shmem-1.mesh.packets-in' in stats:
-              template[i][0] = template[i][0] % sum(stats['network.shmem-1.mesh.packets-in'])
-            elif 'network.shmem-1.bus.num-requests' in stats:
-              template[i][0] = template[i][0] % int(stats['network.shmem-1.bus.num-requests'][0])  #assumption
-            elif 'network.shmem-1.bus.num-packets' in stats:
-              template[i][0] = template[i][0] % int(stats['network.shmem-1.bus.num-packets'][0])  #assumption
-            else:
-              template[i][0] = template[i][0] % int(stats['bus.num-requests'][0])  #assumption
-          elif template[i][1][0]=="NoC.duty_cycle":
-            if 'network.shmem-1.mesh.link-left.total-time-used' in stats:
-              DIRECTIONS = ('up', 'down', 'left', 'right')
-              total_time_used = sum([ sum(stats['network.shmem-1.mesh.link-%s.total-time-used' % direction]) for direction in DIRECTIONS ])
-              num_links_used = sum([ sum([ v > 0 and 1 or 0 for v in stats['network.shmem-1.mesh.link-%s.num-requests' % direction] ]) for direction in DIRECTIONS ])
-              # Not all links (e.g. boundary of mesh) are actually present in hardware
-              # Here we assume that all real links are used at least ones
-              avg_time_used = total_time_used / float(num_links_used or 1.)
-              duty_cycle = avg_time_used / (stats['global.time'] or 1.)
-              template[i][0] = template[i][0] % duty_cycle
-            elif 'network.shmem-1.mesh.packets-in' in stats:
-              # Mesh network model without proper accounting. Take a wild guess...
-              template[i][0] = template[i][0] % .5
-            elif 'network.shmem-1.bus.time-used' in stats:
-              template[i][0] = template[i][0] % min(1, cycles_scale[core]*float(stats['network.shmem-1.bus.time-used'][0])/max_system_cycles)
-            else:
-              template[i][0] = template[i][0] % min(1, cycles_scale[core]*float(stats['bus.time-used'][0])/max_system_cycles)
-          elif template[i][1][0]=="loads":
-            template[i][0] = template[i][0] % long(stats['L1-D.loads'][core])
-          elif template[i][1][0]=="stores":
-            template[i][0] = template[i][0] % long(stats['L1-D.stores'][core])
-          elif template[i][1][0]=="total_instructions":
-            template[i][0] = template[i][0] % instrs[core]
-          elif template[i][1][0]=="integer_ins":
-            template[i][0] = template[i][0] % int(int(instrs[core]) - int(data[core]['FP_instructions']) - int(data[core]['Branch_instructions']))
-          elif template[i][1][0]=="fp_ins":
-            template[i][0] = template[i][0] % int(data[core]['FP_instructions'])
-          elif template[i][1][0]=="itlb_total_accesses":
-            template[i][0] = template[i][0] % int(instrs[core]*0.5)
-          elif template[i][1][0]=="itlb_misses":
-            template[i][0] = template[i][0] % int(instrs[core]*(0.5*0.5/10000))
-          elif template[i][1][0]=="BTB.read_accesses":
-            template[i][0] = template[i][0] % int(data[core]['Branch_instructions'])  #instrs[core]
-          elif template[i][1][0]=="RAT_rename.reads":
-            template[i][0] = template[i][0] % int(2 * instrs[core])
-          elif template[i][1][0]=="RAT_rename.writes":
-            template[i][0] = template[i][0] % int(instrs[core])
-          elif template[i][1][0]=="RAT_fp_rename.reads":
-            template[i][0] = template[i][0] % int(2 * int(data[core]['FP_instructions']))
-          elif template[i][1][0]=="RAT_fp_rename.writes":
-            template[i][0] = template[i][0] % int(data[core]['FP_instructions'])
-          elif template[i][1][0]=="instr.reads":                #inst window stats
-            template[i][0] = template[i][0] % instrs[core]
-          elif template[i][1][0]=="instr.writes":
-            template[i][0] = template[i][0] % instrs[core]
-          elif template[i][1][0]=="instr.wakeup":
-            template[i][0] = template[i][0] % int(instrs[core]*2)
-          elif template[i][1][0]=="instr.fp.reads":
-            template[i][0] = template[i][0] % int(instrs[core]*0.5)
-          elif template[i][1][0]=="instr.fp.writes":
-            template[i][0] = template[i][0] % int(instrs[core]*0.5)
-          elif template[i][1][0]=="instr.fp.wakeup":
-            template[i][0] = template[i][0] % instrs[core]
-          elif template[i][1][0]=="window_switches.ialu_accesses":
-            template[i][0] = template[i][0] % int(data[core]['ialu_accesses'])
-          elif template[i][1][0]=="window_switches.fpu_accesses":
-            template[i][0] = template[i][0] % int(data[core]['FP_instructions'])
-          elif template[i][1][0]=="window_switches.mul_accesses":
-            template[i][0] = template[i][0] % int(stats.get('interval_timer.uop_fp_muldiv', stats.get('rob_timer.uop_fp_muldiv', []))[core])
-          elif template[i][1][0]=="window_switches.cdb_alu_accesses":
-            template[i][0] = template[i][0] % int(data[core]['ialu_accesses'])
-          elif template[i][1][0]=="window_switches.cdb_fpu_accesses":
-            template[i][0] = template[i][0] % int(data[core]['FP_instructions'])
-          elif template[i][1][0]=="window_switches.cdb_mul_accesses":
-            template[i][0] = template[i][0] % int(stats.get('interval_timer.uop_fp_muldiv', stats.get('rob_timer.uop_fp_muldiv', []))[core])
-          elif template[i][1][0]=="RF_accesses.int_regfile_reads":
-            template[i][0] = template[i][0] % int(instrs[core]*1.5)
-          elif template[i][1][0]=="RF_accesses.fp_regfile_reads":
-            template[i][0] = template[i][0] % int(instrs[core]*0.25)
-          elif template[i][1][0]=="RF_accesses.int_regfile_writes":
-            template[i][0] = template[i][0] % int(instrs[core]*0.75)
-          elif template[i][1][0]=="RF_accesses.fp_regfile_writes":
-            template[i][0] = template[i][0] % int(instrs[core]*0.125)
-          elif template[i][1][0]=="ROB_reads":
-            template[i][0] = template[i][0] % int(stats.get('interval_timer.uops_total', stats.get('rob_timer.uops_total', []))[core]*1)
-          elif template[i][1][0]=="ROB_writes":
-            template[i][0] = template[i][0] % int(stats.get('interval_timer.uops_total', stats.get('rob_timer.uops_total', []))[core]*1)
-          elif template[i][1][0]=="branch_ins":
-            template[i][0] = template[i][0] % int(data[core]['Branch_instructions'])
-          elif template[i][1][0]=="branch_mis":
-            template[i][0] = template[i][0] % int('branch_predictor.num-incorrect' in stats and stats['branch_predictor.num-incorrect'][core] or 0)
-          elif template[i][1][0]=="committed_ins":
-            template[i][0] = template[i][0] % int(instrs[core])
-          elif template[i][1][0]=="committed_int":
-            template[i][0] = template[i][0] % int((instrs[core])*0.5)
-          elif template[i][1][0]=="committed_fp":
-            template[i][0] = template[i][0] % int((instrs[core])*0.5)
-          elif template[i][1][0]=="itlb.total_accesses":        #itlb equals icache reads and writes
-            template[i][0] = template[i][0] % int(stats['L1-I.loads'][core] + stats['L1-I.stores'][core])
-          elif template[i][1][0]=="itlb.total_misses":
-            template[i][0] = template[i][0] % int(stats['itlb.miss'][core])
-          elif template[i][1][0]=="icache.read_accesses":
-            template[i][0] = template[i][0] % int(stats['L1-I.loads'][core])
-          elif template[i][1][0]=="icache.read_misses":
-            template[i][0] = template[i][0] % int(stats['L1-I.load-misses'][core])
-          elif template[i][1][0]=="dtlb.total_accesses":        #dtlb equals dcache reads and writes
-            template[i][0] = template[i][0] % int(stats['L1-D.loads'][core] + stats['L1-D.stores'][core])
-          elif template[i][1][0]=="dtlb.total_misses":
-            template[i][0] = template[i][0] % int(stats['L1-D.load-misses'][core] + stats['L1-D.store-misses'][core])
-          elif template[i][1][0]=="dcache.read_accesses":
-            template[i][0] = template[i][0] % int(stats['L1-D.loads'][core])
-          elif template[i][1][0]=="dcache.read_misses":
-            template[i][0] = template[i][0] % int(stats['L1-D.load-misses'][core])
-          elif template[i][1][0]=="dcache.write_accesses":
-            template[i][0] = template[i][0] % int(stats['L1-D.stores'][core])
-          elif template[i][1][0]=="dcache.write_misses":
-            template[i][0] = template[i][0] % int(stats['L1-D.store-misses'][core])
-          elif template[i][1][0]=="function_calls":
-            template[i][0] = template[i][0] % int(instrs[core] * 0.35000)
-          # L1 directory (not modeled)
-          elif template[i][1][0]=="L1_directory.read_accesses":
-            template[i][0] = template[i][0] % int(instrs[core] * 2)
-          elif template[i][1][0]=="L1_directory.write_accesses":
-            template[i][0] = template[i][0] % int(instrs[core] * 0.06667)
-          elif template[i][1][0]=="L1_directory.read_misses":
-            template[i][0] = template[i][0] % int(instrs[core] * 0.00408)
-          elif template[i][1][0]=="L1_directory.write_misses":
-            template[i][0] = template[i][0] % int(instrs[core] * 0.00005)
-          elif template[i][1][0]=="L1_directory.conflicts":
-            template[i][0] = template[i][0] % int(instrs[core]*0.00005)
-          # L2 directory (not modeled)
-          elif template[i][1][0]=="L2_directory.read_accesses":         #check for L2 or L2dir
-            template[i][0] = template[i][0] % int((instrs[core])*(0.125))
-          elif template[i][1][0]=="L2_directory.write_accesses":
-            template[i][0] = template[i][0] % int((instrs[core])*(0.0625))
-          elif template[i][1][0]=="L2_directory.read_misses":
-            template[i][0] = template[i][0] % int((instrs[core])*(0.004))
-          elif template[i][1][0]=="L2_directory.write_misses":
-            template[i][0] = template[i][0] % int((instrs[core])*(0.0004))
-          elif template[i][1][0]=="L2_directory.conflicts":
-            template[i][0] = template[i][0] % int((instrs[core])*(0.00025))
-          # L2 caches
-          elif template[i][1][0]=="L2.read_accesses":
-            template[i][0] = template[i][0] % sum([ stats['L2.loads'][c] for c in cores_l2s ])
-          elif template[i][1][0]=="L2.write_accesses":
-            template[i][0] = template[i][0] % sum([ stats['L2.stores'][c] for c in cores_l2s ])
-          elif template[i][1][0]=="L2.read_misses":
-            template[i][0] = template[i][0] % sum([ stats['L2.load-misses'][c] for c in cores_l2s ])
-          elif template[i][1][0]=="L2.write_misses":
-            template[i][0] = template[i][0] % sum([ stats['L2.store-misses'][c] for c in cores_l2s ])
-          elif template[i][1][0]=="L2_duty_cycle":
-            template[i][0] = template[i][0] % min(1,(sum([ stats['L2.loads'][c] + stats['L2.stores'][c] for c in cores_l2s ]) / float(max_system_cycles)))
-          # L3 caches
-          elif template[i][1][0]=="L3.read_accesses":
-            template[i][0] = template[i][0] % ('L3.loads' in stats and sum([ stats['L3.loads'][c] for c in cores_l3s ]) or 0)
-          elif template[i][1][0]=="L3.write_accesses":
-            template[i][0] = template[i][0] % ('L3.stores' in stats and sum([ stats['L3.stores'][c] for c in cores_l3s ]) or 0)
-          elif template[i][1][0]=="L3.read_misses":
-            template[i][0] = template[i][0] % ('L3.load-misses' in stats and sum([ stats['L3.load-misses'][c] for c in cores_l3s ]) or 0)
-          elif template[i][1][0]=="L3.write_misses":
-            template[i][0] = template[i][0] % ('L3.store-misses' in stats and sum([ stats['L3.store-misses'][c] for c in cores_l3s ]) or 0)
-          elif template[i][1][0]=="L3_duty_cycle":
-            template[i][0] = template[i][0] % min(1,('L3.loads' in stats and sum([ stats['L3.loads'][c] + stats['L3.stores'][c] for c in cores_l3s ]) / float(max_system_cycles) or 0))
-          else:
-            raise ValueError('Unknown stat template %s' % template[i][1][0])
-        elif template[i][1][1]=="comb":
-          if template[i][1][0]=="icache_cfg":
-            iconf=[]
-            iconf.append(int(l1_icacheSize)*1024)
-            iconf.append(l1_icacheBlockSize)
-            iconf.append(l1_icacheAssociativity)
-            iconf.append(1)
-            iconf.append(1)              #thoughput="Cycle time of the component"
-            iconf.append(latency_l1_i) #latency="access time"
-            iconf.append(0) # unused?
-            iconf.append(1) # 1 for writeback
-            template[i][0] = template[i][0] % tuple(iconf)
-          elif template[i][1][0]=="L2_config":
-            l2conf=[]
-            l2conf.append(int(l2_cacheSize)*1024)
-            l2conf.append(l2_cacheBlockSize)
-            l2conf.append(l2_cacheAssociativity)
-            l2conf.append(8)
-            l2conf.append(1)
-            l2conf.append(latency_l2)
-            l2conf.append(0) # unused?
-            l2conf.append(1) # 1 for writeback
-            template[i][0] = template[i][0] % tuple(l2conf)
-          elif template[i][1][0]=="dcache_cfg":
-            dconf=[]
-            dconf.append(int(l1_dcacheSize)*1024)
-            dconf.append(l1_dcacheBlockSize)
-            dconf.append(l1_dcacheAssociativity)
-            dconf.append(2)            #banks
-            # Increase throughput and latency constraints, otherwise McPAT calls CACTI some more
-            #   with tighter constraints, resulting in a ridiculously large dcache
-            dconf.append(10)            #thoughput="Cycle time of the component"
-            dconf.append(10*latency_l1_d)
-            dconf.append(0) # unused?
-            dconf.append(1) # 1 for writeback
-            template[i][0] = template[i][0] % tuple(dconf)
-          elif template[i][1][0]=="L3_config":
-            l3conf=[]
-            l3conf.append(int(l3_cacheSize)*1024)
-            l3conf.append(64)
-            l3conf.append(l3_cacheAssociativity)
-            l3conf.append(16)
-            l3conf.append(16)
-            l3conf.append(latency_l3)
-            l3conf.append(1)
-            template[i][0] = template[i][0] % tuple(l3conf)
-  return template, nuca_at_level
-#----------
+      if len(template[i][1]) == 1:
+        # hardcoded
+        template[i][0] = template[i][0] % template[i][1][0]
+      elif template[i][1][1]=="cfg":
+        if template[i][1][0]=="issue_width":
+          template[i][0] = template[i][0] % issue_width
+        elif template[i][1][0]=="peak_issue_width":
+          template[i][0] = template[i][0] % peak_issue_width
+        elif template[i][1][0]=="ALU_per_core":
+          template[i][0] = template[i][0] % ALU_per_core
+        elif template[i][1][0]=="window_size":
+          template[i][0] = template[i][0] % window_size
+        elif template[i][1][0]=="machineType":
+          template[i][0] = template[i][0] % machineType
+        else:
+          raise ValueError('Unknown cfg template %s' % template[i][1][0])
+      elif template[i][1][1]=="comb":
+        if template[i][1][0]=="icache_cfg":
+          iconf=[]
+          iconf.append(int(l1_icacheSize)*1024)
+          iconf.append(l1_icacheBlockSize)
+          iconf.append(l1_icacheAssociativity)
+          iconf.append(1)
+          iconf.append(1)              #thoughput="Cycle time of the component"
+          iconf.append(latency_l1_i) #latency="access time"
+          iconf.append(0) # unused?
+          iconf.append(1) # 1 for writeback
+          template[i][0] = template[i][0] % tuple(iconf)
+        elif template[i][1][0]=="L2_config":
+          l2conf=[]
+          l2conf.append(int(l2_cacheSize)*1024)
+          l2conf.append(l2_cacheBlockSize)
+          l2conf.append(l2_cacheAssociativity)
+          l2conf.append(8)
+          l2conf.append(1)
+          l2conf.append(latency_l2)
+          l2conf.append(0) # unused?
+          l2conf.append(1) # 1 for writeback
+          template[i][0] = template[i][0] % tuple(l2conf)
+        elif template[i][1][0]=="dcache_cfg":
+          dconf=[]
+          dconf.append(int(l1_dcacheSize)*1024)
+          dconf.append(l1_dcacheBlockSize)
+          dconf.append(l1_dcacheAssociativity)
+          dconf.append(2)            #banks
+          # Increase throughput and latency constraints, otherwise McPAT calls CACTI some more
+          #   with tighter constraints, resulting in a ridiculously large dcache
+          dconf.append(10)            #thoughput="Cycle time of the component"
+          dconf.append(10*latency_l1_d)
+          dconf.append(0) # unused?
+          dconf.append(1) # 1 for writeback
+          template[i][0] = template[i][0] % tuple(dconf)
+        elif template[i][1][0]=="L3_config":
+          l3conf=[]
+          l3conf.append(int(l3_cacheSize)*1024)
+          l3conf.append(64)
+          l3conf.append(l3_cacheAssociativity)
+          l3conf.append(16)
+          l3conf.append(16)
+          l3conf.append(latency_l3)
+          l3conf.append(1)
+          template[i][0] = template[i][0] % tuple(l3conf)
+      template[i][1] = ''
+  return template
+
+def is_epoch_slot(slot):
+  return len(slot) > 1 and (slot[1] == 'stat' or (slot[1] == 'cfg' and slot[0] in EPOCH_CONFIG_SLOTS))
+
+def config_key(cfg):
+  # the configuration as a string, except for the frequencies and Vdd's that change every epoch
+  items = []
+  for key in sorted(cfg):
+    if key in ('perf_model/core/frequency', 'power/vdd'):
+      continue
+    value = cfg[key]
+    if type(value) is collections.defaultdict:
+      value = (value.default_factory(), sorted(value.items()))
+    items.append((key, value))
+  return repr(items)
+
+compiled_templates = {}
+
+def get_template(cfg, ncores, num_l2s, private_l2s, num_l3s, technology_node, template_file = None):
+  # compile_template's result for this configuration: from memory, from template_file (kept between the
+  # processes of consecutive epochs), or compiled now. Returns a copy that can be filled in.
+  key = hashlib.sha1(repr((config_key(cfg), ncores, num_l2s, private_l2s, num_l3s, technology_node))).hexdigest()
+  if key not in compiled_templates and template_file and os.path.exists(template_file):
+    try:
+      stored_key, template = cPickle.load(open(template_file, 'rb'))
+      if stored_key == key:
+        compiled_templates[key] = template
+    except (IOError, EOFError, ValueError, cPickle.UnpicklingError):
+      pass
+  if key not in compiled_templates:
+    compiled_templates[key] = compile_template(cfg, ncores, num_l2s, private_l2s, num_l3s, technology_node)
+    if template_file:
+      cPickle.dump((key, compiled_templates[key]), open(template_file + '.tmp', 'wb'), cPickle.HIGHEST_PROTOCOL)
+      os.rename(template_file + '.tmp', template_file)
+  return [ list(line) for line in compiled_templates[key] ]
+
 def readTemplate(ncores, num_l2s, private_l2s, num_l3s, technology_node):
   device_type = 0  # 0: HP, 1: LSTP, 2: LOP        
   Count = 0
@@ -1644,7 +1826,7 @@ def readTemplate(ncores, num_l2s, private_l2s, num_l3s, technology_node):
 
 if __name__ == '__main__':
   def usage():
-    print 'Usage:', sys.argv[0], '[-h (help)] [-j <jobid> | -d <resultsdir (default: .)>] [-t <type: %s>] [-c <override-config>] [-o <output-file (power{.png,.txt,.py})>]' % '|'.join(powertypes)
+    print 'Usage:', sys.argv[0], '[-h (help)] [-j <jobid> | -d <resultsdir (default: .)>] [-t <type: %s>] [-c <override-config>] [-o <output-file (power{.png,.txt,.py})>] [--partial=<from>:<to> | --stats-delta=<file>] [--surrogate=<coefficients-file> --surrogate-levels=<MHz>:<Vdd>,... --surrogate-features=<stat>,...]' % '|'.join(powertypes)
     sys.exit(-1)
 
   jobid = 0
@@ -1656,9 +1838,13 @@ if __name__ == '__main__':
   no_graph = False
   no_text = False
   partial = None
+  stats_delta = None
+  surrogate = None
+  surrogate_levels = []
+  surrogate_features = []
 
   try:
-    opts, args = getopt.getopt(sys.argv[1:], "hj:t:c:d:o:", [ 'no-graph', 'no-text', 'partial=' ])
+    opts, args = getopt.getopt(sys.argv[1:], "hj:t:c:d:o:", [ 'no-graph', 'no-text', 'partial=', 'stats-delta=', 'surrogate=', 'surrogate-levels=', 'surrogate-features=' ])
   except getopt.GetoptError, e:
     print e
     usage()
@@ -1687,6 +1873,18 @@ if __name__ == '__main__':
         sys.stderr.write('--partial=<from>:<to>\n')
         usage()
       partial = a.split(':')
-
-
-  main(jobid = jobid, resultsdir = resultsdir, powertype = powertype, config = config, outputfile = outputfile, no_graph = no_graph, print_stack = not no_text, partial = partial)
+    if o == '--stats-delta':
+      stats_delta = a
+    if o == '--surrogate':
+      surrogate = a
+    if o == '--surrogate-levels':
+      surrogate_levels = a.split(',')
+    if o == '--surrogate-features':
+      surrogate_features = a.split(',')
+
+  if surrogate:
+    calibrate_surrogate(jobid = jobid, resultsdir = resultsdir, outputfile = outputfile, coefficients_file = surrogate,
+                        levels = surrogate_levels, features = surrogate_features, powertype = powertype, partial = partial, stats_delta = stats_delta)
+    sys.exit(0)
+
+  main(jobid = jobid, resultsdir = resultsdir, powertype = powertype, config = config, outputfile = outputfile, no_graph = no_graph, print_stack = not no_text, partial = partial, stats_delta = stats_delta)
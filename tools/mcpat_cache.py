@@ -0,0 +1,131 @@
+"""
+mcpat_cache.py
+
+Memoizes McPAT results. Consecutive epochs often produce (nearly) the same
+McPAT input, e.g., idle cores or steady loops, so the parsed McPAT output is
+stored under a key computed from the generated XML with every numeric value
+quantized to a relative tolerance. The XML holds the per-core statistics of
+the epoch as well as the frequencies and Vdd's, so those make up the key.
+
+Every entry is a file in the cache directory. Entries are touched when they
+are used and the least recently used ones are removed once there are more
+than max_entries. As the directory can live outside the output directory,
+the cache can be shared between simulation runs.
+
+Every lookup is logged to a small text file in the output directory, one
+line per epoch: 'hit <saved McPAT seconds>', 'miss <McPAT seconds>' or
+'verify <McPAT seconds> <relative error>'. scripts/memTherm_core.py
+summarizes it at the end of the simulation.
+"""
+
+import os, re, math, time, random, hashlib, tempfile
+try:
+  import cPickle as pickle
+except ImportError:
+  import pickle
+
+LOG_FILE = 'mcpat_cache.log'
+
+_value_re = re.compile(r'value="([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)"')
+
+
+def total_power(power_dat):
+  p = power_dat['Processor']
+  return p.get('Runtime Dynamic', 0) + p.get('Subthreshold Leakage with power gating', 0) + p.get('Gate Leakage', 0)
+
+
+class McpatCache:
+  def __init__(self, directory, tolerance = 0., max_entries = 1024, verify_fraction = 0., logfile = None):
+    self.directory = directory
+    self.max_entries = max_entries
+    self.verify_fraction = verify_fraction
+    self.logfile = logfile
+    if tolerance > 0:
+      self.log_step = math.log1p(tolerance)
+    else:
+      self.log_step = 0
+    if not os.path.isdir(self.directory):
+      try:
+        os.makedirs(self.directory)
+      except OSError:
+        # created concurrently by another run
+        if not os.path.isdir(self.directory):
+          raise
+
+  def quantize(self, match):
+    value = float(match.group(1))
+    if value == 0 or not self.log_step:
+      return 'value="%r"' % value
+    # bucket on a logarithmic scale so that the tolerance is relative
+    bucket = int(round(math.log(abs(value)) / self.log_step))
+    return 'value="%s%d"' % ('-' if value < 0 else '', bucket)
+
+  def key(self, xml):
+    return hashlib.sha1(_value_re.sub(self.quantize, xml)).hexdigest()
+
+  def filename(self, key):
+    return os.path.join(self.directory, key + '.pkl')
+
+  def lookup(self, key):
+    # returns (power_dat, McPAT runtime of the original evaluation) or None
+    filename = self.filename(key)
+    try:
+      entry = pickle.load(open(filename, 'rb'))
+    except (IOError, EOFError, pickle.UnpicklingError):
+      return None
+    try:
+      os.utime(filename, None)
+    except OSError:
+      pass
+    return entry
+
+  def store(self, key, power_dat, runtime):
+    # write to a temporary file first so concurrent readers never see a partial entry
+    fd, tmpname = tempfile.mkstemp(dir = self.directory, suffix = '.tmp')
+    with os.fdopen(fd, 'wb') as fp:
+      pickle.dump((power_dat, runtime), fp, pickle.HIGHEST_PROTOCOL)
+    os.rename(tmpname, self.filename(key))
+    self.evict()
+
+  def evict(self):
+    entries = [ os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.pkl') ]
+    if len(entries) <= self.max_entries:
+      return
+    def mtime(f):
+      try:
+        return os.path.getmtime(f)
+      except OSError:
+        return 0
+    entries.sort(key = mtime)
+    for f in entries[:len(entries) - self.max_entries]:
+      try:
+        os.unlink(f)
+      except OSError:
+        pass
+
+  def log(self, *fields):
+    if self.logfile:
+      with open(self.logfile, 'a') as fp:
+        fp.write(' '.join(map(str, fields)) + '\n')
+
+  def evaluate(self, xml, run):
+    # run() evaluates the XML with McPAT and returns the parsed power_dat
+    key = self.key(xml)
+    entry = self.lookup(key)
+    if entry and random.random() >= self.verify_fraction:
+      power_dat, runtime = entry
+      self.log('hit', runtime)
+      return power_dat
+    start = time.time()
+    power_dat = run()
+    runtime = time.time() - start
+    if entry:
+      # sampled hit: measure the error the cached result would have made
+      reference = total_power(power_dat)
+      error = abs(total_power(entry[0]) - reference) / reference if reference else 0.
+      self.log('verify', runtime, error)
+    else:
+      self.log('miss', runtime)
+    self.store(key, power_dat, runtime)
+    return power_dat
+